@@ -0,0 +1,58 @@
+import threading
+from collections import OrderedDict
+from database import execute_query
+
+# Derived analytics results kept in memory across reruns and sessions
+ANALYTICS_CACHE_SIZE = 32
+
+class VersionedCache:
+    """Size-bounded LRU of computed results keyed on (name, data version, arguments).
+
+    Results must be treated as read-only by callers since they are shared.
+    """
+
+    def __init__(self, max_entries=ANALYTICS_CACHE_SIZE):
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get_or_compute(self, name, version, compute, *args):
+        """Return the cached result for this data version, computing it on a miss"""
+        key = (name, version, args)
+        with self._lock:
+            if key in self._entries:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return self._entries[key]
+            self.misses += 1
+
+        result = compute(*args)
+
+        with self._lock:
+            self._entries[key] = result
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+        return result
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+analytics_cache = VersionedCache()
+
+def get_financial_data_version():
+    """Cheap token that changes whenever financial_records is inserted into, edited or deleted from"""
+    query = """
+        SELECT COALESCE(MAX(id), 0) AS max_id, COUNT(*) AS row_count,
+               MAX(updated_at) AS last_update, CURRENT_DATE AS today
+        FROM financial_records
+    """
+    result = execute_query(query, fetch=True)
+    if not result:
+        return None
+    row = result[0]
+    # The date is part of the token because the monthly windows are relative to today
+    return (row['max_id'], row['row_count'], row['last_update'], row['today'])
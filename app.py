@@ -1,9 +1,12 @@
 import streamlit as st
 import os
-import base64
+from assets import get_asset_text
+from audit import audit_log
 from auth import authenticate_user, check_permissions
 from database import init_database
-import importlib.util
+from follow_ups import follow_up_scheduler
+from maintenance import ensure_all_partitions
+from page_registry import render_page
 
 # Page configuration
 st.set_page_config(
@@ -15,29 +18,26 @@ st.set_page_config(
 
 # Load custom CSS
 def load_css():
-    with open("static/style.css") as f:
-        st.markdown(f"<style>{f.read()}</style>", unsafe_allow_html=True)
-
-# Get PLANDEPA logo as base64
-def get_logo_base64():
-    try:
-        with open("static/plandepa-logo.png", "rb") as f:
-            data = f.read()
-            return base64.b64encode(data).decode()
-    except FileNotFoundError:
-        return ""
+    """Inline the cached, minified stylesheet"""
+    # Streamlit serves static .css files as text/plain, which browsers refuse as a stylesheet
+    st.markdown(f"<style>{get_asset_text('style.css')}</style>", unsafe_allow_html=True)
 
 # Initialize database
 @st.cache_resource
 def setup_database():
-    init_database()
+    if not init_database():
+        return False
+    ensure_all_partitions()
+    follow_up_scheduler.start()
     return True
 
 # Main application
 def main():
     # Load CSS and setup database
     load_css()
-    setup_database()
+    if not setup_database():
+        # Don't cache a failed setup; retry on the next run
+        setup_database.clear()
     
     # Initialize session state
     if 'authenticated' not in st.session_state:
@@ -46,6 +46,8 @@ def main():
         st.session_state.user_role = None
     if 'username' not in st.session_state:
         st.session_state.username = None
+    if 'user' not in st.session_state:
+        st.session_state.user = None
     
     # Authentication check
     if not st.session_state.authenticated:
@@ -103,9 +105,11 @@ def main():
         
         # Logout button
         if st.button("🚪 Logout", key="logout_btn", use_container_width=True):
+            audit_log.record('user', 'logout', 'users')
             st.session_state.authenticated = False
             st.session_state.user_role = None
             st.session_state.username = None
+            st.session_state.user = None
             st.rerun()
     
     # Load selected page - convert display name to file name
@@ -153,6 +157,7 @@ def show_login():
                         st.session_state.authenticated = True
                         st.session_state.user_role = user_data['role']
                         st.session_state.username = user_data['username']
+                        st.session_state.user = user_data
                         st.success("Login successful!")
                         st.rerun()
                     else:
@@ -161,21 +166,11 @@ def show_login():
                     st.error("Please enter both username and password")
 
 def load_page(page_name):
-    """Dynamically load page modules"""
+    """Render a page module from the page registry"""
     try:
-        spec = importlib.util.spec_from_file_location(
-            f"pages.{page_name}", 
-            f"pages/{page_name}.py"
-        )
-        if spec is None or spec.loader is None:
-            st.error(f"Could not load page specification for '{page_name}'")
-            return
-            
-        module = importlib.util.module_from_spec(spec)
-        spec.loader.exec_module(module)
-        
-        # Let each page handle its own permissions - remove double checking
-        module.show()
+        # Modules are imported once per process, so reruns only pay for show().
+        # Each page handles its own permissions.
+        render_page(page_name)
     except FileNotFoundError:
         st.error(f"Page '{page_name}' not found.")
     except Exception as e:
@@ -0,0 +1,51 @@
+import os
+import re
+import threading
+
+STATIC_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "static")
+
+# Built assets are kept for the life of the process and rebuilt when the source changes
+_assets = {}
+_lock = threading.Lock()
+
+def minify_css(css):
+    """Strip comments and redundant whitespace from a stylesheet"""
+    css = re.sub(r'/\*.*?\*/', '', css, flags=re.S)
+    css = re.sub(r'\s+', ' ', css)
+    css = re.sub(r'\s*([{};,>])\s*', r'\1', css)
+    css = re.sub(r':\s+', ':', css)
+    css = css.replace(';}', '}')
+    return css.strip()
+
+def _build_asset(filename, source_path, mtime):
+    with open(source_path, "rb") as f:
+        data = f.read()
+
+    if filename.endswith(".css"):
+        data = minify_css(data.decode("utf-8")).encode("utf-8")
+
+    return {
+        'filename': filename,
+        'mtime': mtime,
+        'data': data
+    }
+
+def get_asset(filename):
+    """Get a built static asset, loading it from disk only when it has changed"""
+    source_path = os.path.join(STATIC_DIR, filename)
+    mtime = os.path.getmtime(source_path)
+
+    asset = _assets.get(filename)
+    if asset and asset['mtime'] == mtime:
+        return asset
+
+    with _lock:
+        asset = _assets.get(filename)
+        if not asset or asset['mtime'] != mtime:
+            asset = _build_asset(filename, source_path, mtime)
+            _assets[filename] = asset
+    return asset
+
+def get_asset_text(filename):
+    """Get the built content of a text asset"""
+    return get_asset(filename)['data'].decode("utf-8")
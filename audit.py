@@ -0,0 +1,142 @@
+import atexit
+import re
+import threading
+import time
+from datetime import datetime, timedelta
+import streamlit as st
+from database import execute_query, insert_audit_events, register_write_hook
+
+# How often buffered audit events are written
+AUDIT_FLUSH_INTERVAL = 5
+
+# Events kept in memory while the database is unreachable; the oldest are dropped beyond this
+AUDIT_MAX_PENDING = 10000
+
+# Event types -> labels shown in the audit viewer
+AUDIT_EVENT_TYPES = {
+    'user': 'User Activity',
+    'data': 'Data Changes',
+    'system': 'System Events'
+}
+
+# Tables whose writes are not recorded as data changes (logs of their own or too noisy)
+AUDIT_EXCLUDED_TABLES = {'audit_events', 'document_access_log', 'document_access_daily'}
+
+_WRITE_PATTERN = re.compile(r'\b(INSERT\s+INTO|UPDATE|DELETE\s+FROM)\s+(\w+)', re.I)
+_ID_FILTER_PATTERN = re.compile(r'WHERE\s+(?:\w+\.)?id\s*=\s*%s\s*$', re.I)
+
+def current_user():
+    """Get (user_id, username) for the session running this script, if any"""
+    try:
+        user = st.session_state.get('user') or {}
+        return user.get('id'), st.session_state.get('username')
+    except Exception:
+        # Background threads and CLI runs have no session
+        return None, None
+
+class AuditLogger:
+    """Queues audit events and appends them to audit_events from a background thread"""
+
+    def __init__(self, flush_interval=AUDIT_FLUSH_INTERVAL):
+        self.flush_interval = flush_interval
+        self._pending = []
+        self._lock = threading.Lock()
+        self._thread = None
+
+    def record(self, event_type, action, entity=None, entity_id=None, details=None, user_id=None, username=None):
+        """Queue an event; never blocks on the database"""
+        if user_id is None and username is None:
+            user_id, username = current_user()
+
+        event = (datetime.now(), user_id, username, event_type, action, entity, entity_id, details)
+        with self._lock:
+            self._pending.append(event)
+            if len(self._pending) > AUDIT_MAX_PENDING:
+                del self._pending[:len(self._pending) - AUDIT_MAX_PENDING]
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(target=self._run, name="audit-flush", daemon=True)
+                self._thread.start()
+
+    def record_write(self, query, params, result):
+        """Write hook for execute_query: record inserts, updates and deletes as data changes"""
+        match = _WRITE_PATTERN.search(query)
+        if not match:
+            return
+
+        table = match.group(2).lower()
+        if table in AUDIT_EXCLUDED_TABLES:
+            return
+
+        action = match.group(1).split()[0].lower()
+        entity_id = None
+        if isinstance(result, list):
+            rows = len(result)
+            if result and 'id' in result[0]:
+                entity_id = result[0]['id']
+        else:
+            rows = result
+            if isinstance(params, (list, tuple)) and params and _ID_FILTER_PATTERN.search(query.strip()):
+                entity_id = params[-1]
+
+        self.record('data', action, table, entity_id, f"{rows} row(s)")
+
+    def flush(self):
+        """Append all queued events in one statement"""
+        with self._lock:
+            events, self._pending = self._pending, []
+
+        if events and insert_audit_events(events) is None:
+            # Put them back in front of anything queued meanwhile
+            with self._lock:
+                self._pending[:0] = events
+                del self._pending[:max(len(self._pending) - AUDIT_MAX_PENDING, 0)]
+
+    def _run(self):
+        while True:
+            time.sleep(self.flush_interval)
+            self.flush()
+
+audit_log = AuditLogger()
+atexit.register(audit_log.flush)
+register_write_hook(audit_log.record_write)
+
+def _audit_filters(event_type=None, user_id=None, start_date=None, end_date=None):
+    conditions = []
+    params = []
+
+    if start_date:
+        conditions.append("occurred_at >= %s")
+        params.append(start_date)
+
+    if end_date:
+        conditions.append("occurred_at < %s")
+        params.append(end_date + timedelta(days=1))
+
+    if event_type:
+        conditions.append("event_type = %s")
+        params.append(event_type)
+
+    if user_id is not None:
+        conditions.append("user_id = %s")
+        params.append(user_id)
+
+    where = f"WHERE {' AND '.join(conditions)}" if conditions else ""
+    return where, params
+
+def get_audit_events(event_type=None, user_id=None, start_date=None, end_date=None, limit=50, offset=0):
+    """Get one page of audit events, newest first"""
+    where, params = _audit_filters(event_type, user_id, start_date, end_date)
+    query = f"""
+        SELECT occurred_at, username, event_type, action, entity, entity_id, details
+        FROM audit_events
+        {where}
+        ORDER BY occurred_at DESC, id DESC
+        LIMIT %s OFFSET %s
+    """
+    return execute_query(query, params + [limit, offset], fetch=True) or []
+
+def count_audit_events(event_type=None, user_id=None, start_date=None, end_date=None):
+    """Count audit events matching the viewer filters"""
+    where, params = _audit_filters(event_type, user_id, start_date, end_date)
+    result = execute_query(f"SELECT COUNT(*) AS count FROM audit_events {where}", params, fetch=True)
+    return result[0]['count'] if result else 0
@@ -1,20 +1,90 @@
+import atexit
 import hashlib
+import threading
+import time
 import streamlit as st
-from database import get_user_by_username, execute_query
+from database import get_user_by_username, execute_query, update_user_activity
+from audit import audit_log
 from datetime import datetime
 
+# How long user lookups are served from cache (create/update calls clear it early)
+USER_CACHE_TTL = 60
+
+# How often buffered activity timestamps are written to the users table
+ACTIVITY_FLUSH_INTERVAL = 15
+
 def hash_password(password):
     """Hash password using SHA256"""
     return hashlib.sha256(password.encode()).hexdigest()
 
+@st.cache_data(ttl=USER_CACHE_TTL, show_spinner=False)
+def _get_cached_user(username):
+    return get_user_by_username(username)
+
+@st.cache_data(ttl=USER_CACHE_TTL, show_spinner=False)
+def _get_cached_users():
+    query = "SELECT id, username, role, full_name, email, created_at, last_login FROM users ORDER BY created_at DESC"
+    return execute_query(query, fetch=True) or []
+
+def invalidate_user_cache():
+    """Drop cached user lookups after users are created or changed"""
+    _get_cached_user.clear()
+    _get_cached_users.clear()
+
+class ActivityBuffer:
+    """Collects per-user activity timestamps and writes them in batches from a background thread"""
+
+    def __init__(self, flush_interval=ACTIVITY_FLUSH_INTERVAL):
+        self.flush_interval = flush_interval
+        self._pending = {}
+        self._lock = threading.Lock()
+        self._thread = None
+
+    def record(self, user_id, column='last_login', timestamp=None):
+        """Buffer an activity timestamp; repeated events for a user collapse into one write"""
+        with self._lock:
+            self._pending.setdefault(column, {})[user_id] = timestamp or datetime.now()
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(target=self._run, name="user-activity-flush", daemon=True)
+                self._thread.start()
+
+    def pending(self, column='last_login'):
+        """Get buffered values that have not been written yet"""
+        with self._lock:
+            return dict(self._pending.get(column, {}))
+
+    def flush(self):
+        """Write all buffered timestamps, one UPDATE per column"""
+        with self._lock:
+            batches, self._pending = self._pending, {}
+
+        for column, activity in batches.items():
+            if update_user_activity(column, activity) is None:
+                # Keep the batch for the next attempt unless newer values arrived
+                with self._lock:
+                    retry = self._pending.setdefault(column, {})
+                    for user_id, timestamp in activity.items():
+                        retry.setdefault(user_id, timestamp)
+
+        if batches:
+            _get_cached_users.clear()
+
+    def _run(self):
+        while True:
+            time.sleep(self.flush_interval)
+            self.flush()
+
+activity_buffer = ActivityBuffer()
+atexit.register(activity_buffer.flush)
+
 def authenticate_user(username, password):
     """Authenticate user credentials"""
     try:
-        user = get_user_by_username(username)
+        user = _get_cached_user(username)
         if user and user['password_hash'] == hash_password(password):
-            # Update last login
-            query = "UPDATE users SET last_login = CURRENT_TIMESTAMP WHERE id = %s"
-            execute_query(query, (user['id'],))
+            # Last login is written in the background with other logins
+            activity_buffer.record(user['id'], 'last_login')
+            audit_log.record('user', 'login', 'users', user['id'], user_id=user['id'], username=user['username'])
             
             return {
                 'id': user['id'],
@@ -23,6 +93,7 @@ def authenticate_user(username, password):
                 'full_name': user['full_name'],
                 'email': user['email']
             }
+        audit_log.record('user', 'login_failed', 'users', details=f"Username: {username}", username=username)
         return None
     except Exception as e:
         st.error(f"Authentication error: {str(e)}")
@@ -51,6 +122,7 @@ def create_user(username, password, role, full_name, email):
             RETURNING id
         """
         result = execute_query(query, (username, password_hash, role, full_name, email), fetch=True)
+        invalidate_user_cache()
         return result[0]['id'] if result else None
     except Exception as e:
         st.error(f"Error creating user: {str(e)}")
@@ -58,10 +130,25 @@ def create_user(username, password, role, full_name, email):
 
 def get_all_users():
     """Get all users (super admin only)"""
-    query = "SELECT id, username, role, full_name, email, created_at, last_login FROM users ORDER BY created_at DESC"
-    return execute_query(query, fetch=True) or []
+    users = _get_cached_users()
+    pending_logins = activity_buffer.pending('last_login')
+    if pending_logins:
+        # Show logins that are still waiting in the buffer
+        for user in users:
+            if user['id'] in pending_logins:
+                user['last_login'] = pending_logins[user['id']]
+    return users
 
 def update_user_role(user_id, new_role):
     """Update user role"""
     query = "UPDATE users SET role = %s WHERE id = %s"
-    return execute_query(query, (new_role, user_id))
+    result = execute_query(query, (new_role, user_id))
+    invalidate_user_cache()
+    return result
+
+def reset_user_password(user_id, new_password):
+    """Set a new password for a user"""
+    query = "UPDATE users SET password_hash = %s WHERE id = %s"
+    result = execute_query(query, (hash_password(new_password), user_id))
+    invalidate_user_cache()
+    return result
@@ -0,0 +1,349 @@
+import csv
+import io
+import re
+import streamlit as st
+from database import get_connection
+from customer_matching import key_expression, soundex_available
+
+try:
+    import openpyxl
+except ImportError:
+    openpyxl = None
+
+# Rows buffered before each COPY into the staging table
+IMPORT_BATCH_SIZE = 5000
+
+# Per-row problems kept for the report, per kind (invalid / skipped); further ones are only counted
+MAX_REPORTED_ERRORS = 1000
+
+# Customer fields that can be imported -> (max length, header names recognised when suggesting a mapping)
+IMPORT_FIELDS = {
+    'first_name': (50, ['first name', 'firstname', 'first', 'given name']),
+    'last_name': (50, ['last name', 'lastname', 'last', 'surname', 'family name']),
+    'email': (100, ['email', 'e-mail', 'email address']),
+    'phone': (20, ['phone', 'phone number', 'telephone', 'mobile', 'cell']),
+    'address': (None, ['address', 'street', 'address 1', 'street address']),
+    'city': (100, ['city', 'town']),
+    'state': (50, ['state', 'province', 'region']),
+    'zip_code': (10, ['zip', 'zip code', 'zipcode', 'postal code', 'postcode']),
+    'company_name': (100, ['company', 'company name', 'organization', 'business']),
+    'customer_type': (20, ['type', 'customer type']),
+    'lead_source': (50, ['source', 'lead source']),
+    'status': (20, ['status']),
+    'notes': (None, ['notes', 'comments', 'description'])
+}
+
+# Fields every imported row must have
+REQUIRED_IMPORT_FIELDS = ('first_name', 'last_name')
+
+CUSTOMER_TYPES = ('residential', 'commercial')
+CUSTOMER_STATUSES = ('active', 'inactive', 'prospect')
+
+# Why a valid row was not inserted -> label for the import report
+SKIP_REASONS = {
+    'duplicate_in_file': 'Duplicate of an earlier row in the file',
+    'existing_customer': 'Matches an existing customer',
+    'possible_duplicate': 'No email or phone; same name and ZIP/address as an earlier row or an existing customer'
+}
+
+# Name key used without fuzzystrmatch (soundex() is not available to customer_matching.BLOCKING_KEYS['name'])
+_PLAIN_NAME_KEY = "lower(left({first_name}, 1)) || ':' || lower({last_name})"
+
+# Where a contact-less customer lives: the 5-digit ZIP, else the address
+_PLACE_KEY = "COALESCE(NULLIF(left({alias}.zip_code, 5), ''), lower(NULLIF(trim({alias}.address), '')))"
+
+_EMAIL_PATTERN = re.compile(r'^[^@\s]+@[^@\s]+\.[^@\s]+$')
+
+def xlsx_available():
+    """Check whether the optional openpyxl dependency is installed"""
+    return openpyxl is not None
+
+def _is_xlsx(filename):
+    return filename.lower().endswith(('.xlsx', '.xlsm'))
+
+def _cell_text(cell):
+    """Text of a spreadsheet cell as typed: 5551234567.0 -> '5551234567', ZIP 2134 formatted 00000 -> '02134'"""
+    value = cell.value
+    if value is None:
+        return ''
+    if isinstance(value, float) and value.is_integer():
+        value = int(value)
+    if isinstance(value, int) and not isinstance(value, bool):
+        number_format = getattr(cell, 'number_format', None) or ''
+        if number_format and set(number_format) == {'0'}:
+            return str(value).zfill(len(number_format))
+    return str(value)
+
+def iter_import_rows(file, filename):
+    """Stream (row_number, {header: value}) pairs from an uploaded CSV or XLSX file.
+
+    Row numbers are spreadsheet line numbers (the header is row 1).
+    """
+    if _is_xlsx(filename):
+        if not xlsx_available():
+            raise ValueError("Excel import requires the openpyxl package")
+        workbook = openpyxl.load_workbook(file, read_only=True, data_only=True)
+        try:
+            rows = workbook.active.iter_rows()
+            header = [_cell_text(cell).strip() for cell in next(rows, ())]
+            for row_number, cells in enumerate(rows, start=2):
+                values = [_cell_text(cell) for cell in cells]
+                if any(values):
+                    yield row_number, {header[i]: value for i, value in enumerate(values) if i < len(header)}
+        finally:
+            workbook.close()
+    else:
+        text = io.TextIOWrapper(file, encoding='utf-8-sig', newline='')
+        try:
+            reader = csv.DictReader(text)
+            for row_number, row in enumerate(reader, start=2):
+                if any(row.values()):
+                    yield row_number, row
+        finally:
+            text.detach()
+
+def get_import_columns(file, filename):
+    """Header names of an uploaded file (the file is rewound afterwards)"""
+    try:
+        for _, row in iter_import_rows(file, filename):
+            return list(row.keys())
+        return []
+    finally:
+        file.seek(0)
+
+def suggest_mapping(columns):
+    """Guess {field: column} from header names"""
+    def normalize(name):
+        return re.sub(r'[\s_\-]+', ' ', name.strip().lower())
+
+    normalized = {normalize(column): column for column in columns}
+    mapping = {}
+    for field, (_, names) in IMPORT_FIELDS.items():
+        for name in [field] + names:
+            if normalize(name) in normalized:
+                mapping[field] = normalized[normalize(name)]
+                break
+    return mapping
+
+def normalize_email(email):
+    email = (email or '').strip().lower()
+    return email or None
+
+def format_phone(phone):
+    """Format US numbers as (555) 123-4567; other numbers keep their digits and a leading +"""
+    phone = (phone or '').strip()
+    digits = re.sub(r'\D', '', phone)
+    if not digits:
+        return None
+    if len(digits) == 11 and digits.startswith('1'):
+        digits = digits[1:]
+    if len(digits) == 10:
+        return f"({digits[:3]}) {digits[3:6]}-{digits[6:]}"
+    return f"+{digits}" if phone.startswith('+') else digits
+
+def normalize_row(row, mapping, defaults):
+    """Map, clean and validate one input row; returns (record, [errors])"""
+    record = {}
+    errors = []
+
+    for field in IMPORT_FIELDS:
+        column = mapping.get(field)
+        value = (row.get(column) or '').strip() if column else ''
+        record[field] = value or defaults.get(field) or None
+
+    record['email'] = normalize_email(record['email'])
+    if record['email'] and not _EMAIL_PATTERN.match(record['email']):
+        errors.append(f"Invalid email '{record['email']}'")
+
+    # Spreadsheets drop the leading zeros of ZIP codes stored as numbers (02134 -> 2134)
+    if record['zip_code'] and record['zip_code'].isdigit() and 3 <= len(record['zip_code']) < 5:
+        record['zip_code'] = record['zip_code'].zfill(5)
+
+    record['phone'] = format_phone(record['phone'])
+    if record['phone'] and len(re.sub(r'\D', '', record['phone'])) < 7:
+        errors.append(f"Invalid phone '{record['phone']}'")
+
+    for field, allowed in (('customer_type', CUSTOMER_TYPES), ('status', CUSTOMER_STATUSES)):
+        if record[field]:
+            record[field] = record[field].lower()
+            if record[field] not in allowed:
+                errors.append(f"{field.replace('_', ' ').title()} must be one of: {', '.join(allowed)}")
+
+    for field in REQUIRED_IMPORT_FIELDS:
+        if not record[field]:
+            errors.append(f"{field.replace('_', ' ').title()} is required")
+
+    for field, (max_length, _) in IMPORT_FIELDS.items():
+        if max_length and record[field] and len(record[field]) > max_length:
+            errors.append(f"{field.replace('_', ' ').title()} is longer than {max_length} characters")
+
+    return record, errors
+
+def _phone_key(phone):
+    # Same normalisation as the customers phone index (customer_matching.BLOCKING_KEYS['phone'])
+    digits = re.sub(r'\D', '', phone or '')
+    return digits[-10:] if len(digits) >= 7 else None
+
+_STAGING_COLUMNS = ['row_number'] + list(IMPORT_FIELDS) + ['email_key', 'phone_key']
+
+def _copy_batch(cursor, batch):
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    for row_number, record in batch:
+        writer.writerow(
+            [row_number] + [record[field] for field in IMPORT_FIELDS] + [record['email'], _phone_key(record['phone'])]
+        )
+    buffer.seek(0)
+    cursor.copy_expert(
+        f"COPY customer_import_staging ({', '.join(_STAGING_COLUMNS)}) FROM STDIN WITH (FORMAT csv)",
+        buffer
+    )
+
+def import_customers(file, filename, mapping, defaults=None, progress=None):
+    """Stream a CSV/XLSX file of customers into the customers table.
+
+    Valid rows are COPYed into a temporary staging table in batches. They are then
+    de-duplicated (within the file and against existing customers, by email/phone, or by
+    name and ZIP/address for rows with neither) and inserted with
+    one INSERT ... SELECT, all in a single transaction. progress(rows_read) is called
+    after each batch.
+
+    Returns {'rows', 'inserted', 'skipped', 'invalid', 'errors': [(row_number, message)]},
+    or None if the import failed and nothing was written.
+    """
+    defaults = defaults or {}
+    result = {'rows': 0, 'inserted': 0, 'skipped': 0, 'invalid': 0, 'errors': []}
+    # Capped separately so a file full of invalid rows still reports its duplicates
+    reported = {'invalid': [], 'skipped': []}
+
+    def report(kind, row_number, message):
+        if len(reported[kind]) < MAX_REPORTED_ERRORS:
+            reported[kind].append((row_number, message))
+
+    conn = get_connection()
+    if not conn:
+        return None
+
+    try:
+        cursor = conn.cursor()
+        cursor.execute("""
+            CREATE TEMP TABLE customer_import_staging (
+                row_number INTEGER PRIMARY KEY,
+                first_name TEXT, last_name TEXT, email TEXT, phone TEXT, address TEXT,
+                city TEXT, state TEXT, zip_code TEXT, company_name TEXT, customer_type TEXT,
+                lead_source TEXT, status TEXT, notes TEXT,
+                email_key TEXT, phone_key TEXT, name_key TEXT, place_key TEXT,
+                outcome TEXT
+            ) ON COMMIT DROP
+        """)
+
+        batch = []
+        for row_number, row in iter_import_rows(file, filename):
+            result['rows'] += 1
+            record, errors = normalize_row(row, mapping, defaults)
+            if errors:
+                result['invalid'] += 1
+                report('invalid', row_number, "; ".join(errors))
+                continue
+
+            batch.append((row_number, record))
+            if len(batch) >= IMPORT_BATCH_SIZE:
+                _copy_batch(cursor, batch)
+                batch = []
+                if progress:
+                    progress(result['rows'])
+
+        if batch:
+            _copy_batch(cursor, batch)
+        if progress:
+            progress(result['rows'])
+
+        # Rows with neither email nor phone are matched on name (the customer_matching name key) and place
+        if soundex_available():
+            staging_name, customer_name = key_expression('name', 's'), key_expression('name', 'c')
+        else:
+            staging_name = _PLAIN_NAME_KEY.format(first_name='s.first_name', last_name='s.last_name')
+            customer_name = _PLAIN_NAME_KEY.format(first_name='c.first_name', last_name='c.last_name')
+        cursor.execute(f"""
+            UPDATE customer_import_staging s
+            SET name_key = {staging_name}, place_key = {_PLACE_KEY.format(alias='s')}
+            WHERE s.email_key IS NULL AND s.phone_key IS NULL
+        """)
+
+        cursor.execute("ANALYZE customer_import_staging")
+
+        # Keep the first row for each email / phone within the file
+        for key in ('email_key', 'phone_key'):
+            cursor.execute(f"""
+                UPDATE customer_import_staging s SET outcome = 'duplicate_in_file'
+                FROM (
+                    SELECT row_number, ROW_NUMBER() OVER (PARTITION BY {key} ORDER BY row_number) AS position
+                    FROM customer_import_staging
+                    WHERE {key} IS NOT NULL AND outcome IS NULL
+                ) d
+                WHERE d.row_number = s.row_number AND d.position > 1
+            """)
+
+        cursor.execute("""
+            UPDATE customer_import_staging s SET outcome = 'possible_duplicate'
+            FROM (
+                SELECT row_number, ROW_NUMBER() OVER (PARTITION BY name_key, place_key ORDER BY row_number) AS position
+                FROM customer_import_staging
+                WHERE name_key IS NOT NULL AND place_key IS NOT NULL AND outcome IS NULL
+            ) d
+            WHERE d.row_number = s.row_number AND d.position > 1
+        """)
+
+        # Skip rows matching existing customers (uses the customers email/phone key indexes)
+        cursor.execute("""
+            UPDATE customer_import_staging s SET outcome = 'existing_customer'
+            WHERE s.outcome IS NULL
+            AND (
+                EXISTS (SELECT 1 FROM customers c WHERE lower(c.email) = s.email_key)
+                OR EXISTS (
+                    SELECT 1 FROM customers c
+                    WHERE right(regexp_replace(c.phone, '[^0-9]', '', 'g'), 10) = s.phone_key
+                )
+            )
+        """)
+        cursor.execute(f"""
+            UPDATE customer_import_staging s SET outcome = 'possible_duplicate'
+            WHERE s.outcome IS NULL
+            AND s.name_key IS NOT NULL AND s.place_key IS NOT NULL
+            AND EXISTS (
+                SELECT 1 FROM customers c
+                WHERE {customer_name} = s.name_key
+                AND {_PLACE_KEY.format(alias='c')} = s.place_key
+            )
+        """)
+
+        columns = ', '.join(IMPORT_FIELDS)
+        cursor.execute(f"""
+            INSERT INTO customers ({columns})
+            SELECT first_name, last_name, email, phone, address, city, state, zip_code, company_name,
+                   COALESCE(customer_type, 'residential'), lead_source, COALESCE(status, 'active'), notes
+            FROM customer_import_staging
+            WHERE outcome IS NULL
+            ORDER BY row_number
+        """)
+        result['inserted'] = cursor.rowcount
+
+        cursor.execute("""
+            SELECT row_number, outcome FROM customer_import_staging
+            WHERE outcome IS NOT NULL
+            ORDER BY row_number
+        """)
+        for row_number, outcome in cursor.fetchall():
+            result['skipped'] += 1
+            report('skipped', row_number, SKIP_REASONS[outcome])
+
+        result['errors'] = sorted(reported['invalid'] + reported['skipped'])
+        conn.commit()
+        cursor.close()
+        conn.close()
+        return result
+    except Exception as e:
+        st.error(f"Customer import failed: {str(e)}")
+        conn.rollback()
+        conn.close()
+        return None
@@ -0,0 +1,268 @@
+import re
+from difflib import SequenceMatcher
+import psycopg2.extras
+from database import get_connection, execute_query
+
+# Columns the blocking keys are computed from
+KEY_COLUMNS = ('email', 'phone', 'first_name', 'last_name', 'zip_code')
+
+# Blocking keys: customers are only compared when they share one of these.
+# The expressions match the expression indexes in database.SCHEMA_UPDATES.
+BLOCKING_KEYS = {
+    'email': "lower({email})",
+    'email_local': "lower(split_part({email}, '@', 1))",
+    'phone': "right(regexp_replace({phone}, '[^0-9]', '', 'g'), 10)",
+    'name': "NULLIF(soundex({last_name}), '') || ':' || lower(left({first_name}, 1))",
+    'zip_name': "NULLIF(left({zip_code}, 5), '') || ':' || NULLIF(soundex({last_name}), '')"
+}
+
+# Keys that need soundex() from the optional fuzzystrmatch extension
+SOUNDEX_KEYS = ('name', 'zip_name')
+
+# Blocks larger than this (e.g. an 'info@' local part shared by many companies) are skipped
+MAX_BLOCK_SIZE = 50
+
+# Relative weight of each compared field in the match score
+MATCH_WEIGHTS = {
+    'email': 4,
+    'phone': 3,
+    'name': 3,
+    'address': 2,
+    'zip': 1,
+    'company': 1
+}
+
+# Pairs scoring at least this are treated as the same customer
+DUPLICATE_THRESHOLD = 0.8
+
+# Tables whose customer_id is re-pointed by merge_customers (jobs follow their estimates)
+CUSTOMER_REFERENCES = ('estimates', 'invoices', 'customer_contacts', 'documents')
+
+# Profile fields filled in from the duplicate when the kept customer has none
+MERGE_FILL_FIELDS = ('email', 'phone', 'address', 'city', 'state', 'zip_code', 'company_name', 'lead_source')
+
+def key_expression(key, alias=None):
+    """SQL for a blocking key over a table alias, or over named query parameters when alias is None"""
+    if alias is None:
+        columns = {column: f"%({column})s::TEXT" for column in KEY_COLUMNS}
+    else:
+        columns = {column: f"{alias}.{column}" for column in KEY_COLUMNS}
+    return BLOCKING_KEYS[key].format(**columns)
+
+_soundex_available = None
+
+def soundex_available():
+    """Check (once per process) whether the fuzzystrmatch soundex() function is installed"""
+    global _soundex_available
+    if _soundex_available is None:
+        result = execute_query("SELECT to_regproc('soundex') IS NOT NULL AS available", fetch=True)
+        if result is None:
+            return False
+        _soundex_available = result[0]['available']
+    return _soundex_available
+
+def get_blocking_keys():
+    """Blocking keys usable on this database; the soundex ones are left out without fuzzystrmatch"""
+    if soundex_available():
+        return list(BLOCKING_KEYS)
+    return [key for key in BLOCKING_KEYS if key not in SOUNDEX_KEYS]
+
+def normalize_phone(phone):
+    digits = re.sub(r'\D', '', phone or '')
+    return digits[-10:] if len(digits) >= 7 else None
+
+def _normalize_text(value):
+    return ' '.join(re.sub(r'[^a-z0-9 ]', ' ', (value or '').lower()).split())
+
+def _text_similarity(a, b):
+    a, b = _normalize_text(a), _normalize_text(b)
+    if not a or not b:
+        return None
+    return 1.0 if a == b else SequenceMatcher(None, a, b).ratio()
+
+def _email_similarity(a, b):
+    a, b = (a or '').strip().lower(), (b or '').strip().lower()
+    if not a or not b:
+        return None
+    if a == b:
+        return 1.0
+    if a.split('@')[0] == b.split('@')[0]:
+        return 0.7
+    # People change and share addresses; a different email is not evidence either way
+    return None
+
+def _exact_similarity(a, b):
+    if not a or not b:
+        return None
+    return 1.0 if a == b else 0.0
+
+def score_match(a, b):
+    """Score two customer records from 0 to 1; returns (score, {field: similarity})"""
+    similarities = {
+        'email': _email_similarity(a.get('email'), b.get('email')),
+        'phone': _exact_similarity(normalize_phone(a.get('phone')), normalize_phone(b.get('phone'))),
+        'name': _text_similarity(f"{a.get('first_name') or ''} {a.get('last_name') or ''}",
+                                 f"{b.get('first_name') or ''} {b.get('last_name') or ''}"),
+        'address': _text_similarity(a.get('address'), b.get('address')),
+        'zip': _exact_similarity((a.get('zip_code') or '')[:5], (b.get('zip_code') or '')[:5]),
+        'company': _text_similarity(a.get('company_name'), b.get('company_name'))
+    }
+    compared = {field: value for field, value in similarities.items() if value is not None}
+
+    # A single shared field (e.g. just a name) is not enough evidence
+    if len(compared) < 2:
+        return 0.0, compared
+
+    total_weight = sum(MATCH_WEIGHTS[field] for field in compared)
+    score = sum(MATCH_WEIGHTS[field] * value for field, value in compared.items()) / total_weight
+    return score, compared
+
+def find_matching_customer(record, threshold=DUPLICATE_THRESHOLD, max_block_size=MAX_BLOCK_SIZE):
+    """Find the existing customer that best matches a record, using the blocking key indexes.
+
+    record is a dict of customer fields (first_name, last_name, email, phone, zip_code, ...).
+    An exact (case-insensitive) email match is decisive, since customers.email is unique.
+    Otherwise each blocking key is looked up separately; like get_candidate_pairs, a key shared
+    by more than max_block_size customers is too common to be evidence and is skipped.
+    Returns (customer, score), or (None, 0.0) when nothing reaches the threshold.
+    """
+    params = {column: record.get(column) or None for column in KEY_COLUMNS}
+    blocks = [
+        f"""(
+            SELECT '{key}' AS block_key, c.* FROM customers c
+            WHERE {key_expression(key, 'c')} = {key_expression(key)}
+            LIMIT %(limit)s
+        )"""
+        for key in get_blocking_keys()
+    ]
+    query = " UNION ALL ".join(blocks)
+    rows = execute_query(query, {**params, 'limit': max_block_size + 1}, fetch=True) or []
+
+    email = (record.get('email') or '').strip().lower()
+    if email:
+        for row in rows:
+            if row['block_key'] == 'email' and (row['email'] or '').strip().lower() == email:
+                return row, 1.0
+
+    block_sizes = {}
+    for row in rows:
+        block_sizes[row['block_key']] = block_sizes.get(row['block_key'], 0) + 1
+
+    best, best_score = None, 0.0
+    for row in rows:
+        if block_sizes[row['block_key']] > max_block_size:
+            continue
+        score, _ = score_match(record, row)
+        if score >= threshold and score > best_score:
+            best, best_score = row, score
+    return best, best_score
+
+def get_candidate_pairs(max_block_size=MAX_BLOCK_SIZE):
+    """Customer id pairs sharing at least one blocking key, from one pass per key"""
+    blocks = []
+    for key in get_blocking_keys():
+        expression = key_expression(key, 'c')
+        blocks.append(f"""
+            SELECT id, '{key}' AS key_type, {expression} AS key_value
+            FROM customers c
+            WHERE {expression} <> ''
+        """)
+
+    query = f"""
+        WITH keyed AS ({' UNION ALL '.join(blocks)}),
+        sized AS (
+            SELECT *, COUNT(*) OVER (PARTITION BY key_type, key_value) AS block_size
+            FROM keyed
+        )
+        SELECT a.id AS id_a, b.id AS id_b, array_agg(DISTINCT a.key_type) AS shared_keys
+        FROM sized a
+        JOIN sized b ON a.key_type = b.key_type AND a.key_value = b.key_value AND a.id < b.id
+        WHERE a.block_size <= %s
+        GROUP BY a.id, b.id
+    """
+    return execute_query(query, (max_block_size,), fetch=True) or []
+
+def find_duplicate_customers(threshold=DUPLICATE_THRESHOLD, max_block_size=MAX_BLOCK_SIZE):
+    """Scan the whole customers table for likely duplicates.
+
+    Only pairs sharing a blocking key are scored, so the work grows with block sizes rather
+    than with the square of the table. Returns pairs sorted by score, best first.
+    """
+    pairs = get_candidate_pairs(max_block_size)
+    if not pairs:
+        return []
+
+    ids = sorted({pair['id_a'] for pair in pairs} | {pair['id_b'] for pair in pairs})
+    customers = {
+        row['id']: row
+        for row in execute_query("SELECT * FROM customers WHERE id = ANY(%s)", (ids,), fetch=True) or []
+    }
+
+    duplicates = []
+    for pair in pairs:
+        a, b = customers.get(pair['id_a']), customers.get(pair['id_b'])
+        if not a or not b:
+            continue
+        score, fields = score_match(a, b)
+        if score >= threshold:
+            duplicates.append({
+                'customer_a': a,
+                'customer_b': b,
+                'score': score,
+                'fields': fields,
+                'shared_keys': pair['shared_keys']
+            })
+
+    duplicates.sort(key=lambda d: d['score'], reverse=True)
+    return duplicates
+
+def merge_customers(keep_id, duplicate_id):
+    """Move everything linked to duplicate_id onto keep_id and delete the duplicate, in one transaction.
+
+    Empty profile fields on the kept customer are filled in from the duplicate.
+    Returns {table: rows re-pointed}, or None on failure.
+    """
+    if keep_id == duplicate_id:
+        raise ValueError("Cannot merge a customer into itself")
+
+    conn = get_connection()
+    if not conn:
+        return None
+
+    try:
+        cursor = conn.cursor(cursor_factory=psycopg2.extras.RealDictCursor)
+        cursor.execute("SELECT * FROM customers WHERE id = ANY(%s) FOR UPDATE", ([keep_id, duplicate_id],))
+        rows = {row['id']: row for row in cursor.fetchall()}
+        if keep_id not in rows or duplicate_id not in rows:
+            raise ValueError("Customer not found")
+
+        moved = {}
+        for table in CUSTOMER_REFERENCES:
+            cursor.execute(f"UPDATE {table} SET customer_id = %s WHERE customer_id = %s", (keep_id, duplicate_id))
+            moved[table] = cursor.rowcount
+
+        duplicate = rows[duplicate_id]
+        # Delete first so a copied email does not collide with the unique constraint
+        cursor.execute("DELETE FROM customers WHERE id = %s", (duplicate_id,))
+
+        assignments = ", ".join(f"{field} = COALESCE(NULLIF({field}, ''), %s)" for field in MERGE_FILL_FIELDS)
+        note = f"Merged duplicate customer #{duplicate_id} ({duplicate['first_name']} {duplicate['last_name']})"
+        cursor.execute(
+            f"""
+                UPDATE customers SET {assignments},
+                    notes = CONCAT_WS(E'\\n', NULLIF(notes, ''), %s, NULLIF(%s, '')),
+                    updated_at = CURRENT_TIMESTAMP
+                WHERE id = %s
+            """,
+            [duplicate[field] for field in MERGE_FILL_FIELDS] + [note, duplicate['notes'], keep_id]
+        )
+
+        conn.commit()
+        cursor.close()
+        conn.close()
+        return moved
+    except Exception as e:
+        print(f"Error merging customer {duplicate_id} into {keep_id}: {e}")
+        conn.rollback()
+        conn.close()
+        return None
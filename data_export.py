@@ -0,0 +1,177 @@
+import os
+import tempfile
+from datetime import timedelta
+import streamlit as st
+from database import get_connection
+
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+except ImportError:
+    pa = None
+    pq = None
+
+# Exportable tables: (date column the range filter applies to, columns to export)
+EXPORT_TABLES = {
+    'estimates': ('created_at', '*'),
+    'jobs': ('created_at', '*'),
+    'ai_calls': ('created_at', '*'),
+    'financial_records': ('transaction_date', '*'),
+    'invoices': ('invoice_date', '*'),
+    'audit_events': ('occurred_at', '*'),
+    'documents': ('created_at', """id, customer_id, job_id, original_filename, file_size, mime_type,
+                                   document_type, category, description, tags, is_active, uploaded_by,
+                                   created_at, updated_at""")
+}
+
+# Format name -> (file extension, mime type)
+EXPORT_FORMATS = {
+    'CSV': ('.csv', 'text/csv'),
+    'JSON': ('.ndjson', 'application/x-ndjson'),
+    'Parquet': ('.parquet', 'application/vnd.apache.parquet')
+}
+
+# Rows fetched per round-trip from the server-side cursor for Parquet exports
+PARQUET_BATCH_SIZE = 5000
+
+def parquet_available():
+    """Check whether the optional pyarrow dependency is installed"""
+    return pa is not None
+
+def build_export_query(table, start_date=None, end_date=None, filters=None):
+    """Build the SELECT for an export, filtered to an inclusive date range and column values"""
+    if table not in EXPORT_TABLES:
+        raise ValueError(f"Table '{table}' cannot be exported")
+
+    date_column, columns = EXPORT_TABLES[table]
+    query = f"SELECT {columns} FROM {table} WHERE 1=1"
+    params = []
+
+    if start_date:
+        query += f" AND {date_column} >= %s"
+        params.append(start_date)
+
+    if end_date:
+        query += f" AND {date_column} < %s"
+        params.append(end_date + timedelta(days=1))
+
+    for column, value in (filters or {}).items():
+        if not column.isidentifier():
+            raise ValueError(f"Invalid filter column: {column}")
+        query += f" AND {column} = %s"
+        params.append(value)
+
+    query += " ORDER BY id"
+    return query, params
+
+def _copy_csv(cursor, query, params, out):
+    sql = cursor.mogrify(query, params).decode()
+    cursor.copy_expert(f"COPY ({sql}) TO STDOUT WITH (FORMAT csv, HEADER)", out)
+
+def _copy_ndjson(cursor, query, params, out):
+    sql = cursor.mogrify(query, params).decode()
+    # CSV mode with control-character quote/delimiter passes the JSON through unescaped;
+    # neither character can appear in row_to_json output
+    cursor.copy_expert(
+        f"COPY (SELECT row_to_json(t)::text FROM ({sql}) t) TO STDOUT "
+        f"WITH (FORMAT csv, QUOTE E'\\x01', DELIMITER E'\\x02')",
+        out
+    )
+
+# PostgreSQL type OID -> Arrow type for Parquet exports (anything else is written as text)
+def _arrow_type(type_code):
+    return {
+        16: pa.bool_(),
+        20: pa.int64(), 21: pa.int64(), 23: pa.int64(),
+        700: pa.float64(), 701: pa.float64(), 1700: pa.float64(),
+        1082: pa.date32(),
+        1114: pa.timestamp('us'), 1184: pa.timestamp('us', tz='UTC')
+    }.get(type_code, pa.string())
+
+def _arrow_value(value, arrow_type):
+    if value is None:
+        return None
+    if arrow_type == pa.float64():
+        return float(value)
+    if arrow_type == pa.string() and not isinstance(value, str):
+        return str(value)
+    return value
+
+def _copy_parquet(conn, query, params, out_path):
+    # Named cursor keeps the result set on the server; only one batch is held in memory
+    cursor = conn.cursor(name="table_export")
+    cursor.itersize = PARQUET_BATCH_SIZE
+    cursor.execute(query, params)
+
+    writer = None
+    try:
+        while True:
+            rows = cursor.fetchmany(PARQUET_BATCH_SIZE)
+            if writer is None:
+                schema = pa.schema([(col.name, _arrow_type(col.type_code)) for col in cursor.description])
+                writer = pq.ParquetWriter(out_path, schema)
+            if not rows:
+                break
+
+            arrays = [
+                pa.array([_arrow_value(row[i], field.type) for row in rows], type=field.type)
+                for i, field in enumerate(schema)
+            ]
+            writer.write_table(pa.Table.from_arrays(arrays, schema=schema))
+    finally:
+        if writer is not None:
+            writer.close()
+        cursor.close()
+
+def export_table(table, export_format, start_date=None, end_date=None, filters=None):
+    """Stream a table export to a temporary file and return its details"""
+    if export_format not in EXPORT_FORMATS:
+        raise ValueError(f"Unsupported export format: {export_format}")
+    if export_format == 'Parquet' and not parquet_available():
+        st.error("Parquet export requires the pyarrow package")
+        return None
+
+    query, params = build_export_query(table, start_date, end_date, filters)
+    extension, mime_type = EXPORT_FORMATS[export_format]
+
+    conn = get_connection()
+    if not conn:
+        return None
+
+    fd, path = tempfile.mkstemp(prefix=f"plandepa_{table}_", suffix=extension)
+    try:
+        if export_format == 'Parquet':
+            os.close(fd)
+            _copy_parquet(conn, query, params, path)
+        else:
+            with os.fdopen(fd, 'w', encoding='utf-8', newline='') as out:
+                cursor = conn.cursor()
+                if export_format == 'CSV':
+                    _copy_csv(cursor, query, params, out)
+                else:
+                    _copy_ndjson(cursor, query, params, out)
+                cursor.close()
+
+        conn.rollback()
+        conn.close()
+
+        date_suffix = f"_{start_date}_{end_date}" if start_date and end_date else ""
+        return {
+            'path': path,
+            'filename': f"{table}{date_suffix}{extension}",
+            'mime_type': mime_type,
+            'size': os.path.getsize(path)
+        }
+    except Exception as e:
+        st.error(f"Export failed: {str(e)}")
+        conn.rollback()
+        conn.close()
+        remove_export(path)
+        return None
+
+def remove_export(path):
+    """Delete a temporary export file"""
+    try:
+        os.remove(path)
+    except OSError:
+        pass
@@ -1,7 +1,7 @@
 import psycopg2
 import psycopg2.extras
 import os
-from datetime import datetime
+from datetime import datetime, date, timedelta
 import streamlit as st
 from dotenv import load_dotenv
 
@@ -26,10 +26,246 @@ def get_connection():
         st.error(f"Database connection error: {str(e)}")
         return None
 
+# Schema additions applied on startup; the core tables were created in Supabase
+SCHEMA_UPDATES = [
+    # Daily per-document access counts, kept up to date by log_document_access
+    """
+        CREATE TABLE IF NOT EXISTS document_access_daily (
+            access_date DATE NOT NULL,
+            document_id INTEGER NOT NULL,
+            user_id INTEGER NOT NULL DEFAULT 0,
+            access_type VARCHAR(20) NOT NULL,
+            access_count INTEGER NOT NULL DEFAULT 0,
+            PRIMARY KEY (access_date, document_id, user_id, access_type)
+        )
+    """,
+    "CREATE INDEX IF NOT EXISTS idx_document_access_daily_user ON document_access_daily(user_id, access_date)",
+    # Append-only audit trail, written in batches by audit.AuditLogger
+    """
+        CREATE TABLE IF NOT EXISTS audit_events (
+            id BIGSERIAL PRIMARY KEY,
+            occurred_at TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP,
+            user_id INTEGER,
+            username VARCHAR(50),
+            event_type VARCHAR(20) NOT NULL,
+            action VARCHAR(50) NOT NULL,
+            entity VARCHAR(50),
+            entity_id BIGINT,
+            details TEXT
+        )
+    """,
+    "CREATE INDEX IF NOT EXISTS idx_audit_events_occurred_at ON audit_events(occurred_at)",
+    "CREATE INDEX IF NOT EXISTS idx_audit_events_user ON audit_events(user_id, occurred_at)",
+    "CREATE INDEX IF NOT EXISTS idx_audit_events_type ON audit_events(event_type, occurred_at)",
+    """
+        CREATE OR REPLACE FUNCTION audit_events_append_only() RETURNS trigger AS $$
+        BEGIN
+            RAISE EXCEPTION 'audit_events is append-only';
+        END;
+        $$ LANGUAGE plpgsql
+    """,
+    "DROP TRIGGER IF EXISTS audit_events_append_only ON audit_events",
+    """
+        CREATE TRIGGER audit_events_append_only
+        BEFORE UPDATE OR DELETE OR TRUNCATE ON audit_events
+        FOR EACH STATEMENT EXECUTE FUNCTION audit_events_append_only()
+    """,
+    # Schedule overlap lookups for the job calendar (get_jobs_in_window)
+    """
+        CREATE INDEX IF NOT EXISTS idx_jobs_schedule ON jobs
+        USING GIST (daterange(start_date, GREATEST(end_date, start_date), '[]'))
+        WHERE start_date IS NOT NULL
+    """,
+    # Lets cached financial analytics notice edited records (see analytics_cache)
+    "ALTER TABLE financial_records ADD COLUMN IF NOT EXISTS updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP",
+    """
+        CREATE OR REPLACE FUNCTION touch_updated_at() RETURNS trigger AS $$
+        BEGIN
+            NEW.updated_at = CURRENT_TIMESTAMP;
+            RETURN NEW;
+        END;
+        $$ LANGUAGE plpgsql
+    """,
+    "DROP TRIGGER IF EXISTS financial_records_touch_updated_at ON financial_records",
+    """
+        CREATE TRIGGER financial_records_touch_updated_at
+        BEFORE UPDATE ON financial_records
+        FOR EACH ROW EXECUTE FUNCTION touch_updated_at()
+    """,
+    # Follow-up due queues (see follow_ups); only open follow-ups are indexed
+    "ALTER TABLE customer_contacts ADD COLUMN IF NOT EXISTS escalated_at TIMESTAMP",
+    """
+        CREATE INDEX IF NOT EXISTS idx_customer_contacts_due ON customer_contacts(follow_up_date)
+        WHERE completed = FALSE AND follow_up_date IS NOT NULL
+    """,
+    """
+        CREATE INDEX IF NOT EXISTS idx_customer_contacts_due_user ON customer_contacts(created_by, follow_up_date)
+        WHERE completed = FALSE AND follow_up_date IS NOT NULL
+    """,
+    # Blocking key indexes for duplicate customer matching; must match customer_matching.BLOCKING_KEYS
+    # (the soundex-based ones are in OPTIONAL_SCHEMA_UPDATES)
+    "CREATE INDEX IF NOT EXISTS idx_customers_email_key ON customers (lower(email))",
+    "CREATE INDEX IF NOT EXISTS idx_customers_email_local_key ON customers (lower(split_part(email, '@', 1)))",
+    "CREATE INDEX IF NOT EXISTS idx_customers_phone_key ON customers (right(regexp_replace(phone, '[^0-9]', '', 'g'), 10))",
+    # Rendered invoice PDFs are looked up by the hash of the invoice content they were rendered from
+    "ALTER TABLE documents ADD COLUMN IF NOT EXISTS content_hash VARCHAR(64)",
+    "CREATE INDEX IF NOT EXISTS idx_documents_content_hash ON documents (content_hash) WHERE content_hash IS NOT NULL",
+    # Invoice subtotal/total follow their line items (see add_invoice_item)
+    """
+        CREATE OR REPLACE FUNCTION invoice_items_apply_totals() RETURNS trigger AS $$
+        BEGIN
+            IF TG_OP IN ('UPDATE', 'DELETE') THEN
+                UPDATE invoices
+                SET subtotal = COALESCE(subtotal, 0) - COALESCE(OLD.line_total, 0),
+                    total_amount = COALESCE(total_amount, 0) - COALESCE(OLD.line_total, 0),
+                    updated_at = CURRENT_TIMESTAMP
+                WHERE id = OLD.invoice_id;
+            END IF;
+            IF TG_OP IN ('INSERT', 'UPDATE') THEN
+                UPDATE invoices
+                SET subtotal = COALESCE(subtotal, 0) + COALESCE(NEW.line_total, 0),
+                    total_amount = COALESCE(total_amount, 0) + COALESCE(NEW.line_total, 0),
+                    updated_at = CURRENT_TIMESTAMP
+                WHERE id = NEW.invoice_id;
+            END IF;
+            RETURN NULL;
+        END;
+        $$ LANGUAGE plpgsql
+    """,
+    "DROP TRIGGER IF EXISTS invoice_items_apply_totals ON invoice_items",
+    """
+        CREATE TRIGGER invoice_items_apply_totals
+        AFTER INSERT OR DELETE OR UPDATE OF invoice_id, line_total ON invoice_items
+        FOR EACH ROW EXECUTE FUNCTION invoice_items_apply_totals()
+    """,
+    # Accounts receivable totals for the Invoices header, one row kept up to date by trigger
+    """
+        CREATE TABLE IF NOT EXISTS ar_summary (
+            id BOOLEAN PRIMARY KEY DEFAULT TRUE CHECK (id),
+            total_invoices INTEGER NOT NULL DEFAULT 0,
+            paid_invoices INTEGER NOT NULL DEFAULT 0,
+            unpaid_invoices INTEGER NOT NULL DEFAULT 0,
+            partial_invoices INTEGER NOT NULL DEFAULT 0,
+            total_billed DECIMAL(14,2) NOT NULL DEFAULT 0,
+            total_collected DECIMAL(14,2) NOT NULL DEFAULT 0,
+            updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )
+    """,
+    """
+        CREATE OR REPLACE FUNCTION ar_summary_apply() RETURNS trigger AS $$
+        BEGIN
+            IF TG_OP IN ('UPDATE', 'DELETE') THEN
+                UPDATE ar_summary
+                SET total_invoices = total_invoices - 1,
+                    paid_invoices = paid_invoices - (OLD.payment_status = 'paid')::INTEGER,
+                    unpaid_invoices = unpaid_invoices - (OLD.payment_status = 'unpaid')::INTEGER,
+                    partial_invoices = partial_invoices - (OLD.payment_status = 'partial')::INTEGER,
+                    total_billed = total_billed - COALESCE(OLD.total_amount, 0),
+                    total_collected = total_collected - COALESCE(OLD.paid_amount, 0),
+                    updated_at = CURRENT_TIMESTAMP;
+            END IF;
+            IF TG_OP IN ('INSERT', 'UPDATE') THEN
+                UPDATE ar_summary
+                SET total_invoices = total_invoices + 1,
+                    paid_invoices = paid_invoices + (NEW.payment_status = 'paid')::INTEGER,
+                    unpaid_invoices = unpaid_invoices + (NEW.payment_status = 'unpaid')::INTEGER,
+                    partial_invoices = partial_invoices + (NEW.payment_status = 'partial')::INTEGER,
+                    total_billed = total_billed + COALESCE(NEW.total_amount, 0),
+                    total_collected = total_collected + COALESCE(NEW.paid_amount, 0),
+                    updated_at = CURRENT_TIMESTAMP;
+            END IF;
+            RETURN NULL;
+        END;
+        $$ LANGUAGE plpgsql
+    """,
+    "DROP TRIGGER IF EXISTS invoices_ar_summary ON invoices",
+    """
+        CREATE TRIGGER invoices_ar_summary
+        AFTER INSERT OR DELETE OR UPDATE OF payment_status, total_amount, paid_amount ON invoices
+        FOR EACH ROW EXECUTE FUNCTION ar_summary_apply()
+    """,
+    # Overdue depends on today's date, so it is counted from the open invoices only
+    """
+        CREATE INDEX IF NOT EXISTS idx_invoices_open_due ON invoices(due_date)
+        WHERE payment_status IN ('unpaid', 'partial')
+    """,
+    # Seed the summary the first time it is created
+    """
+        INSERT INTO ar_summary (id, total_invoices, paid_invoices, unpaid_invoices, partial_invoices,
+                                total_billed, total_collected)
+        SELECT TRUE, COUNT(*),
+               COUNT(*) FILTER (WHERE payment_status = 'paid'),
+               COUNT(*) FILTER (WHERE payment_status = 'unpaid'),
+               COUNT(*) FILTER (WHERE payment_status = 'partial'),
+               COALESCE(SUM(total_amount), 0), COALESCE(SUM(paid_amount), 0)
+        FROM invoices
+        ON CONFLICT (id) DO NOTHING
+    """,
+    # Backfill the rollup the first time it is created
+    """
+        INSERT INTO document_access_daily (access_date, document_id, user_id, access_type, access_count)
+        SELECT accessed_at::date, document_id, COALESCE(user_id, 0), access_type, COUNT(*)
+        FROM document_access_log
+        WHERE NOT EXISTS (SELECT 1 FROM document_access_daily)
+        GROUP BY 1, 2, 3, 4
+    """
+]
+
+# Best-effort additions that can fail on some databases (missing privileges, existing data);
+# each is applied in its own transaction and skipped with a warning if it fails
+OPTIONAL_SCHEMA_UPDATES = [
+    # soundex() for the name blocking keys of customer_matching (left out of matching when missing)
+    "CREATE EXTENSION IF NOT EXISTS fuzzystrmatch",
+    """
+        CREATE INDEX IF NOT EXISTS idx_customers_name_key ON customers
+        ((NULLIF(soundex(last_name), '') || ':' || lower(left(first_name, 1))))
+    """,
+    """
+        CREATE INDEX IF NOT EXISTS idx_customers_zip_name_key ON customers
+        ((NULLIF(left(zip_code, 5), '') || ':' || NULLIF(soundex(last_name), '')))
+    """,
+    # One job per estimate even for concurrent conversions (see convert_estimates_to_jobs);
+    # fails, and is retried on the next start, while older duplicate jobs remain
+    "CREATE UNIQUE INDEX IF NOT EXISTS idx_jobs_estimate_unique ON jobs(estimate_id)"
+]
+
 def init_database():
-    """Initialize database - tables already created in Supabase"""
+    """Initialize database - core tables already created in Supabase, apply schema additions"""
+    conn = get_connection()
+    if not conn:
+        return False
+    
+    try:
+        cursor = conn.cursor()
+        for statement in SCHEMA_UPDATES:
+            cursor.execute(statement)
+        conn.commit()
+    except Exception as e:
+        st.error(f"Database initialization error: {str(e)}")
+        conn.rollback()
+        conn.close()
+        return False
+    
+    for statement in OPTIONAL_SCHEMA_UPDATES:
+        try:
+            cursor.execute(statement)
+            conn.commit()
+        except Exception as e:
+            print(f"Warning: Skipped optional schema update: {e}")
+            conn.rollback()
+    
+    cursor.close()
+    conn.close()
     return True
 
+# Callables run as hook(query, params, result) after each committed write
+_write_hooks = []
+
+def register_write_hook(hook):
+    """Register a callable to be notified of writes made through execute_query"""
+    if hook not in _write_hooks:
+        _write_hooks.append(hook)
+
 def execute_query(query, params=None, fetch=False):
     """Execute database query"""
     conn = get_connection()
@@ -41,7 +277,10 @@ def execute_query(query, params=None, fetch=False):
         cursor.execute(query, params)
         
         # Determine if this is a write operation that needs to be committed
-        is_write_operation = query.strip().upper().startswith(('INSERT', 'UPDATE', 'DELETE', 'CREATE', 'DROP', 'ALTER'))
+        statement = query.strip().upper()
+        is_write_operation = statement.startswith(('INSERT', 'UPDATE', 'DELETE', 'CREATE', 'DROP', 'ALTER')) or (
+            statement.startswith('WITH') and any(keyword in statement for keyword in ('INSERT ', 'UPDATE ', 'DELETE '))
+        )
         
         if fetch:
             result = cursor.fetchall()
@@ -54,6 +293,14 @@ def execute_query(query, params=None, fetch=False):
         
         cursor.close()
         conn.close()
+        
+        if is_write_operation:
+            for hook in _write_hooks:
+                try:
+                    hook(query, params, result)
+                except Exception as e:
+                    print(f"Warning: Write hook failed: {e}")
+        
         return result
     except Exception as e:
         st.error(f"Database query error: {str(e)}")
@@ -68,6 +315,73 @@ def get_user_by_username(username):
     result = execute_query(query, (username,), fetch=True)
     return result[0] if result else None
 
+# Columns that can be written through the buffered user activity flush
+USER_ACTIVITY_COLUMNS = ('last_login',)
+
+def update_user_activity(column, activity):
+    """Apply a batch of {user_id: timestamp} activity updates in one statement"""
+    if column not in USER_ACTIVITY_COLUMNS:
+        raise ValueError(f"Unsupported user activity column: {column}")
+    if not activity:
+        return 0
+
+    conn = get_connection()
+    if not conn:
+        return None
+
+    try:
+        cursor = conn.cursor()
+        # GREATEST keeps the newest value if an older batch lands late
+        psycopg2.extras.execute_values(
+            cursor,
+            f"""
+                UPDATE users SET {column} = GREATEST(users.{column}, v.ts)
+                FROM (VALUES %s) AS v(id, ts)
+                WHERE users.id = v.id
+            """,
+            list(activity.items()),
+            template="(%s, %s::timestamp)"
+        )
+        updated = cursor.rowcount
+        conn.commit()
+        cursor.close()
+        conn.close()
+        return updated
+    except Exception as e:
+        print(f"Warning: Failed to update user activity: {e}")
+        conn.rollback()
+        conn.close()
+        return None
+
+def insert_audit_events(events):
+    """Append a batch of (occurred_at, user_id, username, event_type, action, entity, entity_id, details) rows"""
+    if not events:
+        return 0
+
+    conn = get_connection()
+    if not conn:
+        return None
+
+    try:
+        cursor = conn.cursor()
+        psycopg2.extras.execute_values(
+            cursor,
+            """
+                INSERT INTO audit_events (occurred_at, user_id, username, event_type, action, entity, entity_id, details)
+                VALUES %s
+            """,
+            events
+        )
+        conn.commit()
+        cursor.close()
+        conn.close()
+        return len(events)
+    except Exception as e:
+        print(f"Warning: Failed to write audit events: {e}")
+        conn.rollback()
+        conn.close()
+        return None
+
 def create_estimate(data):
     """Create new estimate"""
     # If no customer_id provided, try to find or create customer
@@ -100,18 +414,80 @@ def update_estimate_status(estimate_id, status):
     query = "UPDATE estimates SET status = %s, updated_at = CURRENT_TIMESTAMP WHERE id = %s"
     return execute_query(query, (status, estimate_id))
 
-def create_job_from_estimate(estimate_id, job_data):
-    """Create job from approved estimate"""
+def update_estimates_status(estimate_ids, status):
+    """Update the status of several estimates in one statement"""
+    query = "UPDATE estimates SET status = %s, updated_at = CURRENT_TIMESTAMP WHERE id = ANY(%s)"
+    return execute_query(query, (status, list(estimate_ids)))
+
+# Job fields that can be set per estimate when converting estimates to jobs
+JOB_CONVERSION_FIELDS = ('job_title', 'start_date', 'actual_cost', 'assigned_crew', 'notes')
+
+def convert_estimates_to_jobs(estimate_ids, defaults=None, overrides=None):
+    """Approve estimates and create their jobs in a single statement (one transaction).
+
+    defaults holds job fields applied to every job; overrides maps an estimate id to
+    fields for that job only. Jobs otherwise take the estimate's title, client and cost.
+    Rejected estimates and estimates that already have a job are skipped; the unique index on
+    jobs.estimate_id also stops a concurrent conversion of the same estimate from adding a
+    second job. Returns [{'estimate_id', 'job_id'}] for the jobs created, or None on failure.
+    """
+    from audit import audit_log
+    
+    defaults = defaults or {}
+    job_overrides = [
+        {
+            'estimate_id': estimate_id,
+            **{field: str(value) if isinstance(value, date) else value
+               for field, value in fields.items() if field in JOB_CONVERSION_FIELDS}
+        }
+        for estimate_id, fields in (overrides or {}).items()
+    ]
     query = """
-        INSERT INTO jobs (estimate_id, job_title, client_name, start_date, 
-                         actual_cost, assigned_crew, notes)
-        VALUES (%(estimate_id)s, %(job_title)s, %(client_name)s, %(start_date)s,
-                %(actual_cost)s, %(assigned_crew)s, %(notes)s)
-        RETURNING id
+        WITH approved AS (
+            UPDATE estimates e SET status = 'approved', updated_at = CURRENT_TIMESTAMP
+            WHERE e.id = ANY(%(ids)s)
+            AND e.status <> 'rejected'
+            AND NOT EXISTS (SELECT 1 FROM jobs j WHERE j.estimate_id = e.id)
+            RETURNING e.id, e.project_title, e.client_name, e.estimated_cost
+        ),
+        created AS (
+            INSERT INTO jobs (estimate_id, job_title, client_name, start_date,
+                             actual_cost, assigned_crew, notes)
+            SELECT a.id,
+                   COALESCE(NULLIF(o.job_title, ''), a.project_title),
+                   a.client_name,
+                   COALESCE(o.start_date, %(start_date)s),
+                   COALESCE(o.actual_cost, a.estimated_cost),
+                   COALESCE(NULLIF(o.assigned_crew, ''), %(assigned_crew)s),
+                   COALESCE(NULLIF(o.notes, ''), %(notes)s)
+            FROM approved a
+            LEFT JOIN jsonb_to_recordset(%(overrides)s::JSONB) AS o(
+                estimate_id INTEGER, job_title TEXT, start_date DATE, actual_cost NUMERIC,
+                assigned_crew TEXT, notes TEXT
+            ) ON o.estimate_id = a.id
+            ON CONFLICT DO NOTHING
+            RETURNING id, estimate_id
+        )
+        SELECT estimate_id, id AS job_id FROM created ORDER BY estimate_id
     """
-    job_data['estimate_id'] = estimate_id
-    result = execute_query(query, job_data, fetch=True)
-    return result[0]['id'] if result else None
+    params = {
+        'ids': list(estimate_ids),
+        'start_date': defaults.get('start_date'),
+        'assigned_crew': defaults.get('assigned_crew') or None,
+        'notes': defaults.get('notes') or None,
+        'overrides': psycopg2.extras.Json(job_overrides)
+    }
+    result = execute_query(query, params, fetch=True)
+    
+    # The write hook only sees the estimates UPDATE at the head of the statement
+    for row in result or []:
+        audit_log.record('data', 'insert', 'jobs', row['job_id'], f"Created from estimate #{row['estimate_id']}")
+    return result
+
+def create_job_from_estimate(estimate_id, job_data):
+    """Create job from approved estimate"""
+    result = convert_estimates_to_jobs([estimate_id], overrides={estimate_id: job_data})
+    return result[0]['job_id'] if result else None
 
 def get_jobs(status=None):
     """Get jobs with optional status filter"""
@@ -127,6 +503,159 @@ def get_jobs(status=None):
     query += " ORDER BY j.created_at DESC"
     return execute_query(query, params, fetch=True) or []
 
+# Jobs board sort choices -> ORDER BY clause
+JOB_SORT_ORDERS = {
+    'Created Date': "j.created_at DESC",
+    'Start Date': "j.start_date DESC NULLS LAST",
+    'Client Name': "j.client_name",
+    'Cost': "j.actual_cost DESC NULLS LAST"
+}
+
+def _job_board_filters(status=None, crew=None, start_date=None, end_date=None, search=None):
+    conditions = []
+    params = []
+
+    if status:
+        conditions.append("j.status = %s")
+        params.append(status)
+
+    if crew == '':
+        conditions.append("COALESCE(j.assigned_crew, '') = ''")
+    elif crew:
+        conditions.append("j.assigned_crew = %s")
+        params.append(crew)
+
+    if start_date or end_date:
+        # Jobs scheduled to overlap the range (uses idx_jobs_schedule)
+        conditions.append("j.start_date IS NOT NULL")
+        conditions.append("daterange(j.start_date, GREATEST(j.end_date, j.start_date), '[]') && daterange(%s, %s, '[]')")
+        params.extend([start_date, end_date])
+
+    if search:
+        conditions.append("(j.job_title ILIKE %s OR j.client_name ILIKE %s OR j.assigned_crew ILIKE %s)")
+        params.extend([f"%{search}%"] * 3)
+
+    where = f"WHERE {' AND '.join(conditions)}" if conditions else ""
+    return where, params
+
+def get_jobs_page(status=None, crew=None, start_date=None, end_date=None, search=None,
+                  sort='Created Date', limit=50, offset=0):
+    """Get one page of jobs for the jobs board (crew '' means unassigned)"""
+    where, params = _job_board_filters(status, crew, start_date, end_date, search)
+    query = f"""
+        SELECT j.id, j.job_title, j.client_name, j.status, j.assigned_crew,
+               j.start_date, j.end_date, j.actual_cost, j.profit_margin
+        FROM jobs j
+        {where}
+        ORDER BY {JOB_SORT_ORDERS[sort]}, j.id DESC
+        LIMIT %s OFFSET %s
+    """
+    return execute_query(query, params + [limit, offset], fetch=True) or []
+
+def count_jobs(status=None, crew=None, start_date=None, end_date=None, search=None):
+    """Count jobs matching the jobs board filters"""
+    where, params = _job_board_filters(status, crew, start_date, end_date, search)
+    result = execute_query(f"SELECT COUNT(*) AS count FROM jobs j {where}", params, fetch=True)
+    return result[0]['count'] if result else 0
+
+def get_jobs_in_window(start_date, end_date, crew=None):
+    """Get scheduled jobs whose dates overlap a window (inclusive), optionally for one crew"""
+    query = """
+        SELECT j.*, e.project_title as estimate_title, e.customer_id
+        FROM jobs j
+        LEFT JOIN estimates e ON j.estimate_id = e.id
+        WHERE j.start_date IS NOT NULL
+        AND daterange(j.start_date, GREATEST(j.end_date, j.start_date), '[]') && daterange(%s, %s, '[]')
+    """
+    params = [start_date, end_date]
+    
+    if crew == '':
+        query += " AND COALESCE(j.assigned_crew, '') = ''"
+    elif crew:
+        query += " AND j.assigned_crew = %s"
+        params.append(crew)
+    
+    query += " ORDER BY j.start_date, j.id"
+    return execute_query(query, params, fetch=True) or []
+
+def get_job_crews():
+    """Get the distinct crews jobs are assigned to"""
+    query = """
+        SELECT DISTINCT assigned_crew FROM jobs
+        WHERE COALESCE(assigned_crew, '') <> ''
+        ORDER BY assigned_crew
+    """
+    return [row['assigned_crew'] for row in execute_query(query, fetch=True) or []]
+
+# Profit margin percentiles reported by get_job_analytics
+JOB_MARGIN_PERCENTILES = (10, 25, 50, 75, 90)
+
+def get_job_analytics(period=None):
+    """Get job totals, status counts, monthly completions and margin percentiles in one query.
+    
+    period is a number of calendar months including the current one (None for all time).
+    Totals cover jobs created in the period; completions are bucketed by end_date.
+    """
+    since = None
+    if period:
+        month = date.today().replace(day=1)
+        for _ in range(period - 1):
+            month = (month - timedelta(days=1)).replace(day=1)
+        since = month
+    
+    query = """
+        WITH scoped AS (
+            SELECT status, actual_cost, NULLIF(profit_margin, 0)::FLOAT8 AS profit_margin
+            FROM jobs
+            WHERE %(since)s::DATE IS NULL OR created_at >= %(since)s::DATE
+        ),
+        completions AS (
+            SELECT DATE_TRUNC('month', end_date)::DATE AS month, COUNT(*) AS completed
+            FROM jobs
+            WHERE status = 'completed' AND end_date IS NOT NULL
+            AND (%(since)s::DATE IS NULL OR end_date >= %(since)s::DATE)
+            GROUP BY 1
+        ),
+        months AS (
+            SELECT generate_series(
+                COALESCE(%(since)s::DATE, (SELECT MIN(month) FROM completions)),
+                DATE_TRUNC('month', GREATEST(CURRENT_DATE, (SELECT MAX(month) FROM completions)))::DATE,
+                INTERVAL '1 month'
+            )::DATE AS month
+        )
+        SELECT totals.*,
+            (
+                SELECT COALESCE(json_object_agg(status, jobs), '{}')
+                FROM (SELECT COALESCE(status, 'unknown') AS status, COUNT(*) AS jobs FROM scoped GROUP BY 1) s
+            ) AS status_counts,
+            (
+                SELECT COALESCE(json_agg(json_build_object('month', m.month, 'completed', COALESCE(c.completed, 0)) ORDER BY m.month), '[]')
+                FROM months m
+                LEFT JOIN completions c ON c.month = m.month
+            ) AS monthly_completions
+        FROM (
+            SELECT
+                COUNT(*) AS total_jobs,
+                COUNT(*) FILTER (WHERE status = 'completed') AS completed_jobs,
+                COALESCE(SUM(actual_cost), 0) AS total_revenue,
+                COUNT(profit_margin) AS margin_jobs,
+                AVG(profit_margin) AS avg_margin,
+                COALESCE(SUM(actual_cost * profit_margin / 100), 0) AS total_profit,
+                percentile_cont(%(fractions)s::FLOAT8[]) WITHIN GROUP (ORDER BY profit_margin)
+                    FILTER (WHERE profit_margin IS NOT NULL) AS margin_percentiles
+            FROM scoped
+        ) totals
+    """
+    params = {'since': since, 'fractions': [p / 100 for p in JOB_MARGIN_PERCENTILES]}
+    result = execute_query(query, params, fetch=True)
+    if not result:
+        return None
+    
+    analytics = dict(result[0])
+    analytics['margin_percentiles'] = dict(zip(JOB_MARGIN_PERCENTILES, analytics['margin_percentiles'] or []))
+    analytics['avg_job_value'] = analytics['total_revenue'] / analytics['total_jobs'] if analytics['total_jobs'] else 0
+    return analytics
+
 def get_job_details(job_id):
     """Get job details by ID"""
     query = """
@@ -177,7 +706,7 @@ def get_financial_summary():
     """
     return execute_query(query, fetch=True) or []
 
-def get_monthly_revenue():
+def get_monthly_revenue(months=12):
     """Get monthly revenue data"""
     query = """
         SELECT 
@@ -185,11 +714,11 @@ def get_monthly_revenue():
             SUM(CASE WHEN record_type = 'income' THEN amount ELSE 0 END) as revenue,
             SUM(CASE WHEN record_type = 'expense' THEN amount ELSE 0 END) as expenses
         FROM financial_records 
-        WHERE transaction_date >= CURRENT_DATE - INTERVAL '12 months'
+        WHERE transaction_date >= CURRENT_DATE - %s * INTERVAL '1 month'
         GROUP BY DATE_TRUNC('month', transaction_date)
         ORDER BY month
     """
-    return execute_query(query, fetch=True) or []
+    return execute_query(query, (months,), fetch=True) or []
 
 # Customer Management Functions
 
@@ -226,6 +755,63 @@ def get_customers(status=None, search=None):
     query += " ORDER BY created_at DESC"
     return execute_query(query, params, fetch=True) or []
 
+def _customer_filters(status=None, customer_type=None, search=None):
+    conditions = []
+    params = []
+
+    if status:
+        conditions.append("c.status = %s")
+        params.append(status)
+
+    if customer_type:
+        conditions.append("c.customer_type = %s")
+        params.append(customer_type)
+
+    if search:
+        conditions.append("(c.first_name ILIKE %s OR c.last_name ILIKE %s OR c.email ILIKE %s OR c.company_name ILIKE %s)")
+        params.extend([f"%{search}%"] * 4)
+
+    where = f"WHERE {' AND '.join(conditions)}" if conditions else ""
+    return where, params
+
+def get_customers_page(status=None, customer_type=None, search=None, limit=50, offset=0):
+    """Get one page of customers, newest first, with estimate/job/revenue totals for each"""
+    where, params = _customer_filters(status, customer_type, search)
+    query = f"""
+        WITH page AS (
+            SELECT c.* FROM customers c
+            {where}
+            ORDER BY c.created_at DESC, c.id DESC
+            LIMIT %s OFFSET %s
+        )
+        SELECT p.*, s.total_estimates, s.total_jobs, s.total_revenue
+        FROM page p
+        CROSS JOIN LATERAL (
+            SELECT COUNT(DISTINCT e.id) AS total_estimates,
+                   COUNT(j.id) AS total_jobs,
+                   COALESCE(SUM(j.actual_cost), 0) AS total_revenue
+            FROM estimates e
+            LEFT JOIN jobs j ON e.id = j.estimate_id
+            WHERE e.customer_id = p.id
+        ) s
+        ORDER BY p.created_at DESC, p.id DESC
+    """
+    return execute_query(query, params + [limit, offset], fetch=True) or []
+
+def get_customer_counts(status=None, customer_type=None, search=None):
+    """Count customers matching the list filters, broken down by status and type"""
+    where, params = _customer_filters(status, customer_type, search)
+    query = f"""
+        SELECT COUNT(*) AS total,
+               COUNT(*) FILTER (WHERE c.status = 'active') AS active,
+               COUNT(*) FILTER (WHERE c.customer_type = 'commercial') AS commercial,
+               COUNT(*) FILTER (WHERE c.customer_type = 'residential') AS residential
+        FROM customers c
+        {where}
+    """
+    result = execute_query(query, params, fetch=True)
+    return result[0] if result else {'total': 0, 'active': 0, 'commercial': 0, 'residential': 0}
+
 def get_customer_by_id(customer_id):
     """Get customer by ID"""
     query = "SELECT * FROM customers WHERE id = %s"
@@ -300,18 +886,21 @@ def get_pending_follow_ups():
 
 def find_or_create_customer_from_estimate(estimate_data):
     """Find existing customer or create new one from estimate data"""
-    # Try to find existing customer by email or phone
-    if estimate_data.get('client_email'):
-        existing = execute_query(
-            "SELECT id FROM customers WHERE email = %s LIMIT 1", 
-            (estimate_data['client_email'],), 
-            fetch=True
-        )
-        if existing:
-            return existing[0]['id']
+    from customer_matching import find_matching_customer
     
-    # Create new customer from estimate data
     names = estimate_data['client_name'].split(' ', 1)
+    
+    # An exact email match wins; otherwise match on email, phone and name (fuzzy, see customer_matching)
+    existing, _ = find_matching_customer({
+        'first_name': names[0],
+        'last_name': names[1] if len(names) > 1 else '',
+        'email': estimate_data.get('client_email'),
+        'phone': estimate_data.get('client_phone')
+    })
+    if existing:
+        return existing['id']
+    
+    # Create new customer from estimate data
     customer_data = {
         'first_name': names[0],
         'last_name': names[1] if len(names) > 1 else '',
@@ -333,23 +922,129 @@ def get_customer_projects_summary(customer_id):
     """Get summary of all projects/jobs for a customer"""
     query = """
         SELECT 
-            COUNT(e.id) as total_estimates,
-            COUNT(CASE WHEN e.status = 'approved' THEN 1 END) as approved_estimates,
+            (SELECT COUNT(*) FROM estimates e WHERE e.customer_id = %(id)s) as total_estimates,
+            (SELECT COUNT(*) FROM estimates e WHERE e.customer_id = %(id)s AND e.status = 'approved') as approved_estimates,
             COUNT(j.id) as total_jobs,
             COUNT(CASE WHEN j.status = 'completed' THEN 1 END) as completed_jobs,
             COALESCE(SUM(j.actual_cost), 0) as total_revenue
-        FROM customers c
-        LEFT JOIN estimates e ON c.id = e.customer_id
-        LEFT JOIN jobs j ON e.id = j.estimate_id
-        WHERE c.id = %s
-        GROUP BY c.id
+        FROM jobs j
+        JOIN estimates e ON e.id = j.estimate_id
+        WHERE e.customer_id = %(id)s
     """
-    result = execute_query(query, (customer_id,), fetch=True)
+    result = execute_query(query, {'id': customer_id}, fetch=True)
     return result[0] if result else {
         'total_estimates': 0, 'approved_estimates': 0, 'total_jobs': 0, 
         'completed_jobs': 0, 'total_revenue': 0
     }
 
+# Related rows returned per list by get_customer_360
+CUSTOMER_360_LIMIT = 10
+
+# JSON date fields converted back to date/datetime objects by get_customer_360
+_CUSTOMER_360_DATES = {
+    'contact_date': datetime.fromisoformat,
+    'created_at': datetime.fromisoformat,
+    'follow_up_date': date.fromisoformat,
+    'start_date': date.fromisoformat,
+    'end_date': date.fromisoformat,
+    'invoice_date': date.fromisoformat,
+    'due_date': date.fromisoformat
+}
+
+def get_customer_360(customer_id, limit=CUSTOMER_360_LIMIT):
+    """Get a customer with their totals, recent contacts, estimates, jobs, invoices and documents.
+
+    Each related table is aggregated in its own lateral subquery, so totals are not
+    multiplied by joins (e.g. an estimate with several jobs is counted once).
+    Returns None if the customer does not exist.
+    """
+    query = """
+        SELECT c.*, est.*, jb.*, inv.*, doc.*, recent_contacts.contacts
+        FROM customers c
+        CROSS JOIN LATERAL (
+            SELECT COUNT(*) AS total_estimates,
+                   COUNT(*) FILTER (WHERE e.status = 'approved') AS approved_estimates,
+                   COALESCE(SUM(e.estimated_cost), 0) AS total_estimated,
+                   COALESCE((
+                       SELECT json_agg(r ORDER BY r.created_at DESC)
+                       FROM (
+                           SELECT id, project_title, status, estimated_cost, created_at
+                           FROM estimates WHERE customer_id = c.id
+                           ORDER BY created_at DESC LIMIT %(limit)s
+                       ) r
+                   ), '[]') AS estimates
+            FROM estimates e
+            WHERE e.customer_id = c.id
+        ) est
+        CROSS JOIN LATERAL (
+            SELECT COUNT(*) AS total_jobs,
+                   COUNT(*) FILTER (WHERE j.status = 'completed') AS completed_jobs,
+                   COALESCE(SUM(j.actual_cost), 0) AS total_revenue,
+                   COALESCE((
+                       SELECT json_agg(r ORDER BY r.created_at DESC)
+                       FROM (
+                           SELECT j2.id, j2.job_title, j2.status, j2.start_date, j2.end_date, j2.actual_cost, j2.created_at
+                           FROM jobs j2 JOIN estimates e2 ON e2.id = j2.estimate_id
+                           WHERE e2.customer_id = c.id
+                           ORDER BY j2.created_at DESC LIMIT %(limit)s
+                       ) r
+                   ), '[]') AS jobs
+            FROM jobs j
+            JOIN estimates e ON e.id = j.estimate_id
+            WHERE e.customer_id = c.id
+        ) jb
+        CROSS JOIN LATERAL (
+            SELECT COUNT(*) AS total_invoices,
+                   COALESCE(SUM(i.total_amount), 0) AS total_invoiced,
+                   COALESCE(SUM(i.paid_amount), 0) AS total_paid,
+                   COALESCE(SUM(i.total_amount - COALESCE(i.paid_amount, 0)), 0) AS balance_due,
+                   COALESCE((
+                       SELECT json_agg(r ORDER BY r.invoice_date DESC, r.id DESC)
+                       FROM (
+                           SELECT id, invoice_number, invoice_date, due_date, total_amount, paid_amount,
+                                  total_amount - COALESCE(paid_amount, 0) AS balance, payment_status
+                           FROM invoices WHERE customer_id = c.id
+                           ORDER BY invoice_date DESC, id DESC LIMIT %(limit)s
+                       ) r
+                   ), '[]') AS invoices
+            FROM invoices i
+            WHERE i.customer_id = c.id
+        ) inv
+        CROSS JOIN LATERAL (
+            SELECT COALESCE(SUM(t.count), 0) AS total_documents,
+                   COALESCE(json_object_agg(t.document_type, t.count), '{}') AS document_counts
+            FROM (
+                SELECT d.document_type, COUNT(*) AS count
+                FROM documents d
+                WHERE d.customer_id = c.id AND d.is_active = TRUE
+                GROUP BY d.document_type
+            ) t
+        ) doc
+        CROSS JOIN LATERAL (
+            SELECT COALESCE(json_agg(r ORDER BY r.contact_date DESC), '[]') AS contacts
+            FROM (
+                SELECT cc.id, cc.contact_type, cc.subject, cc.contact_date, cc.follow_up_date,
+                       cc.completed, u.full_name AS created_by_name
+                FROM customer_contacts cc
+                LEFT JOIN users u ON cc.created_by = u.id
+                WHERE cc.customer_id = c.id
+                ORDER BY cc.contact_date DESC LIMIT %(limit)s
+            ) r
+        ) recent_contacts
+        WHERE c.id = %(id)s
+    """
+    result = execute_query(query, {'id': customer_id, 'limit': limit}, fetch=True)
+    if not result:
+        return None
+
+    customer = dict(result[0])
+    for key in ('contacts', 'estimates', 'jobs', 'invoices'):
+        for row in customer[key]:
+            for field, parse in _CUSTOMER_360_DATES.items():
+                if row.get(field):
+                    row[field] = parse(row[field])
+    return customer
+
 # Invoice Management Functions
 
 def generate_invoice_number():
@@ -364,7 +1059,11 @@ def generate_invoice_number():
     return f"INV-{year}-{suffix}"
 
 def create_invoice(data):
-    """Create new invoice from job data"""
+    """Create new invoice from job data.
+
+    The subtotal and total start at zero (plus tax) and are kept up to date by the
+    invoice_items trigger as line items are added with add_invoice_item.
+    """
     # Generate invoice number if not provided
     if 'invoice_number' not in data:
         data['invoice_number'] = generate_invoice_number()
@@ -379,7 +1078,7 @@ def create_invoice(data):
         INSERT INTO invoices (customer_id, job_id, invoice_number, due_date, 
                             subtotal, tax_amount, total_amount, created_by)
         VALUES (%(customer_id)s, %(job_id)s, %(invoice_number)s, %(due_date)s,
-                %(subtotal)s, %(tax_amount)s, %(total_amount)s, %(created_by)s)
+                0, %(tax_amount)s, %(tax_amount)s, %(created_by)s)
         RETURNING id
     """
     result = execute_query(query, data, fetch=True)
@@ -393,27 +1092,10 @@ def add_invoice_item(invoice_id, description, quantity, unit_price):
         VALUES (%s, %s, %s, %s, %s)
         RETURNING id
     """
+    # The invoice_items trigger adds the line to the invoice subtotal and total
     result = execute_query(query, (invoice_id, description, quantity, unit_price, line_total), fetch=True)
-    
-    # Update invoice totals
-    update_invoice_totals(invoice_id)
     return result[0]['id'] if result else None
 
-def update_invoice_totals(invoice_id):
-    """Recalculate invoice totals based on line items"""
-    query = """
-        UPDATE invoices 
-        SET subtotal = (
-            SELECT COALESCE(SUM(line_total), 0) 
-            FROM invoice_items 
-            WHERE invoice_id = %s
-        ),
-        total_amount = subtotal + tax_amount,
-        updated_at = CURRENT_TIMESTAMP
-        WHERE id = %s
-    """
-    return execute_query(query, (invoice_id, invoice_id))
-
 def get_invoices(status=None, customer_id=None):
     """Get invoices with optional filters"""
     query = """
@@ -438,27 +1120,34 @@ def get_invoices(status=None, customer_id=None):
 
 def get_invoice_details(invoice_id):
     """Get invoice with line items"""
+    invoices = get_invoice_details_batch([invoice_id])
+    return invoices[0] if invoices else None
+
+def get_invoice_details_batch(invoice_ids):
+    """Get several invoices with their line items in two queries, in invoice_ids order"""
     invoice_query = """
         SELECT i.*, c.first_name, c.last_name, c.email, c.phone, c.address, 
                c.city, c.state, c.zip_code, j.job_title
         FROM invoices i
         LEFT JOIN customers c ON i.customer_id = c.id
         LEFT JOIN jobs j ON i.job_id = j.id
-        WHERE i.id = %s
+        WHERE i.id = ANY(%s)
     """
     items_query = """
         SELECT * FROM invoice_items 
-        WHERE invoice_id = %s 
-        ORDER BY id
+        WHERE invoice_id = ANY(%s) 
+        ORDER BY invoice_id, id
     """
     
-    invoice = execute_query(invoice_query, (invoice_id,), fetch=True)
-    items = execute_query(items_query, (invoice_id,), fetch=True)
+    invoice_ids = list(invoice_ids)
+    invoices = {row['id']: row for row in execute_query(invoice_query, (invoice_ids,), fetch=True) or []}
+    for invoice in invoices.values():
+        invoice['items'] = []
+    for item in execute_query(items_query, (invoice_ids,), fetch=True) or []:
+        if item['invoice_id'] in invoices:
+            invoices[item['invoice_id']]['items'].append(item)
     
-    if invoice:
-        invoice[0]['items'] = items or []
-        return invoice[0]
-    return None
+    return [invoices[invoice_id] for invoice_id in invoice_ids if invoice_id in invoices]
 
 def update_payment_status(invoice_id, payment_data):
     """Update invoice payment status"""
@@ -491,9 +1180,7 @@ def generate_invoice_from_job(job_id, created_by):
     invoice_data = {
         'customer_id': job.get('customer_id'),
         'job_id': job_id,
-        'subtotal': subtotal,
         'tax_amount': tax_amount,
-        'total_amount': total_amount,
         'created_by': created_by
     }
     
@@ -533,18 +1220,17 @@ def get_overdue_invoices():
     return execute_query(query, fetch=True) or []
 
 def get_invoice_statistics():
-    """Get invoice summary statistics"""
+    """Get invoice summary statistics from the trigger-maintained ar_summary row"""
     query = """
         SELECT 
-            COUNT(*) as total_invoices,
-            COUNT(CASE WHEN payment_status = 'paid' THEN 1 END) as paid_invoices,
-            COUNT(CASE WHEN payment_status = 'unpaid' THEN 1 END) as unpaid_invoices,
-            COUNT(CASE WHEN payment_status = 'partial' THEN 1 END) as partial_invoices,
-            COUNT(CASE WHEN due_date < CURRENT_DATE AND payment_status IN ('unpaid', 'partial') THEN 1 END) as overdue_invoices,
-            COALESCE(SUM(total_amount), 0) as total_billed,
-            COALESCE(SUM(paid_amount), 0) as total_collected,
-            COALESCE(SUM(total_amount - paid_amount), 0) as outstanding_amount
-        FROM invoices
+            s.total_invoices, s.paid_invoices, s.unpaid_invoices, s.partial_invoices,
+            (
+                SELECT COUNT(*) FROM invoices
+                WHERE payment_status IN ('unpaid', 'partial') AND due_date < CURRENT_DATE
+            ) as overdue_invoices,
+            s.total_billed, s.total_collected,
+            s.total_billed - s.total_collected as outstanding_amount
+        FROM ar_summary s
     """
     result = execute_query(query, fetch=True)
     return result[0] if result else {}
@@ -574,16 +1260,17 @@ def upload_document(document_data):
         'category': document_data.get('category'),
         'description': document_data.get('description'),
         'tags': document_data.get('tags'),
+        'content_hash': document_data.get('content_hash'),
         'uploaded_by': document_data['uploaded_by']
     }
     
     query = """
         INSERT INTO documents (customer_id, job_id, filename, original_filename, file_path, 
                              file_size, mime_type, document_type, category, description, 
-                             tags, uploaded_by)
+                             tags, content_hash, uploaded_by)
         VALUES (%(customer_id)s, %(job_id)s, %(filename)s, %(original_filename)s, %(file_path)s,
                 %(file_size)s, %(mime_type)s, %(document_type)s, %(category)s, %(description)s,
-                %(tags)s, %(uploaded_by)s)
+                %(tags)s, %(content_hash)s, %(uploaded_by)s)
         RETURNING id
     """
     
@@ -673,10 +1360,17 @@ def archive_document(document_id, user_id):
     return success
 
 def log_document_access(document_id, user_id, access_type, ip_address=None, user_agent=None):
-    """Log document access for security tracking"""
+    """Log document access for security tracking and bump the daily rollup"""
     query = """
-        INSERT INTO document_access_log (document_id, user_id, access_type, ip_address, user_agent)
-        VALUES (%s, %s, %s, %s, %s)
+        WITH logged AS (
+            INSERT INTO document_access_log (document_id, user_id, access_type, ip_address, user_agent)
+            VALUES (%s, %s, %s, %s, %s)
+            RETURNING document_id, user_id, access_type, accessed_at
+        )
+        INSERT INTO document_access_daily (access_date, document_id, user_id, access_type, access_count)
+        SELECT accessed_at::date, document_id, COALESCE(user_id, 0), access_type, 1 FROM logged
+        ON CONFLICT (access_date, document_id, user_id, access_type)
+        DO UPDATE SET access_count = document_access_daily.access_count + 1
     """
     return execute_query(query, (document_id, user_id, access_type, ip_address, user_agent))
 
@@ -714,6 +1408,72 @@ def get_recent_document_activity(limit=10):
     """
     return execute_query(query, (limit,), fetch=True) or []
 
+def get_document_access_log(since, access_type=None, user_id=None, limit=500):
+    """Get access log entries since a timestamp (only the matching partitions are scanned)"""
+    query = """
+        SELECT dal.*, d.original_filename, d.document_type, u.full_name as user_name,
+               c.first_name, c.last_name
+        FROM document_access_log dal
+        JOIN documents d ON dal.document_id = d.id
+        LEFT JOIN users u ON dal.user_id = u.id
+        LEFT JOIN customers c ON d.customer_id = c.id
+        WHERE dal.accessed_at >= %s
+    """
+    params = [since]
+    
+    if access_type:
+        query += " AND dal.access_type = %s"
+        params.append(access_type)
+    
+    if user_id is not None:
+        # The rollup records entries without a user as user 0
+        query += " AND COALESCE(dal.user_id, 0) = %s"
+        params.append(user_id)
+    
+    query += " ORDER BY dal.accessed_at DESC LIMIT %s"
+    params.append(limit)
+    return execute_query(query, params, fetch=True) or []
+
+def get_document_access_summary(since_date, access_type=None, user_id=None):
+    """Get access totals from the daily rollup"""
+    query = """
+        SELECT 
+            COALESCE(SUM(access_count), 0) as total_access,
+            COUNT(DISTINCT user_id) as unique_users,
+            COUNT(DISTINCT document_id) as unique_documents,
+            COALESCE(SUM(access_count) FILTER (WHERE access_type = 'download'), 0) as downloads
+        FROM document_access_daily
+        WHERE access_date >= %s
+    """
+    params = [since_date]
+    
+    if access_type:
+        query += " AND access_type = %s"
+        params.append(access_type)
+    
+    if user_id is not None:
+        query += " AND user_id = %s"
+        params.append(user_id)
+    
+    result = execute_query(query, params, fetch=True)
+    return result[0] if result else {'total_access': 0, 'unique_users': 0, 'unique_documents': 0, 'downloads': 0}
+
+def get_document_access_filters(since_date):
+    """Get the actions and users that appear in the rollup since a date"""
+    query = """
+        SELECT DISTINCT 'action' as kind, access_type as value, NULL::INTEGER as user_id
+        FROM document_access_daily WHERE access_date >= %s
+        UNION ALL
+        SELECT DISTINCT 'user', COALESCE(u.full_name, u.username, 'Unknown'), dad.user_id
+        FROM document_access_daily dad
+        LEFT JOIN users u ON dad.user_id = u.id
+        WHERE dad.access_date >= %s
+    """
+    rows = execute_query(query, (since_date, since_date), fetch=True) or []
+    actions = sorted(row['value'] for row in rows if row['kind'] == 'action')
+    users = sorted(((row['value'], row['user_id']) for row in rows if row['kind'] == 'user'))
+    return actions, users
+
 def search_documents_by_content(search_terms):
     """Search documents by filename, description, and tags"""
     query = """
@@ -796,52 +1556,24 @@ def get_conversion_metrics(start_date, end_date):
     
     return {'call_to_estimate_rate': 0, 'estimate_to_job_rate': 0, 'total_calls': 0, 'estimates_from_calls': 0, 'jobs_from_estimates': 0}
 
-def get_previous_period_success_rate(start_date, end_date):
-    """Get success rate for the previous period (for delta comparison)"""
-    from datetime import timedelta
-    
-    period_length = (end_date - start_date).days
-    prev_start = start_date - timedelta(days=period_length)
-    prev_end = start_date
-    
-    query = """
-        SELECT 
-            COUNT(*) as total_calls,
-            COUNT(CASE WHEN call_status = 'completed' THEN 1 END) as successful_calls
-        FROM ai_calls 
-        WHERE created_at >= %s AND created_at < %s
-    """
-    
-    try:
-        result = execute_query(query, (prev_start, prev_end), fetch=True)
-        if result:
-            total = result[0]['total_calls'] or 0
-            successful = result[0]['successful_calls'] or 0
-            return (successful / total * 100) if total > 0 else 0
-    except Exception as e:
-        print(f"Error calculating previous period success rate: {e}")
-    
-    return 0
-
-def get_call_performance_trends(days=30):
-    """Get call performance trends over time"""
+def get_call_performance_trends(days=30, bucket=None):
+    """Get call performance trends over time, one row per day/week/month (oldest first)"""
     from datetime import timedelta, date
-    
-    query = """
-        SELECT 
-            DATE(created_at) as call_date,
-            COUNT(*) as total_calls,
-            COUNT(CASE WHEN call_status = 'completed' THEN 1 END) as successful_calls,
-            AVG(call_duration) as avg_duration,
-            COUNT(CASE WHEN follow_up_required = TRUE THEN 1 END) as follow_ups_needed
-        FROM ai_calls 
-        WHERE created_at >= %s
-        GROUP BY DATE(created_at)
-        ORDER BY call_date DESC
-    """
+    from timeseries import get_bucketed_series
     
     start_date = date.today() - timedelta(days=days)
-    return execute_query(query, (start_date,), fetch=True) or []
+    rows = get_bucketed_series('ai_calls', 'created_at', {
+        'total_calls': "COUNT(*)",
+        'successful_calls': "COUNT(CASE WHEN call_status = 'completed' THEN 1 END)",
+        'avg_duration': "AVG(call_duration)",
+        'follow_ups_needed': "COUNT(CASE WHEN follow_up_required = TRUE THEN 1 END)"
+    }, start_date, bucket=bucket)
+    
+    for row in rows:
+        row['call_date'] = row['bucket']
+        for key in ('total_calls', 'successful_calls', 'follow_ups_needed'):
+            row[key] = row[key] or 0
+    return rows
 
 def get_call_outcome_analysis():
     """Analyze call outcomes and patterns"""
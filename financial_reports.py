@@ -0,0 +1,129 @@
+from database import execute_query
+from period_comparison import compare_periods
+
+# P&L revenue lines; income in any other category is reported as 'Other Income'
+PL_REVENUE_LINES = ['Client Payment', 'Other Income']
+
+# P&L expense lines; expenses in any other category are reported as 'Other Expenses'
+PL_EXPENSE_LINES = [
+    'Materials',
+    'Labor Costs',
+    'Equipment Purchase',
+    'Vehicle Expenses',
+    'Insurance',
+    'Marketing',
+    'Office Expenses',
+    'Subcontractor Payment',
+    'Other Expenses'
+]
+
+# Rows per page for the detailed transaction report
+DETAIL_PAGE_SIZE = 100
+
+_TOTALS = """
+    COALESCE(SUM(fr.amount) FILTER (WHERE fr.record_type = 'income'), 0) AS income,
+    COALESCE(SUM(fr.amount) FILTER (WHERE fr.record_type = 'expense'), 0) AS expense,
+    COUNT(*) FILTER (WHERE fr.record_type = 'income') AS income_count,
+    COUNT(*) FILTER (WHERE fr.record_type = 'expense') AS expense_count,
+    COUNT(*) AS count
+"""
+
+def _split_rollup(rows):
+    """Separate grouped rows from the grand total row produced by ROLLUP"""
+    groups = [row for row in rows if not row['is_total']]
+    total = next((row for row in rows if row['is_total']), None)
+    return groups, total
+
+def get_summary_report(start_date, end_date):
+    """Income/expense totals and counts for a date range"""
+    query = f"""
+        SELECT {_TOTALS}
+        FROM financial_records fr
+        WHERE fr.transaction_date BETWEEN %s AND %s
+    """
+    result = execute_query(query, (start_date, end_date), fetch=True)
+    return result[0] if result and result[0]['count'] else None
+
+def get_category_report(start_date, end_date):
+    """Totals per category plus a grand total row"""
+    query = f"""
+        SELECT COALESCE(fr.category, 'Uncategorized') AS category,
+               GROUPING(COALESCE(fr.category, 'Uncategorized')) = 1 AS is_total,
+               {_TOTALS}
+        FROM financial_records fr
+        WHERE fr.transaction_date BETWEEN %s AND %s
+        GROUP BY ROLLUP (COALESCE(fr.category, 'Uncategorized'))
+        ORDER BY is_total, category
+    """
+    return _split_rollup(execute_query(query, (start_date, end_date), fetch=True) or [])
+
+def get_job_report(start_date, end_date):
+    """Totals per job (unassigned transactions grouped together) plus a grand total row"""
+    query = f"""
+        SELECT fr.job_id, j.job_title, j.client_name,
+               GROUPING(fr.job_id) = 1 AS is_total,
+               {_TOTALS}
+        FROM financial_records fr
+        LEFT JOIN jobs j ON fr.job_id = j.id
+        WHERE fr.transaction_date BETWEEN %s AND %s
+        GROUP BY ROLLUP ((fr.job_id, j.job_title, j.client_name))
+        ORDER BY is_total, fr.job_id IS NULL, j.job_title
+    """
+    return _split_rollup(execute_query(query, (start_date, end_date), fetch=True) or [])
+
+def get_pl_comparison(periods):
+    """P&L line and section totals for each (label, start, end) period, from one query.
+
+    Returns a list in period order; periods without transactions are None.
+    """
+    rows = compare_periods(
+        'financial_records', 'transaction_date', periods,
+        {'amount': ('SUM(amount)', None), 'count': ('COUNT(*)', None)},
+        group_by={
+            'section': "CASE WHEN record_type = 'income' THEN 'income' ELSE 'expense' END",
+            'line': """CASE
+                           WHEN record_type = 'income' AND category = ANY(%s) THEN category
+                           WHEN record_type = 'income' THEN 'Other Income'
+                           WHEN category = ANY(%s) THEN category
+                           ELSE 'Other Expenses'
+                       END"""
+        },
+        group_params=(PL_REVENUE_LINES, PL_EXPENSE_LINES)
+    )
+
+    statements = []
+    for index, (label, start_date, end_date) in enumerate(periods):
+        revenue = dict.fromkeys(PL_REVENUE_LINES, 0)
+        expenses = dict.fromkeys(PL_EXPENSE_LINES, 0)
+        count = 0
+        for row in rows:
+            values = row['periods'][index]
+            (revenue if row['section'] == 'income' else expenses)[row['line']] += values['amount']
+            count += values['count']
+
+        statements.append({
+            'label': label,
+            'revenue': revenue,
+            'expenses': expenses,
+            'period': f"{start_date} to {end_date}",
+            'total_revenue': sum(revenue.values()),
+            'total_expenses': sum(expenses.values())
+        } if count else None)
+
+    return statements
+
+def get_pl_statement(start_date, end_date):
+    """P&L line and section totals for a date range"""
+    return get_pl_comparison([("Current Period", start_date, end_date)])[0]
+
+def get_transactions_page(start_date, end_date, page=1, page_size=DETAIL_PAGE_SIZE):
+    """One page of transactions in a date range, newest first"""
+    query = """
+        SELECT fr.*, j.job_title, j.client_name
+        FROM financial_records fr
+        LEFT JOIN jobs j ON fr.job_id = j.id
+        WHERE fr.transaction_date BETWEEN %s AND %s
+        ORDER BY fr.transaction_date DESC, fr.id DESC
+        LIMIT %s OFFSET %s
+    """
+    return execute_query(query, (start_date, end_date, page_size, (page - 1) * page_size), fetch=True) or []
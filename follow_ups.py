@@ -0,0 +1,130 @@
+import threading
+import time
+from datetime import datetime
+from audit import audit_log
+from database import execute_query
+
+# How often the background sweep escalates overdue follow-ups and refreshes per-user queues
+FOLLOW_UP_SWEEP_INTERVAL = 300
+
+# Days past due before an open follow-up is escalated
+FOLLOW_UP_ESCALATION_DAYS = 3
+
+# Days ahead counted as upcoming
+FOLLOW_UP_UPCOMING_DAYS = 7
+
+# Queue buckets in display order
+FOLLOW_UP_BUCKETS = ('overdue', 'today', 'upcoming')
+
+def get_follow_up_queue(days=FOLLOW_UP_UPCOMING_DAYS, user_id=None, limit=25):
+    """Get open follow-ups due within `days`, grouped into overdue/today/upcoming buckets.
+
+    Returns {bucket: {'count': total, 'items': [first `limit` follow-ups]}} from one query
+    over the partial index on open follow-ups.
+    """
+    query = """
+        SELECT * FROM (
+            SELECT cc.*, c.first_name, c.last_name, c.company_name, u.full_name as created_by_name,
+                   q.bucket,
+                   COUNT(*) OVER (PARTITION BY q.bucket) AS bucket_count,
+                   ROW_NUMBER() OVER (PARTITION BY q.bucket ORDER BY cc.follow_up_date, cc.id) AS bucket_position
+            FROM customer_contacts cc
+            JOIN customers c ON cc.customer_id = c.id
+            LEFT JOIN users u ON cc.created_by = u.id
+            CROSS JOIN LATERAL (
+                SELECT CASE
+                    WHEN cc.follow_up_date < CURRENT_DATE THEN 'overdue'
+                    WHEN cc.follow_up_date = CURRENT_DATE THEN 'today'
+                    ELSE 'upcoming'
+                END AS bucket
+            ) q
+            WHERE cc.completed = FALSE
+            AND cc.follow_up_date IS NOT NULL
+            AND cc.follow_up_date <= CURRENT_DATE + %s
+            AND (%s::INTEGER IS NULL OR cc.created_by = %s)
+        ) ranked
+        WHERE bucket_position <= %s
+        ORDER BY follow_up_date, id
+    """
+    rows = execute_query(query, (days, user_id, user_id, limit), fetch=True) or []
+
+    queue = {bucket: {'count': 0, 'items': []} for bucket in FOLLOW_UP_BUCKETS}
+    for row in rows:
+        queue[row['bucket']]['count'] = row['bucket_count']
+        queue[row['bucket']]['items'].append(row)
+    return queue
+
+def escalate_overdue_follow_ups(days=FOLLOW_UP_ESCALATION_DAYS):
+    """Flag open follow-ups more than `days` overdue; returns the newly escalated rows"""
+    query = """
+        UPDATE customer_contacts SET escalated_at = CURRENT_TIMESTAMP
+        WHERE completed = FALSE
+        AND follow_up_date IS NOT NULL
+        AND follow_up_date < CURRENT_DATE - %s
+        AND escalated_at IS NULL
+        RETURNING id, customer_id, created_by, follow_up_date
+    """
+    return execute_query(query, (days,), fetch=True)
+
+def get_follow_up_counts_by_user(days=FOLLOW_UP_UPCOMING_DAYS):
+    """Open follow-up counts per creating user, by bucket"""
+    query = """
+        SELECT created_by AS user_id,
+               COUNT(*) FILTER (WHERE follow_up_date < CURRENT_DATE) AS overdue,
+               COUNT(*) FILTER (WHERE follow_up_date = CURRENT_DATE) AS today,
+               COUNT(*) FILTER (WHERE follow_up_date > CURRENT_DATE) AS upcoming,
+               COUNT(*) FILTER (WHERE escalated_at IS NOT NULL) AS escalated
+        FROM customer_contacts
+        WHERE completed = FALSE
+        AND follow_up_date IS NOT NULL
+        AND follow_up_date <= CURRENT_DATE + %s
+        GROUP BY created_by
+    """
+    return execute_query(query, (days,), fetch=True)
+
+class FollowUpScheduler:
+    """Periodically escalates overdue follow-ups and keeps per-user queue counts in memory"""
+
+    def __init__(self, sweep_interval=FOLLOW_UP_SWEEP_INTERVAL):
+        self.sweep_interval = sweep_interval
+        self.last_sweep = None
+        self._queues = {}
+        self._lock = threading.Lock()
+        self._thread = None
+
+    def start(self):
+        """Start the background sweep if it is not already running"""
+        with self._lock:
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(target=self._run, name="follow-up-sweep", daemon=True)
+                self._thread.start()
+
+    def sweep(self):
+        """Escalate newly overdue follow-ups and refresh the per-user queue counts"""
+        escalated = escalate_overdue_follow_ups()
+        for row in escalated or []:
+            audit_log.record('system', 'follow_up_escalated', 'customer_contacts', row['id'],
+                             f"Due {row['follow_up_date']}", user_id=row['created_by'])
+
+        counts = get_follow_up_counts_by_user()
+        if counts is not None:
+            with self._lock:
+                self._queues = {row['user_id']: row for row in counts}
+                self.last_sweep = datetime.now()
+
+    def counts_for(self, user_id):
+        """Precomputed queue counts for a user (zeros until the first background sweep has finished)"""
+        self.start()
+        with self._lock:
+            row = self._queues.get(user_id)
+        return dict(row) if row else {'overdue': 0, 'today': 0, 'upcoming': 0, 'escalated': 0}
+
+    def _run(self):
+        while True:
+            try:
+                self.sweep()
+            except Exception as e:
+                print(f"Warning: Follow-up sweep failed: {e}")
+            time.sleep(self.sweep_interval)
+
+follow_up_scheduler = FollowUpScheduler()
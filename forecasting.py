@@ -0,0 +1,176 @@
+import hashlib
+import threading
+from datetime import date
+import numpy as np
+
+# Months in a seasonal cycle
+SEASON_LENGTH = 12
+
+# Months of history loaded for model fitting
+FORECAST_HISTORY_MONTHS = 36
+
+# Smoothing parameter grid searched by Holt / Holt-Winters (all combinations are evaluated at once)
+SMOOTHING_GRID = np.linspace(0.05, 0.95, 10)
+
+# Fitted models kept per (series, data version); the oldest are dropped beyond this
+MAX_CACHED_FITS = 64
+
+_fits = {}
+_lock = threading.Lock()
+
+def monthly_series(rows, value_key, include_current=False):
+    """Turn monthly rollup rows into a gap-free (months, values) series.
+
+    Months without rows are filled with 0. The current, still-open month is left
+    out unless include_current is set, so fits only change when a month closes.
+    """
+    totals = {row['month'].strftime('%Y-%m'): float(row[value_key] or 0) for row in rows}
+    if not totals:
+        return [], np.array([])
+
+    current = date.today().strftime('%Y-%m')
+    last = max(totals) if include_current else min(max(totals), _shift_month(current, -1))
+    months = []
+    month = min(totals)
+    while month <= last:
+        months.append(month)
+        month = _shift_month(month, 1)
+    return months, np.array([totals.get(month, 0.0) for month in months])
+
+def _shift_month(month, count):
+    year, month_number = int(month[:4]), int(month[5:7])
+    years, month_index = divmod(month_number - 1 + count, 12)
+    return f"{year + years:04d}-{month_index + 1:02d}"
+
+def _smoothing(y, season_length=None):
+    """Run additive Holt / Holt-Winters for every grid combination in parallel.
+
+    Returns (sse, level, trend, seasonals, parameters) arrays with one row per combination.
+    """
+    n = len(y)
+    if season_length:
+        alpha, beta, gamma = (g.ravel() for g in np.meshgrid(SMOOTHING_GRID, SMOOTHING_GRID, SMOOTHING_GRID))
+        level = np.full(alpha.shape, y[:season_length].mean())
+        trend = np.full(alpha.shape, (y[season_length:2 * season_length].mean() - level[0]) / season_length)
+        seasonals = np.tile(y[:season_length] - level[0], (alpha.size, 1))
+    else:
+        alpha, beta = (g.ravel() for g in np.meshgrid(SMOOTHING_GRID, SMOOTHING_GRID))
+        gamma = np.zeros(alpha.shape)
+        level = np.full(alpha.shape, y[0])
+        trend = np.full(alpha.shape, y[1] - y[0])
+        seasonals = np.zeros((alpha.size, 1))
+        season_length = 1
+
+    sse = np.zeros(alpha.shape)
+    for t in range(n):
+        season = seasonals[:, t % season_length]
+        error = y[t] - (level + trend + season)
+        sse += error ** 2
+        new_level = alpha * (y[t] - season) + (1 - alpha) * (level + trend)
+        trend = beta * (new_level - level) + (1 - beta) * trend
+        seasonals[:, t % season_length] = gamma * (y[t] - new_level) + (1 - gamma) * season
+        level = new_level
+
+    return sse, level, trend, seasonals, np.column_stack([alpha, beta, gamma])
+
+def _fit(model, y, season_length=SEASON_LENGTH):
+    """Fit one model and return the state needed to forecast from the end of y"""
+    n = len(y)
+    if model == 'naive':
+        return {'model': model, 'last': float(y[-1])}
+    if model == 'linear':
+        slope, intercept = np.polyfit(np.arange(n), y, 1)
+        return {'model': model, 'slope': float(slope), 'intercept': float(intercept), 'n': n}
+    if model == 'seasonal_naive':
+        return {'model': model, 'season': y[-season_length:].copy(), 'n': n}
+    if model in ('holt', 'holt_winters'):
+        sse, level, trend, seasonals, parameters = _smoothing(y, season_length if model == 'holt_winters' else None)
+        best = int(np.argmin(sse))
+        return {
+            'model': model,
+            'level': float(level[best]),
+            'trend': float(trend[best]),
+            'seasonals': seasonals[best].copy(),
+            'parameters': {name: round(float(value), 2) for name, value in zip(('alpha', 'beta', 'gamma'), parameters[best])},
+            'n': n
+        }
+    raise ValueError(f"Unknown forecasting model: {model}")
+
+def predict(fit, horizon):
+    """Forecast the next `horizon` values from a fitted model"""
+    steps = np.arange(1, horizon + 1)
+    model = fit['model']
+    if model == 'naive':
+        return np.full(horizon, fit['last'])
+    if model == 'linear':
+        return fit['intercept'] + fit['slope'] * (fit['n'] - 1 + steps)
+    if model == 'seasonal_naive':
+        return fit['season'][(steps - 1) % len(fit['season'])]
+    seasonals = fit['seasonals']
+    return fit['level'] + fit['trend'] * steps + seasonals[(fit['n'] + steps - 1) % len(seasonals)]
+
+def candidate_models(n, season_length=SEASON_LENGTH):
+    """Models that have enough history to be fitted"""
+    models = ['naive']
+    if n >= 2:
+        models.append('linear')
+    if n >= 4:
+        models.append('holt')
+    if n > season_length:
+        models.append('seasonal_naive')
+    if n >= 2 * season_length:
+        models.append('holt_winters')
+    return models
+
+def select_model(y, season_length=SEASON_LENGTH):
+    """Pick the model with the lowest backtest error on the most recent months and fit it on all of y"""
+    n = len(y)
+    holdout = min(season_length // 2, max(1, n // 4))
+    train, test = y[:-holdout], y[-holdout:]
+
+    errors = {}
+    if n >= 4:
+        for model in candidate_models(len(train), season_length):
+            forecast = predict(_fit(model, train, season_length), holdout)
+            errors[model] = float(np.mean(np.abs(forecast - test)))
+
+    model = min(errors, key=errors.get) if errors else candidate_models(n, season_length)[-1]
+    fit = _fit(model, y, season_length)
+    fit['backtest_mae'] = errors.get(model)
+    fit['backtest_errors'] = errors
+    return fit
+
+def data_version(months, values):
+    """Fingerprint of a closed-month series; changes only when a month closes or history is edited"""
+    digest = hashlib.sha256(np.asarray(values, dtype=float).tobytes()).hexdigest()[:16]
+    return f"{months[-1] if months else 'empty'}:{digest}"
+
+def get_fit(name, months, values, season_length=SEASON_LENGTH):
+    """Get the fitted model for a series, refitting only when its data version changes"""
+    key = (name, data_version(months, values))
+    fit = _fits.get(key)
+    if fit is None:
+        fit = select_model(np.asarray(values, dtype=float), season_length)
+        with _lock:
+            _fits[key] = fit
+            while len(_fits) > MAX_CACHED_FITS:
+                _fits.pop(next(iter(_fits)))
+    return fit
+
+def forecast_series(name, months, values, horizon, floor=0.0):
+    """Forecast a monthly series; returns None when there is no history"""
+    if len(values) == 0:
+        return None
+
+    fit = get_fit(name, months, values)
+    forecast = predict(fit, horizon)
+    if floor is not None:
+        forecast = np.maximum(forecast, floor)
+
+    return {
+        'months': [_shift_month(months[-1], i) for i in range(1, horizon + 1)],
+        'values': forecast,
+        'model': fit['model'],
+        'backtest_mae': fit['backtest_mae'],
+        'fit': fit
+    }
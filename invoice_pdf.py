@@ -0,0 +1,340 @@
+import hashlib
+import json
+import multiprocessing
+import os
+import textwrap
+import zlib
+from concurrent.futures import ProcessPoolExecutor
+from string import Template
+from database import execute_query, get_invoice_details_batch, upload_document, get_document_by_id
+
+# Bump when the layout below changes so every invoice is rendered again
+RENDERER_VERSION = 2
+
+UPLOAD_DIR = "uploads"
+
+# Text blocks of the invoice; $fields are filled from the invoice row
+INVOICE_TEMPLATE = {
+    'company_name': "PLANDEPA",
+    'title': "INVOICE",
+    'meta': ["Invoice #: $invoice_number", "Date: $invoice_date", "Due Date: $due_date", "Status: $payment_status"],
+    'bill_to': ["$customer_name", "$address", "$city_line", "$email", "$phone"],
+    'job': "Job: $job_title",
+    'footer': "Thank you for your business. Please pay the balance due by $due_date."
+}
+
+# Batches at least this large are rendered in a process pool; smaller ones are not worth the start-up
+POOL_MIN_INVOICES = 8
+
+# US Letter, in points
+PAGE_WIDTH = 612
+PAGE_HEIGHT = 792
+MARGIN = 50
+
+# Helvetica glyph widths (per 1000 units) for right-aligned amounts; other characters use the average
+_GLYPH_WIDTHS = {' ': 278, '.': 278, ',': 278, '-': 333, '$': 556, '#': 556, ':': 278}
+_GLYPH_WIDTHS.update({digit: 556 for digit in '0123456789'})
+_AVERAGE_GLYPH_WIDTH = 520
+
+def text_width(text, size):
+    return sum(_GLYPH_WIDTHS.get(char, _AVERAGE_GLYPH_WIDTH) for char in text) * size / 1000
+
+def _pdf_string(text):
+    text = str(text).replace('\\', '\\\\').replace('(', '\\(').replace(')', '\\)')
+    return b'(' + text.encode('cp1252', errors='replace') + b')'
+
+class PdfDocument:
+    """Minimal PDF writer: pages of Helvetica text and lines, no embedded fonts or images"""
+
+    FONTS = {'regular': b'F1', 'bold': b'F2'}
+
+    def __init__(self, title=None):
+        self.title = title
+        self.pages = []
+        self._ops = None
+
+    def add_page(self):
+        self._ops = []
+        self.pages.append(self._ops)
+
+    def select_page(self, index):
+        """Direct further drawing to an earlier page (e.g. to add page footers at the end)"""
+        self._ops = self.pages[index]
+
+    def text(self, x, y, text, size=10, font='regular', align='left'):
+        if align == 'right':
+            x -= text_width(text, size)
+        self._ops.append(
+            b'BT /' + self.FONTS[font] + b' %d Tf %.2f %.2f Td ' % (size, x, y) + _pdf_string(text) + b' Tj ET'
+        )
+
+    def line(self, x1, y1, x2, y2, width=0.5):
+        self._ops.append(b'%.2f w %.2f %.2f m %.2f %.2f l S' % (width, x1, y1, x2, y2))
+
+    def render(self):
+        """Serialise the document to PDF bytes"""
+        objects = [
+            b'<< /Type /Catalog /Pages 2 0 R >>',
+            None,  # page tree, filled in once the page object numbers are known
+            b'<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica /Encoding /WinAnsiEncoding >>',
+            b'<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica-Bold /Encoding /WinAnsiEncoding >>'
+        ]
+        resources = b'<< /Font << /F1 3 0 R /F2 4 0 R >> >>'
+        page_refs = []
+        for ops in self.pages:
+            stream = zlib.compress(b'\n'.join(ops))
+            objects.append(b'<< /Length %d /Filter /FlateDecode >>\nstream\n' % len(stream) + stream + b'\nendstream')
+            objects.append(
+                b'<< /Type /Page /Parent 2 0 R /MediaBox [0 0 %d %d] /Resources ' % (PAGE_WIDTH, PAGE_HEIGHT)
+                + resources + b' /Contents %d 0 R >>' % (len(objects))
+            )
+            page_refs.append(b'%d 0 R' % len(objects))
+        objects[1] = b'<< /Type /Pages /Kids [' + b' '.join(page_refs) + b'] /Count %d >>' % len(page_refs)
+        info = None
+        if self.title:
+            objects.append(b'<< /Title ' + _pdf_string(self.title) + b' /Producer (PLANDEPA) >>')
+            info = len(objects)
+
+        output = bytearray(b'%PDF-1.4\n%\xe2\xe3\xcf\xd3\n')
+        offsets = []
+        for number, body in enumerate(objects, start=1):
+            offsets.append(len(output))
+            output += b'%d 0 obj\n' % number + body + b'\nendobj\n'
+
+        xref = len(output)
+        output += b'xref\n0 %d\n0000000000 65535 f \n' % (len(objects) + 1)
+        for offset in offsets:
+            output += b'%010d 00000 n \n' % offset
+        output += b'trailer\n<< /Size %d /Root 1 0 R' % (len(objects) + 1)
+        if info:
+            output += b' /Info %d 0 R' % info
+        output += b' >>\nstartxref\n%d\n' % xref
+        output += b'%%EOF\n'
+        return bytes(output)
+
+def _money(value):
+    return f"${float(value or 0):,.2f}"
+
+def _template_fields(invoice):
+    city_line = ", ".join(part for part in (invoice.get('city'), invoice.get('state')) if part)
+    if invoice.get('zip_code'):
+        city_line = f"{city_line} {invoice['zip_code']}".strip()
+    fields = {key: '' if value is None else str(value) for key, value in invoice.items() if key != 'items'}
+    fields.update({
+        'customer_name': f"{invoice.get('first_name') or ''} {invoice.get('last_name') or ''}".strip(),
+        'city_line': city_line,
+        'payment_status': (invoice.get('payment_status') or '').title()
+    })
+    return fields
+
+def _fill(template, fields):
+    return Template(template).safe_substitute(fields)
+
+# Invoice fields that appear on the rendered PDF (besides the line items)
+RENDERED_FIELDS = (
+    'invoice_number', 'invoice_date', 'due_date', 'payment_status', 'customer_name', 'address',
+    'city_line', 'email', 'phone', 'job_title', 'subtotal', 'tax_amount', 'total_amount', 'paid_amount', 'notes'
+)
+
+def invoice_content_hash(invoice):
+    """SHA-256 of everything that appears on the rendered invoice, plus the template and renderer version"""
+    fields = _template_fields(invoice)
+    content = {
+        'renderer': RENDERER_VERSION,
+        'template': INVOICE_TEMPLATE,
+        'fields': {field: fields.get(field, '') for field in RENDERED_FIELDS},
+        'items': [
+            [item['description'], str(item['quantity']), str(item['unit_price']), str(item['line_total'])]
+            for item in invoice.get('items', [])
+        ]
+    }
+    canonical = json.dumps(content, sort_keys=True, default=str, separators=(',', ':'))
+    return hashlib.sha256(canonical.encode('utf-8')).hexdigest()
+
+def render_invoice_pdf(invoice, template=INVOICE_TEMPLATE):
+    """Render an invoice (as returned by get_invoice_details) to PDF bytes.
+
+    Pure function of its arguments, so it can run in a worker process.
+    """
+    fields = _template_fields(invoice)
+    pdf = PdfDocument(title=f"Invoice {invoice['invoice_number']}")
+    right = PAGE_WIDTH - MARGIN
+    columns = {'quantity': right - 170, 'unit_price': right - 90, 'total': right}
+
+    def start_page():
+        pdf.add_page()
+        pdf.text(MARGIN, PAGE_HEIGHT - MARGIN - 10, template['company_name'], size=20, font='bold')
+        pdf.text(right, PAGE_HEIGHT - MARGIN - 10, template['title'], size=20, font='bold', align='right')
+        pdf.line(MARGIN, PAGE_HEIGHT - MARGIN - 22, right, PAGE_HEIGHT - MARGIN - 22, width=1)
+        return PAGE_HEIGHT - MARGIN - 45
+
+    def table_header(y):
+        pdf.text(MARGIN, y, "Description", font='bold')
+        pdf.text(columns['quantity'], y, "Qty", font='bold', align='right')
+        pdf.text(columns['unit_price'], y, "Unit Price", font='bold', align='right')
+        pdf.text(columns['total'], y, "Total", font='bold', align='right')
+        pdf.line(MARGIN, y - 6, right, y - 6)
+        return y - 20
+
+    y = start_page()
+    pdf.text(MARGIN, y, "Bill To", size=11, font='bold')
+    meta_y = y
+    for line in template['meta']:
+        pdf.text(right, meta_y, _fill(line, fields), align='right')
+        meta_y -= 14
+    y -= 16
+    for line in template['bill_to']:
+        value = _fill(line, fields).strip()
+        if value:
+            pdf.text(MARGIN, y, value)
+            y -= 14
+    y = min(y, meta_y) - 10
+    if invoice.get('job_title'):
+        pdf.text(MARGIN, y, _fill(template['job'], fields), font='bold')
+        y -= 24
+
+    y = table_header(y)
+    for item in invoice.get('items', []):
+        lines = textwrap.wrap(str(item['description'] or ''), 60) or ['']
+        if y - 14 * len(lines) < MARGIN + 40:
+            y = table_header(start_page())
+        pdf.text(columns['quantity'], y, f"{float(item['quantity']):g}", align='right')
+        pdf.text(columns['unit_price'], y, _money(item['unit_price']), align='right')
+        pdf.text(columns['total'], y, _money(item['line_total']), align='right')
+        for line in lines:
+            pdf.text(MARGIN, y, line)
+            y -= 14
+        y -= 4
+
+    total = float(invoice.get('total_amount') or 0)
+    paid = float(invoice.get('paid_amount') or 0)
+    totals = [
+        ("Subtotal", _money(invoice.get('subtotal')), 'regular'),
+        ("Tax", _money(invoice.get('tax_amount')), 'regular'),
+        ("Total", _money(total), 'bold'),
+        ("Paid", _money(paid), 'regular'),
+        ("Balance Due", _money(total - paid), 'bold')
+    ]
+    notes = textwrap.wrap(str(invoice.get('notes') or ''), 95)
+    if y - 16 * len(totals) - 14 * (len(notes) + 2) < MARGIN + 40:
+        y = start_page()
+    pdf.line(columns['quantity'] - 40, y + 6, right, y + 6)
+    y -= 10
+    for label, amount, font in totals:
+        pdf.text(columns['unit_price'], y, label, font=font, align='right')
+        pdf.text(columns['total'], y, amount, font=font, align='right')
+        y -= 16
+
+    if notes:
+        y -= 10
+        pdf.text(MARGIN, y, "Notes", font='bold')
+        y -= 14
+        for line in notes:
+            pdf.text(MARGIN, y, line, size=9)
+            y -= 12
+
+    footer = _fill(template['footer'], fields)
+    page_count = len(pdf.pages)
+    for index in range(page_count):
+        pdf.select_page(index)
+        pdf.text(MARGIN, MARGIN - 20, footer, size=8)
+        pdf.text(right, MARGIN - 20, f"Page {index + 1} of {page_count}", size=8, align='right')
+
+    return pdf.render()
+
+def get_cached_invoice_documents(content_hashes):
+    """Active invoice documents rendered from any of the given content hashes, by hash"""
+    query = """
+        SELECT id, file_path, content_hash FROM documents
+        WHERE document_type = 'invoice' AND is_active = TRUE AND content_hash = ANY(%s)
+    """
+    rows = execute_query(query, (list(content_hashes),), fetch=True) or []
+    return {row['content_hash']: row for row in rows if os.path.exists(row['file_path'])}
+
+def get_invoice_ids_for_period(start_date, end_date):
+    """Ids of invoices dated within a period (inclusive), for month-end runs"""
+    query = "SELECT id FROM invoices WHERE invoice_date BETWEEN %s AND %s ORDER BY invoice_date, id"
+    return [row['id'] for row in execute_query(query, (start_date, end_date), fetch=True) or []]
+
+def store_invoice_pdf(invoice, pdf, content_hash, user_id):
+    """Save a rendered invoice through the documents table, superseding earlier renders of it"""
+    filename = f"Invoice-{invoice['invoice_number']}.pdf"
+    document_id = upload_document({
+        'customer_id': invoice.get('customer_id'),
+        'job_id': invoice.get('job_id'),
+        'original_filename': filename,
+        'file_size': len(pdf),
+        'mime_type': 'application/pdf',
+        'document_type': 'invoice',
+        'category': 'financial',
+        'description': f"Invoice {invoice['invoice_number']}",
+        'tags': f"invoice,{invoice['invoice_number']}",
+        'content_hash': content_hash,
+        'uploaded_by': user_id
+    })
+    if not document_id:
+        return None
+
+    doc = get_document_by_id(document_id)
+    os.makedirs(UPLOAD_DIR, exist_ok=True)
+    with open(doc['file_path'], 'wb') as f:
+        f.write(pdf)
+
+    execute_query("""
+        UPDATE documents SET is_active = FALSE, updated_at = CURRENT_TIMESTAMP
+        WHERE document_type = 'invoice' AND original_filename = %s AND id <> %s AND is_active = TRUE
+    """, (filename, document_id))
+    return doc
+
+def render_invoices(invoice_ids, user_id, workers=None, progress=None):
+    """Render and store PDFs for several invoices, skipping any whose content is unchanged.
+
+    Invoices are loaded and stored from this process; only the rendering of new or changed
+    invoices is spread over a process pool. progress(done, total) is called as renders finish.
+    Returns {invoice_id: {'document_id', 'file_path', 'cached'}}.
+    """
+    invoices = get_invoice_details_batch(invoice_ids)
+    hashes = {invoice['id']: invoice_content_hash(invoice) for invoice in invoices}
+    cached = get_cached_invoice_documents(hashes.values()) if hashes else {}
+
+    results = {}
+    pending = []
+    for invoice in invoices:
+        doc = cached.get(hashes[invoice['id']])
+        if doc:
+            results[invoice['id']] = {'document_id': doc['id'], 'file_path': doc['file_path'], 'cached': True}
+        else:
+            # Plain dicts pickle cheaply into the workers
+            pending.append({**invoice, 'items': [dict(item) for item in invoice['items']]})
+
+    if progress:
+        progress(len(results), len(invoices))
+    if not pending:
+        return results
+
+    def store(invoice, pdf):
+        doc = store_invoice_pdf(invoice, pdf, hashes[invoice['id']], user_id)
+        if doc:
+            results[invoice['id']] = {'document_id': doc['id'], 'file_path': doc['file_path'], 'cached': False}
+        if progress:
+            progress(len(results), len(invoices))
+
+    if len(pending) < POOL_MIN_INVOICES or workers == 1:
+        for invoice in pending:
+            store(invoice, render_invoice_pdf(invoice))
+    else:
+        # Spawned workers start clean instead of inheriting the app's threads and connections
+        context = multiprocessing.get_context('spawn')
+        with ProcessPoolExecutor(max_workers=workers, mp_context=context) as pool:
+            for invoice, pdf in zip(pending, pool.map(render_invoice_pdf, pending, chunksize=4)):
+                store(invoice, pdf)
+
+    return results
+
+def get_invoice_pdf(invoice_id, user_id):
+    """Rendered PDF for one invoice, re-rendered only if it changed; returns (bytes, cached) or (None, False)"""
+    result = render_invoices([invoice_id], user_id).get(invoice_id)
+    if not result:
+        return None, False
+    with open(result['file_path'], 'rb') as f:
+        return f.read(), result['cached']
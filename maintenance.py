@@ -0,0 +1,417 @@
+import argparse
+import re
+from datetime import date, datetime, timedelta
+import streamlit as st
+from database import get_connection, execute_query
+from customer_matching import DUPLICATE_THRESHOLD, find_duplicate_customers
+
+# How long AI call logs are kept
+AI_CALLS_RETENTION_DAYS = 90
+
+# Rows removed per transaction when old rows have to be deleted one by one
+DELETE_BATCH_SIZE = 5000
+
+# How many future monthly partitions to keep ready for inserts
+PARTITION_MONTHS_AHEAD = 3
+
+# How long table statistics are cached for the Admin page
+TABLE_STATS_TTL = 60
+
+# Time-partitioned tables and their partition key
+PARTITIONED_TABLES = {
+    'ai_calls': 'created_at',
+    'document_access_log': 'accessed_at'
+}
+
+def _add_months(month, count):
+    years, month_index = divmod(month.month - 1 + count, 12)
+    return date(month.year + years, month_index + 1, 1)
+
+def _partition_name(table, month):
+    return f"{table}_y{month.year}m{month.month:02d}"
+
+def _partition_month(table, partition_name):
+    """Get the month a partition covers from its name, or None for other partitions"""
+    match = re.fullmatch(rf"{re.escape(table)}_y(\d{{4}})m(\d{{2}})", partition_name)
+    return date(int(match.group(1)), int(match.group(2)), 1) if match else None
+
+def is_partitioned(table):
+    """Check whether a table is a partitioned (parent) table"""
+    query = """
+        SELECT 1 FROM pg_partitioned_table pt
+        JOIN pg_class c ON c.oid = pt.partrelid
+        WHERE c.relname = %s AND pg_table_is_visible(c.oid)
+    """
+    return bool(execute_query(query, (table,), fetch=True))
+
+def get_partitions(table):
+    """List the partitions of a table in name order"""
+    query = """
+        SELECT c.relname AS name, c.reltuples::BIGINT AS estimated_rows
+        FROM pg_inherits i
+        JOIN pg_class c ON c.oid = i.inhrelid
+        WHERE i.inhparent = %s::regclass
+        ORDER BY c.relname
+    """
+    return execute_query(query, (table,), fetch=True) or []
+
+def _create_month_partition(cursor, table, month):
+    cursor.execute(
+        f"CREATE TABLE IF NOT EXISTS {_partition_name(table, month)} PARTITION OF {table} "
+        f"FOR VALUES FROM (%s) TO (%s)",
+        (month, _add_months(month, 1))
+    )
+
+def ensure_monthly_partitions(table, months_ahead=PARTITION_MONTHS_AHEAD):
+    """Create partitions for the current month and the next few months"""
+    if not is_partitioned(table):
+        return 0
+
+    conn = get_connection()
+    if not conn:
+        return 0
+
+    created = 0
+    conn.autocommit = True
+    cursor = conn.cursor()
+    current_month = date.today().replace(day=1)
+    for offset in range(months_ahead + 1):
+        try:
+            _create_month_partition(cursor, table, _add_months(current_month, offset))
+            created += 1
+        except Exception as e:
+            # Usually rows for that month already landed in the default partition
+            print(f"Warning: Could not create partition for {table}: {e}")
+    cursor.close()
+    conn.close()
+    return created
+
+def ensure_all_partitions():
+    """Keep future partitions available for every partitioned log table"""
+    for table in PARTITIONED_TABLES:
+        ensure_monthly_partitions(table)
+
+def convert_to_monthly_partitions(table, months_ahead=PARTITION_MONTHS_AHEAD):
+    """Rebuild a table as monthly range partitions on its timestamp column.
+
+    Runs in one transaction holding an exclusive lock on the table, so schedule it
+    for a quiet period. Foreign keys and non-unique indexes are recreated.
+    """
+    partition_column = PARTITIONED_TABLES[table]
+    new_table = f"{table}_partitioned"
+
+    conn = get_connection()
+    if not conn:
+        return False
+
+    try:
+        cursor = conn.cursor()
+        cursor.execute(f"LOCK TABLE {table} IN ACCESS EXCLUSIVE MODE")
+
+        cursor.execute(
+            "SELECT pg_get_constraintdef(oid) FROM pg_constraint WHERE conrelid = %s::regclass AND contype = 'f'",
+            (table,)
+        )
+        foreign_keys = [row[0] for row in cursor.fetchall()]
+
+        cursor.execute(
+            "SELECT pg_get_indexdef(indexrelid) FROM pg_index WHERE indrelid = %s::regclass AND NOT indisunique",
+            (table,)
+        )
+        index_definitions = [row[0] for row in cursor.fetchall()]
+
+        cursor.execute("SELECT pg_get_serial_sequence(%s, 'id')", (table,))
+        id_sequence = cursor.fetchone()[0]
+
+        # The partition key has to be part of the primary key and can't be NULL
+        cursor.execute(f"UPDATE {table} SET {partition_column} = CURRENT_TIMESTAMP WHERE {partition_column} IS NULL")
+        cursor.execute(
+            f"CREATE TABLE {new_table} (LIKE {table} INCLUDING DEFAULTS INCLUDING CONSTRAINTS) "
+            f"PARTITION BY RANGE ({partition_column})"
+        )
+        cursor.execute(f"ALTER TABLE {new_table} ADD PRIMARY KEY (id, {partition_column})")
+
+        cursor.execute(f"SELECT MIN({partition_column}) FROM {table}")
+        oldest = cursor.fetchone()[0]
+        month = (oldest.date() if oldest else date.today()).replace(day=1)
+        last_month = _add_months(date.today().replace(day=1), months_ahead)
+        while month <= last_month:
+            _create_month_partition(cursor, new_table, month)
+            month = _add_months(month, 1)
+        cursor.execute(f"CREATE TABLE {table}_default PARTITION OF {new_table} DEFAULT")
+
+        cursor.execute(f"INSERT INTO {new_table} SELECT * FROM {table}")
+
+        if id_sequence:
+            cursor.execute(f"ALTER SEQUENCE {id_sequence} OWNED BY {new_table}.id")
+        cursor.execute(f"DROP TABLE {table}")
+        cursor.execute(f"ALTER TABLE {new_table} RENAME TO {table}")
+        cursor.execute(f"ALTER INDEX {new_table}_pkey RENAME TO {table}_pkey")
+
+        # Partitions were created under the temporary parent name
+        cursor.execute(
+            "SELECT c.relname FROM pg_inherits i JOIN pg_class c ON c.oid = i.inhrelid WHERE i.inhparent = %s::regclass",
+            (table,)
+        )
+        for (partition,) in cursor.fetchall():
+            if partition.startswith(new_table):
+                cursor.execute(f"ALTER TABLE {partition} RENAME TO {table}{partition[len(new_table):]}")
+
+        for definition in foreign_keys:
+            cursor.execute(f"ALTER TABLE {table} ADD {definition}")
+        for definition in index_definitions:
+            cursor.execute(definition)
+        cursor.execute(
+            f"CREATE INDEX IF NOT EXISTS idx_{table}_{partition_column} ON {table}({partition_column})"
+        )
+
+        conn.commit()
+        cursor.close()
+        conn.close()
+        return True
+    except Exception as e:
+        print(f"Error partitioning {table}: {e}")
+        conn.rollback()
+        conn.close()
+        return False
+
+@st.cache_data(ttl=TABLE_STATS_TTL, show_spinner=False)
+def get_table_stats(tables=None, exact=False):
+    """Get row estimates, sizes, dead tuples and vacuum/analyze times per table.
+
+    Everything comes from the catalog in one query; partitions are summed into their
+    parent. With exact=True the row counts are replaced by COUNT(*) results, which
+    scans the tables.
+    """
+    query = """
+        SELECT t.relname AS table_name,
+               SUM(GREATEST(c.reltuples, 0))::BIGINT AS row_count,
+               SUM(pg_table_size(c.oid))::BIGINT AS table_bytes,
+               SUM(pg_indexes_size(c.oid))::BIGINT AS index_bytes,
+               SUM(COALESCE(s.n_dead_tup, 0))::BIGINT AS dead_tuples,
+               MAX(GREATEST(s.last_vacuum, s.last_autovacuum)) AS last_vacuum,
+               MAX(GREATEST(s.last_analyze, s.last_autoanalyze)) AS last_analyze
+        FROM pg_class t
+        JOIN pg_namespace n ON n.oid = t.relnamespace
+        CROSS JOIN LATERAL pg_partition_tree(t.oid) tree
+        JOIN pg_class c ON c.oid = tree.relid
+        LEFT JOIN pg_stat_user_tables s ON s.relid = c.oid
+        WHERE n.nspname = current_schema()
+        AND t.relkind IN ('r', 'p')
+        AND NOT t.relispartition
+        AND (%s::TEXT[] IS NULL OR t.relname = ANY(%s::TEXT[]))
+        GROUP BY t.relname
+        ORDER BY t.relname
+    """
+    table_list = list(tables) if tables else None
+    stats = [dict(row) for row in execute_query(query, (table_list, table_list), fetch=True) or []]
+
+    if exact and stats:
+        count_query = " UNION ALL ".join(
+            f"SELECT '{row['table_name']}' AS table_name, COUNT(*) AS count FROM \"{row['table_name']}\""
+            for row in stats
+        )
+        counts = {row['table_name']: row['count'] for row in execute_query(count_query, fetch=True) or []}
+        for row in stats:
+            row['row_count'] = counts.get(row['table_name'], row['row_count'])
+
+    for row in stats:
+        row['exact'] = exact
+    return stats
+
+def drop_expired_partitions(table, cutoff):
+    """Drop monthly partitions whose whole range is older than the cutoff date"""
+    dropped = []
+    for partition in get_partitions(table):
+        month = _partition_month(table, partition['name'])
+        if month and _add_months(month, 1) <= cutoff:
+            if execute_query(f"DROP TABLE {partition['name']}") is not None:
+                dropped.append(partition)
+    return dropped
+
+def delete_in_batches(table, date_column, cutoff, batch_size=DELETE_BATCH_SIZE, progress=None):
+    """Delete rows older than the cutoff in short transactions.
+
+    Each batch commits on its own so locks are held briefly and vacuum can keep up.
+    progress(deleted, total) is called after every batch.
+    """
+    count = execute_query(f"SELECT COUNT(*) AS count FROM {table} WHERE {date_column} < %s", (cutoff,), fetch=True)
+    total = count[0]['count'] if count else 0
+
+    delete_query = f"""
+        DELETE FROM {table}
+        WHERE {date_column} < %s
+        AND id IN (
+            SELECT id FROM {table}
+            WHERE {date_column} < %s
+            ORDER BY {date_column}
+            LIMIT %s
+        )
+    """
+
+    deleted = 0
+    while deleted < total:
+        result = execute_query(delete_query, (cutoff, cutoff, batch_size))
+        if not result:
+            break
+        deleted += result
+        if progress:
+            progress(deleted, total)
+
+    return deleted
+
+def purge_old_ai_calls(retention_days=AI_CALLS_RETENTION_DAYS, batch_size=DELETE_BATCH_SIZE, progress=None):
+    """Remove AI call logs older than the retention period.
+
+    Whole months are dropped as partitions when ai_calls is partitioned; whatever is
+    left (or the whole table when it isn't partitioned) is deleted in batches.
+    """
+    cutoff = date.today() - timedelta(days=retention_days)
+
+    dropped = []
+    if is_partitioned('ai_calls'):
+        dropped = drop_expired_partitions('ai_calls', cutoff)
+
+    rows_deleted = delete_in_batches('ai_calls', 'created_at', cutoff, batch_size, progress)
+
+    return {
+        'cutoff': cutoff,
+        'partitions_dropped': [p['name'] for p in dropped],
+        'partition_rows_dropped': sum(max(p['estimated_rows'], 0) for p in dropped),
+        'rows_deleted': rows_deleted
+    }
+
+def rebuild_document_access_rollup(since=None):
+    """Recount document_access_daily from the raw access log (all days, or from a date on)"""
+    conn = get_connection()
+    if not conn:
+        return None
+
+    try:
+        cursor = conn.cursor()
+        if since:
+            cursor.execute("DELETE FROM document_access_daily WHERE access_date >= %s", (since,))
+        else:
+            cursor.execute("DELETE FROM document_access_daily")
+        cursor.execute(
+            """
+                INSERT INTO document_access_daily (access_date, document_id, user_id, access_type, access_count)
+                SELECT accessed_at::date, document_id, COALESCE(user_id, 0), access_type, COUNT(*)
+                FROM document_access_log
+                WHERE %s::date IS NULL OR accessed_at >= %s::date
+                GROUP BY 1, 2, 3, 4
+            """,
+            (since, since)
+        )
+        rows = cursor.rowcount
+        conn.commit()
+        cursor.close()
+        conn.close()
+        return rows
+    except Exception as e:
+        print(f"Error rebuilding document access rollup: {e}")
+        conn.rollback()
+        conn.close()
+        return None
+
+def rebuild_invoice_aggregates():
+    """Recompute invoice subtotals/totals from their line items and reseed ar_summary.
+
+    Both are normally kept up to date by triggers; this repairs drift from writes made
+    with the triggers disabled. Returns the number of invoices corrected.
+    """
+    conn = get_connection()
+    if not conn:
+        return None
+
+    try:
+        cursor = conn.cursor()
+        cursor.execute("LOCK TABLE invoices, invoice_items IN SHARE ROW EXCLUSIVE MODE")
+        cursor.execute("""
+            UPDATE invoices i
+            SET subtotal = t.subtotal,
+                total_amount = t.subtotal + COALESCE(i.tax_amount, 0),
+                updated_at = CURRENT_TIMESTAMP
+            FROM (
+                SELECT inv.id, COALESCE(SUM(ii.line_total), 0) AS subtotal
+                FROM invoices inv
+                LEFT JOIN invoice_items ii ON ii.invoice_id = inv.id
+                GROUP BY inv.id
+            ) t
+            WHERE t.id = i.id
+            AND (i.subtotal IS DISTINCT FROM t.subtotal
+                 OR i.total_amount IS DISTINCT FROM t.subtotal + COALESCE(i.tax_amount, 0))
+        """)
+        corrected = cursor.rowcount
+        cursor.execute("DELETE FROM ar_summary")
+        cursor.execute("""
+            INSERT INTO ar_summary (id, total_invoices, paid_invoices, unpaid_invoices, partial_invoices,
+                                    total_billed, total_collected)
+            SELECT TRUE, COUNT(*),
+                   COUNT(*) FILTER (WHERE payment_status = 'paid'),
+                   COUNT(*) FILTER (WHERE payment_status = 'unpaid'),
+                   COUNT(*) FILTER (WHERE payment_status = 'partial'),
+                   COALESCE(SUM(total_amount), 0), COALESCE(SUM(paid_amount), 0)
+            FROM invoices
+        """)
+        conn.commit()
+        cursor.close()
+        conn.close()
+        return corrected
+    except Exception as e:
+        print(f"Error rebuilding invoice aggregates: {e}")
+        conn.rollback()
+        conn.close()
+        return None
+
+def main():
+    """Command line entry point for cron / scheduled runs"""
+    parser = argparse.ArgumentParser(description="PLANDEPA database maintenance")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    purge_parser = subparsers.add_parser("purge-ai-calls", help="Apply AI call log retention")
+    purge_parser.add_argument("--days", type=int, default=AI_CALLS_RETENTION_DAYS)
+    purge_parser.add_argument("--batch-size", type=int, default=DELETE_BATCH_SIZE)
+
+    subparsers.add_parser("ensure-partitions", help="Create upcoming monthly partitions")
+
+    convert_parser = subparsers.add_parser("partition", help="Convert a log table to monthly partitions")
+    convert_parser.add_argument("table", choices=sorted(PARTITIONED_TABLES))
+
+    rollup_parser = subparsers.add_parser("rebuild-access-rollup", help="Recount daily document access totals")
+    rollup_parser.add_argument("--since", type=date.fromisoformat, default=None)
+
+    duplicates_parser = subparsers.add_parser("find-duplicate-customers", help="List likely duplicate customers")
+    duplicates_parser.add_argument("--threshold", type=float, default=DUPLICATE_THRESHOLD)
+
+    subparsers.add_parser("rebuild-invoice-aggregates", help="Recompute invoice totals and the AR summary")
+
+    args = parser.parse_args()
+
+    if args.command == "purge-ai-calls":
+        def report(deleted, total):
+            print(f"{datetime.now():%H:%M:%S} deleted {deleted}/{total}")
+
+        result = purge_old_ai_calls(args.days, args.batch_size, progress=report)
+        print(f"Dropped partitions: {', '.join(result['partitions_dropped']) or 'none'}")
+        print(f"Deleted {result['rows_deleted']} rows older than {result['cutoff']}")
+    elif args.command == "ensure-partitions":
+        ensure_all_partitions()
+    elif args.command == "partition":
+        print("Done" if convert_to_monthly_partitions(args.table) else "Failed")
+    elif args.command == "rebuild-access-rollup":
+        rows = rebuild_document_access_rollup(args.since)
+        print("Failed" if rows is None else f"Wrote {rows} daily rows")
+    elif args.command == "find-duplicate-customers":
+        duplicates = find_duplicate_customers(args.threshold)
+        for duplicate in duplicates:
+            a, b = duplicate['customer_a'], duplicate['customer_b']
+            print(f"{duplicate['score']:.2f}  #{a['id']} {a['first_name']} {a['last_name']}"
+                  f"  <->  #{b['id']} {b['first_name']} {b['last_name']}  ({', '.join(duplicate['shared_keys'])})")
+        print(f"{len(duplicates)} likely duplicate pairs")
+    elif args.command == "rebuild-invoice-aggregates":
+        corrected = rebuild_invoice_aggregates()
+        print("Failed" if corrected is None else f"Corrected {corrected} invoices")
+
+if __name__ == "__main__":
+    main()
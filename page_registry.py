@@ -0,0 +1,93 @@
+import importlib.util
+import os
+import threading
+import time
+
+PAGES_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "pages")
+
+# Re-import page modules when their source file changes (set PLANDEPA_DEV=1 while developing)
+DEV_MODE = os.getenv('PLANDEPA_DEV', '').lower() in ('1', 'true', 'yes')
+
+# Page modules are imported once per process and shared by every session
+_registry = {}
+_timings = {}
+_lock = threading.Lock()
+
+def _import_page(page_name, page_path):
+    """Execute a page file and return the resulting module"""
+    spec = importlib.util.spec_from_file_location(f"pages.{page_name}", page_path)
+    if spec is None or spec.loader is None:
+        raise ImportError(f"Could not load page specification for '{page_name}'")
+
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+def _page_stats(page_name):
+    return _timings.setdefault(page_name, {
+        'page': page_name,
+        'imports': 0,
+        'cold_import_ms': None,
+        'last_import_ms': None,
+        'renders': 0,
+        'last_render_ms': None,
+        'total_render_ms': 0.0
+    })
+
+def get_page_module(page_name):
+    """Get a page module, importing it only on first use (or when changed in dev mode)"""
+    page_path = os.path.join(PAGES_DIR, f"{page_name}.py")
+    entry = _registry.get(page_name)
+
+    if entry and not DEV_MODE:
+        return entry['module']
+
+    mtime = os.path.getmtime(page_path)
+    if entry and entry['mtime'] == mtime:
+        return entry['module']
+
+    with _lock:
+        # Another session may have imported the page while we waited
+        entry = _registry.get(page_name)
+        if entry and entry['mtime'] == mtime:
+            return entry['module']
+
+        start = time.perf_counter()
+        module = _import_page(page_name, page_path)
+        elapsed_ms = (time.perf_counter() - start) * 1000
+
+        _registry[page_name] = {'module': module, 'mtime': mtime}
+
+        stats = _page_stats(page_name)
+        stats['imports'] += 1
+        stats['last_import_ms'] = elapsed_ms
+        if stats['cold_import_ms'] is None:
+            stats['cold_import_ms'] = elapsed_ms
+
+    return module
+
+def render_page(page_name):
+    """Render a page through its cached module and record how long it took"""
+    module = get_page_module(page_name)
+
+    start = time.perf_counter()
+    try:
+        module.show()
+    finally:
+        # Also runs when the page calls st.rerun() mid-render
+        elapsed_ms = (time.perf_counter() - start) * 1000
+        with _lock:
+            stats = _page_stats(page_name)
+            stats['renders'] += 1
+            stats['last_render_ms'] = elapsed_ms
+            stats['total_render_ms'] += elapsed_ms
+
+def get_page_timings():
+    """Get import and render timings for every page loaded by this process"""
+    with _lock:
+        timings = []
+        for stats in _timings.values():
+            row = dict(stats)
+            row['avg_render_ms'] = (row['total_render_ms'] / row['renders']) if row['renders'] else None
+            timings.append(row)
+    return sorted(timings, key=lambda row: row['page'])
@@ -1,7 +1,12 @@
 import streamlit as st
-from auth import get_all_users, create_user, update_user_role, check_permissions
+from auth import get_all_users, create_user, update_user_role, reset_user_password, check_permissions
 from database import execute_query
-import hashlib
+from page_registry import get_page_timings
+from audit import AUDIT_EVENT_TYPES, audit_log, get_audit_events, count_audit_events
+from maintenance import (AI_CALLS_RETENTION_DAYS, purge_old_ai_calls, is_partitioned,
+                         get_partitions, convert_to_monthly_partitions, get_table_stats)
+from data_export import EXPORT_TABLES, EXPORT_FORMATS, export_table, parquet_available, remove_export
+import os
 
 REQUIRED_ROLE = 'super_admin'
 
@@ -128,9 +133,7 @@ def show_user_management():
                         with col1:
                             if st.form_submit_button("Reset Password", use_container_width=True):
                                 if new_pwd and new_pwd == confirm_pwd:
-                                    password_hash = hashlib.sha256(new_pwd.encode()).hexdigest()
-                                    update_query = "UPDATE users SET password_hash = %s WHERE id = %s"
-                                    if execute_query(update_query, (password_hash, user['id'])):
+                                    if reset_user_password(user['id'], new_pwd):
                                         st.success("Password reset successfully!")
                                         st.session_state[f"reset_password_{user['id']}"] = False
                                         st.rerun()
@@ -157,19 +160,19 @@ def show_system_settings():
     with col1:
         st.write("**Database Information**")
         
-        # Get table counts
+        # Estimated counts from the catalog (cached briefly)
         tables_info = [
-            ("Users", "SELECT COUNT(*) FROM users"),
-            ("Estimates", "SELECT COUNT(*) FROM estimates"),
-            ("Jobs", "SELECT COUNT(*) FROM jobs"),
-            ("AI Calls", "SELECT COUNT(*) FROM ai_calls"),
-            ("Financial Records", "SELECT COUNT(*) FROM financial_records")
+            ("Users", "users"),
+            ("Estimates", "estimates"),
+            ("Jobs", "jobs"),
+            ("AI Calls", "ai_calls"),
+            ("Financial Records", "financial_records")
         ]
         
-        for table_name, query in tables_info:
-            result = execute_query(query, fetch=True)
-            count = result[0]['count'] if result else 0
-            st.write(f"- {table_name}: {count} records")
+        table_stats = {row['table_name']: row for row in get_table_stats()}
+        for table_name, table in tables_info:
+            count = table_stats[table]['row_count'] if table in table_stats else 0
+            st.write(f"- {table_name}: ~{count:,} records")
     
     with col2:
         st.write("**System Status**")
@@ -190,7 +193,25 @@ def show_system_settings():
         
         st.write(f"Active User: {st.session_state.username}")
         st.write(f"Session Role: {st.session_state.user_role}")
-    
+
+    # Page load performance (collected by the page registry for this server process)
+    st.write("**Page Performance**")
+    page_timings = get_page_timings()
+    if page_timings:
+        st.dataframe([
+            {
+                'Page': row['page'],
+                'Cold Import (ms)': round(row['cold_import_ms'] or 0, 1),
+                'Imports': row['imports'],
+                'Renders': row['renders'],
+                'Last Render (ms)': round(row['last_render_ms'] or 0, 1),
+                'Avg Render (ms)': round(row['avg_render_ms'] or 0, 1)
+            }
+            for row in page_timings
+        ], use_container_width=True, hide_index=True)
+    else:
+        st.write("No page timings recorded yet")
+
     st.markdown("---")
     
     # Application settings
@@ -226,36 +247,62 @@ def show_database_maintenance():
     with col1:
         st.write("**Table Sizes**")
         
-        # Get table size information (simplified)
-        size_queries = [
-            ("estimates", "SELECT COUNT(*) as count FROM estimates"),
-            ("jobs", "SELECT COUNT(*) as count FROM jobs"),
-            ("ai_calls", "SELECT COUNT(*) as count FROM ai_calls"),
-            ("financial_records", "SELECT COUNT(*) as count FROM financial_records"),
-            ("users", "SELECT COUNT(*) as count FROM users")
-        ]
+        exact_counts = st.checkbox("Exact row counts", value=False,
+                                   help="Counts every row instead of using planner estimates. Slower on large tables.")
         
-        for table, query in size_queries:
-            result = execute_query(query, fetch=True)
-            count = result[0]['count'] if result else 0
-            st.write(f"- {table}: {count} records")
+        table_stats = get_table_stats(exact=exact_counts)
+        if table_stats:
+            st.dataframe([
+                {
+                    'Table': row['table_name'],
+                    'Rows': row['row_count'],
+                    'Data (MB)': round(row['table_bytes'] / 1024 / 1024, 2),
+                    'Indexes (MB)': round(row['index_bytes'] / 1024 / 1024, 2),
+                    'Dead Tuples': row['dead_tuples'],
+                    'Last Vacuum': row['last_vacuum'].strftime('%m/%d/%Y %H:%M') if row['last_vacuum'] else 'Never',
+                    'Last Analyze': row['last_analyze'].strftime('%m/%d/%Y %H:%M') if row['last_analyze'] else 'Never'
+                }
+                for row in table_stats
+            ], use_container_width=True, hide_index=True)
+        else:
+            st.write("Table statistics unavailable")
     
     with col2:
         st.write("**Maintenance Actions**")
         
         if st.button("🧹 Clean Old Logs", use_container_width=True):
-            # Clean AI calls older than 90 days
-            cleanup_query = "DELETE FROM ai_calls WHERE created_at < CURRENT_DATE - INTERVAL '90 days'"
-            result = execute_query(cleanup_query)
-            if result is not None:
-                st.success(f"Cleaned {result} old AI call records")
-            else:
-                st.error("Cleanup failed")
+            # Drop whole monthly partitions, then delete any remainder in small batches
+            progress_bar = st.progress(0.0, text="Removing AI call logs older than 90 days...")
+            
+            def report_progress(deleted, total):
+                progress_bar.progress(min(deleted / total, 1.0), text=f"Deleted {deleted:,} of {total:,} old AI call records")
+            
+            result = purge_old_ai_calls(AI_CALLS_RETENTION_DAYS, progress=report_progress)
+            progress_bar.progress(1.0, text="Cleanup complete")
+            
+            if result['partitions_dropped']:
+                st.success(f"Dropped {len(result['partitions_dropped'])} monthly partitions "
+                           f"(~{result['partition_rows_dropped']:,} records)")
+            st.success(f"Cleaned {result['rows_deleted']:,} old AI call records")
+            audit_log.record('system', 'purge_logs', 'ai_calls',
+                             details=f"{result['rows_deleted']} rows deleted, {len(result['partitions_dropped'])} partitions dropped")
+        
+        if is_partitioned('ai_calls'):
+            st.caption(f"ai_calls is partitioned by month ({len(get_partitions('ai_calls'))} partitions)")
+        elif st.button("🗂️ Partition AI Call Logs", use_container_width=True,
+                       help="Rebuilds ai_calls as monthly partitions. Locks the table while it runs."):
+            with st.spinner("Partitioning ai_calls..."):
+                if convert_to_monthly_partitions('ai_calls'):
+                    audit_log.record('system', 'partition', 'ai_calls')
+                    st.success("ai_calls converted to monthly partitions")
+                else:
+                    st.error("Partitioning failed")
         
         if st.button("📊 Update Statistics", use_container_width=True):
             # Update table statistics (PostgreSQL specific)
             stats_query = "ANALYZE"
-            if execute_query(stats_query):
+            if execute_query(stats_query) is not None:
+                get_table_stats.clear()
                 st.success("Database statistics updated")
             else:
                 st.error("Statistics update failed")
@@ -271,9 +318,9 @@ def show_database_maintenance():
     col1, col2 = st.columns(2)
     
     with col1:
-        export_table = st.selectbox(
+        selected_table = st.selectbox(
             "Select Table to Export",
-            ["estimates", "jobs", "ai_calls", "financial_records"]
+            list(EXPORT_TABLES.keys())
         )
         
         date_range = st.date_input(
@@ -283,89 +330,125 @@ def show_database_maintenance():
         )
     
     with col2:
-        export_format = st.selectbox("Export Format", ["CSV", "JSON"])
+        format_options = [f for f in EXPORT_FORMATS if f != 'Parquet' or parquet_available()]
+        export_format = st.selectbox("Export Format", format_options)
         
         if st.button("📥 Export Data", use_container_width=True):
-            # In a real application, this would generate and download the export
-            st.info("Export functionality would be implemented here")
+            start_date = date_range[0] if len(date_range) > 0 else None
+            end_date = date_range[1] if len(date_range) > 1 else start_date
+            
+            with st.spinner(f"Exporting {selected_table}..."):
+                export = export_table(selected_table, export_format, start_date, end_date)
+            
+            if export:
+                # Only keep the most recent export file around
+                previous = st.session_state.get('data_export')
+                if previous:
+                    remove_export(previous['path'])
+                st.session_state.data_export = export
+                audit_log.record('system', 'export', selected_table, details=f"{export_format}, {export['size']:,} bytes")
+        
+        export = st.session_state.get('data_export')
+        if export and os.path.exists(export['path']):
+            with open(export['path'], 'rb') as export_file:
+                st.download_button(
+                    f"💾 Download {export['filename']} ({export['size'] / 1024:,.1f} KB)",
+                    data=export_file,
+                    file_name=export['filename'],
+                    mime=export['mime_type'],
+                    use_container_width=True
+                )
 
 def show_audit_logs():
+    import pandas as pd
+    
     st.subheader("📜 Audit Logs")
     
-    # In a real application, you would have an audit_logs table
-    # For this demo, we'll show recent database activity
+    users = get_all_users()
+    user_ids = {user['username']: user['id'] for user in users}
     
     col1, col2 = st.columns(2)
     
     with col1:
-        log_type = st.selectbox("Log Type", ["All", "User Activity", "Data Changes", "System Events"])
-        date_filter = st.date_input("From Date", value=st.date_input("From Date", value=None))
+        log_type = st.selectbox("Log Type", ["All"] + list(AUDIT_EVENT_TYPES.values()))
+        date_filter = st.date_input("Date Range", value=[], key="audit_date_range")
     
     with col2:
-        user_filter = st.selectbox("User", ["All"] + [user['username'] for user in get_all_users()])
+        user_filter = st.selectbox("User", ["All"] + list(user_ids))
         show_count = st.selectbox("Show", [25, 50, 100, 200])
     
-    # Recent activity summary (simplified)
-    st.subheader("📊 Recent Activity Summary")
-    
-    # Get recent estimates, jobs, calls created
-    recent_activity = []
-    
-    # Recent estimates
-    estimates = execute_query("""
-        SELECT 'Estimate Created' as action, u.username, e.created_at, 
-               CONCAT('Estimate #', e.id, ' for ', e.client_name) as details
-        FROM estimates e 
-        JOIN users u ON e.created_by = u.id 
-        ORDER BY e.created_at DESC LIMIT 10
-    """, fetch=True) or []
-    
-    recent_activity.extend(estimates)
-    
-    # Recent jobs
-    jobs = execute_query("""
-        SELECT 'Job Created' as action, 'System' as username, created_at,
-               CONCAT('Job #', id, ' - ', job_title) as details
-        FROM jobs 
-        ORDER BY created_at DESC LIMIT 10
-    """, fetch=True) or []
-    
-    recent_activity.extend(jobs)
-    
-    # Recent AI calls
-    calls = execute_query("""
-        SELECT 'AI Call Processed' as action, 'AI System' as username, created_at,
-               CONCAT(call_type, ' call to ', phone_number) as details
-        FROM ai_calls 
-        ORDER BY created_at DESC LIMIT 10
-    """, fetch=True) or []
-    
-    recent_activity.extend(calls)
-    
-    # Sort by timestamp and display
-    recent_activity.sort(key=lambda x: x['created_at'], reverse=True)
-    
-    if recent_activity:
-        for activity in recent_activity[:show_count]:
-            col1, col2, col3, col4 = st.columns([2, 2, 2, 2])
-            
-            with col1:
-                st.write(f"**{activity['action']}**")
-            
-            with col2:
-                st.write(f"User: {activity['username']}")
-            
-            with col3:
-                st.write(f"Time: {activity['created_at'].strftime('%m/%d/%Y %I:%M %p')}")
-            
-            with col4:
-                st.write(f"Details: {activity['details']}")
+    event_type = next((key for key, label in AUDIT_EVENT_TYPES.items() if label == log_type), None)
+    user_id = user_ids.get(user_filter) if user_filter != "All" else None
+    start_date = date_filter[0] if len(date_filter) > 0 else None
+    end_date = date_filter[1] if len(date_filter) > 1 else start_date
+    
+    total_events = count_audit_events(event_type, user_id, start_date, end_date)
+    page_count = max((total_events + show_count - 1) // show_count, 1)
+    
+    col1, col2 = st.columns([1, 3])
+    with col1:
+        page = st.number_input("Page", min_value=1, max_value=page_count, value=1, step=1)
+    with col2:
+        st.write("")
+        st.caption(f"{total_events:,} events · page {page} of {page_count}")
+    
+    events = get_audit_events(event_type, user_id, start_date, end_date,
+                              limit=show_count, offset=(page - 1) * show_count)
+    
+    if events:
+        event_data = []
+        for event in events:
+            target = event['entity'] or ''
+            if event['entity_id'] is not None:
+                target += f" #{event['entity_id']}"
             
-            st.markdown("---")
+            event_data.append({
+                "Time": event['occurred_at'].strftime('%m/%d/%Y %I:%M:%S %p'),
+                "Type": AUDIT_EVENT_TYPES.get(event['event_type'], event['event_type']),
+                "Action": event['action'].replace('_', ' ').title(),
+                "User": event['username'] or 'System',
+                "Target": target,
+                "Details": event['details'] or ''
+            })
+        
+        st.dataframe(pd.DataFrame(event_data), use_container_width=True, hide_index=True)
     else:
-        st.info("No recent activity found.")
+        st.info("No audit events found.")
     
     # Export audit logs
     st.markdown("---")
-    if st.button("📥 Export Audit Logs", use_container_width=True):
-        st.info("Audit log export functionality would be implemented here")
+    col1, col2 = st.columns(2)
+    
+    with col1:
+        audit_format = st.selectbox("Export Format", [f for f in EXPORT_FORMATS if f != 'Parquet' or parquet_available()],
+                                    key="audit_export_format")
+    
+    with col2:
+        st.write("")
+        if st.button("📥 Export Audit Logs", use_container_width=True):
+            filters = {}
+            if event_type:
+                filters['event_type'] = event_type
+            if user_id is not None:
+                filters['user_id'] = user_id
+            
+            with st.spinner("Exporting audit events..."):
+                export = export_table('audit_events', audit_format, start_date, end_date, filters)
+            
+            if export:
+                previous = st.session_state.get('audit_export')
+                if previous:
+                    remove_export(previous['path'])
+                st.session_state.audit_export = export
+                audit_log.record('system', 'export', 'audit_events', details=f"{audit_format}, {export['size']:,} bytes")
+    
+    export = st.session_state.get('audit_export')
+    if export and os.path.exists(export['path']):
+        with open(export['path'], 'rb') as export_file:
+            st.download_button(
+                f"💾 Download {export['filename']}",
+                data=export_file,
+                file_name=export['filename'],
+                mime=export['mime_type'],
+                use_container_width=True
+            )
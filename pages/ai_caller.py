@@ -1,5 +1,4 @@
 import streamlit as st
-import pandas as pd
 import sys
 import os
 
@@ -33,8 +32,9 @@ except ImportError:
             return self.agents.get(agent_name.lower(), {})
 
 from database import (get_ai_calls, log_ai_call, execute_query, get_calls_by_date_range, 
-                     get_conversion_metrics, get_previous_period_success_rate,
-                     get_call_performance_trends, get_call_outcome_analysis)
+                     get_conversion_metrics, get_call_performance_trends, get_call_outcome_analysis)
+from period_comparison import get_call_period_comparison
+from timeseries import downsample_rows
 from datetime import datetime, date, timedelta
 import json
 
@@ -88,7 +88,10 @@ def show():
     st.info("AI Caller functionality is working! Jack and Amy are your AI agents.")
     st.success("✅ System Status: All agents online and ready for calls")
 
+@st.fragment
 def show_call_analytics():
+    import pandas as pd
+    
     st.subheader("📊 Enhanced Call Analytics Dashboard")
     
     # AI Agent Performance Cards
@@ -147,7 +150,7 @@ def show_call_analytics():
         end_date = st.date_input("To Date", value=date.today())
     with col3:
         if st.button("Refresh Data"):
-            st.rerun()
+            st.rerun(scope="fragment")
     
     # Get calls data for date range
     calls = get_calls_by_date_range(start_date, end_date)
@@ -170,14 +173,15 @@ def show_call_analytics():
         conversion_rate = conversion_metrics.get('call_to_estimate_rate', 0)
         close_rate = conversion_metrics.get('estimate_to_job_rate', 0)
         
+        # Previous period of the same length, computed in the same query as the current one
+        previous_period = get_call_period_comparison(start_date, end_date)[1]
+        
         with col1:
-            # Calculate previous period correctly for delta
-            prev_period_calls = len(get_calls_by_date_range(start_date - timedelta(days=7), start_date))
-            delta_calls = total_calls - prev_period_calls if total_calls > 0 else None
+            delta_calls = total_calls - previous_period['total_calls'] if total_calls > 0 else None
             st.metric("Total Calls", total_calls, delta=delta_calls)
         with col2:
             success_rate = (successful_calls / total_calls * 100) if total_calls > 0 else 0
-            st.metric("Success Rate", f"{success_rate:.1f}%", delta=f"{success_rate - get_previous_period_success_rate(start_date, end_date):.1f}%")
+            st.metric("Success Rate", f"{success_rate:.1f}%", delta=f"{success_rate - previous_period['success_rate']:.1f}%")
         with col3:
             st.metric("Avg Duration", f"{avg_duration:.1f} min")
         with col4:
@@ -221,61 +225,7 @@ def show_call_analytics():
             fig.update_layout(xaxis_title="Status", yaxis_title="Count")
             st.plotly_chart(fig, use_container_width=True)
         
-        # Performance Trends Section
-        st.subheader("📈 Advanced Performance Analytics")
-        
-        # Get performance trends data
-        performance_trends = get_call_performance_trends(30)
-        
-        if performance_trends:
-            
-            # Create comprehensive trends dataframe
-            df_trends = pd.DataFrame(performance_trends)
-            df_trends['success_rate'] = (df_trends['successful_calls'] / df_trends['total_calls'] * 100).round(1)
-            
-            # Create two columns for trends
-            col1, col2 = st.columns(2)
-            
-            with col1:
-                # Call volume trend with success rate
-                fig = px.line(df_trends, x='call_date', y='total_calls', 
-                             title='Daily Call Volume Trend',
-                             color_discrete_sequence=['#1f77b4'])
-                fig.add_scatter(x=df_trends['call_date'], y=df_trends['successful_calls'], 
-                               mode='lines', name='Successful Calls', line=dict(color='green'))
-                fig.update_layout(yaxis_title="Number of Calls")
-                st.plotly_chart(fig, use_container_width=True)
-            
-            with col2:
-                # Success rate trend
-                fig = px.line(df_trends, x='call_date', y='success_rate',
-                             title='Success Rate Trend (%)',
-                             color_discrete_sequence=['#2ca02c'])
-                fig.update_layout(yaxis_title="Success Rate (%)")
-                st.plotly_chart(fig, use_container_width=True)
-            
-            # Performance metrics table
-            st.subheader("📊 Detailed Performance Metrics")
-            
-            # Calculate trend indicators
-            recent_avg = df_trends['success_rate'].tail(7).mean()
-            overall_avg = df_trends['success_rate'].mean()
-            trend_indicator = "📈" if recent_avg > overall_avg else "📉"
-            
-            col1, col2, col3, col4 = st.columns(4)
-            
-            with col1:
-                st.metric("7-Day Avg Success Rate", f"{recent_avg:.1f}%", 
-                         delta=f"{recent_avg - overall_avg:.1f}%")
-            with col2:
-                total_recent_calls = df_trends['total_calls'].tail(7).sum()
-                st.metric("7-Day Total Calls", int(total_recent_calls))
-            with col3:
-                avg_duration = df_trends['avg_duration'].mean()
-                st.metric("Avg Call Duration", f"{avg_duration:.1f} min")
-            with col4:
-                st.write(f"**Trend: {trend_indicator}**")
-                st.write("Recent performance vs. overall")
+        show_performance_trends()
         
         # Call Outcome Analysis
         st.subheader("🎯 Call Outcome Analysis")
@@ -339,6 +289,82 @@ def show_call_analytics():
     else:
         st.info("No call data available yet. Start processing calls to see analytics.")
 
+@st.fragment
+def show_performance_trends():
+    """Call trend charts; changing the range or grouping only reruns this section"""
+    import pandas as pd
+    import plotly.express as px
+    
+    # Performance Trends Section
+    st.subheader("📈 Advanced Performance Analytics")
+    
+    col1, col2 = st.columns(2)
+    with col1:
+        trend_days = st.selectbox("Trend Range", [30, 90, 365, 1095],
+                                  format_func=lambda x: f"Last {x} days", key="call_trend_days")
+    with col2:
+        trend_bucket = st.selectbox("Group By", ["Auto", "Day", "Week", "Month"], key="call_trend_bucket")
+    
+    # Bucketed in SQL, then thinned so each line sends at most MAX_CHART_POINTS points
+    performance_trends = get_call_performance_trends(
+        trend_days, None if trend_bucket == "Auto" else trend_bucket.lower()
+    )
+    overall_calls = sum(row['total_calls'] for row in performance_trends)
+    overall_successful = sum(row['successful_calls'] for row in performance_trends)
+    performance_trends = downsample_rows(performance_trends, 'call_date', 'total_calls')
+    
+    if overall_calls:
+        
+        # Create comprehensive trends dataframe
+        df_trends = pd.DataFrame(performance_trends)
+        df_trends['success_rate'] = (df_trends['successful_calls'] / df_trends['total_calls'].replace(0, float('nan')) * 100).round(1)
+        
+        # Create two columns for trends
+        col1, col2 = st.columns(2)
+        
+        with col1:
+            # Call volume trend with success rate
+            fig = px.line(df_trends, x='call_date', y='total_calls', 
+                         title='Call Volume Trend',
+                         color_discrete_sequence=['#1f77b4'])
+            fig.add_scatter(x=df_trends['call_date'], y=df_trends['successful_calls'], 
+                           mode='lines', name='Successful Calls', line=dict(color='green'))
+            fig.update_layout(yaxis_title="Number of Calls")
+            st.plotly_chart(fig, use_container_width=True)
+        
+        with col2:
+            # Success rate trend
+            fig = px.line(df_trends, x='call_date', y='success_rate',
+                         title='Success Rate Trend (%)',
+                         color_discrete_sequence=['#2ca02c'])
+            fig.update_layout(yaxis_title="Success Rate (%)")
+            st.plotly_chart(fig, use_container_width=True)
+        
+        # Performance metrics table
+        st.subheader("📊 Detailed Performance Metrics")
+        
+        # Calculate trend indicators (last 7 days vs the whole range)
+        recent_trends = get_call_performance_trends(6, 'day')
+        total_recent_calls = sum(row['total_calls'] for row in recent_trends)
+        recent_successful = sum(row['successful_calls'] for row in recent_trends)
+        recent_avg = (recent_successful / total_recent_calls * 100) if total_recent_calls else 0
+        overall_avg = overall_successful / overall_calls * 100
+        trend_indicator = "📈" if recent_avg > overall_avg else "📉"
+        
+        col1, col2, col3, col4 = st.columns(4)
+        
+        with col1:
+            st.metric("7-Day Avg Success Rate", f"{recent_avg:.1f}%", 
+                     delta=f"{recent_avg - overall_avg:.1f}%")
+        with col2:
+            st.metric("7-Day Total Calls", int(total_recent_calls))
+        with col3:
+            avg_duration = df_trends['avg_duration'].mean()
+            st.metric("Avg Call Duration", f"{avg_duration:.1f} min")
+        with col4:
+            st.write(f"**Trend: {trend_indicator}**")
+            st.write("Recent performance vs. overall")
+
 def show_process_call():
     st.subheader("📞 Process Inbound Call")
     
@@ -529,6 +555,7 @@ def show_outbound_campaigns():
     else:
         st.info("No outbound calls initiated yet.")
 
+@st.fragment
 def show_call_history():
     st.subheader("📜 Call History & AI Agent Performance")
     
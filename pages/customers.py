@@ -1,11 +1,17 @@
 import streamlit as st
 from database import (
-    get_customers, create_customer, get_customer_by_id, update_customer, delete_customer,
-    add_customer_contact, get_customer_contacts, update_contact_completed,
-    get_pending_follow_ups, get_customer_projects_summary, get_user_by_username
+    get_customers, get_customers_page, get_customer_counts, create_customer, get_customer_by_id,
+    update_customer, delete_customer, add_customer_contact, get_customer_contacts, update_contact_completed,
+    get_customer_360, get_user_by_username
 )
+from audit import audit_log, current_user
+from customer_import import (
+    IMPORT_FIELDS, REQUIRED_IMPORT_FIELDS, CUSTOMER_TYPES, CUSTOMER_STATUSES,
+    xlsx_available, get_import_columns, suggest_mapping, import_customers
+)
+from customer_matching import DUPLICATE_THRESHOLD, find_duplicate_customers, merge_customers
+from follow_ups import FOLLOW_UP_BUCKETS, FOLLOW_UP_ESCALATION_DAYS, get_follow_up_queue, follow_up_scheduler
 from datetime import datetime, date, timedelta
-import pandas as pd
 
 REQUIRED_ROLE = 'admin'
 
@@ -13,7 +19,7 @@ def show():
     st.markdown("# 👥 Customer Management")
     st.markdown("Comprehensive customer relationship management system")
     
-    tab1, tab2, tab3, tab4 = st.tabs(["Customer List", "Add Customer", "Contact History", "Follow-ups"])
+    tab1, tab2, tab3, tab4, tab5 = st.tabs(["Customer List", "Add Customer", "Contact History", "Follow-ups", "Duplicates"])
     
     with tab1:
         show_customer_list()
@@ -26,100 +32,122 @@ def show():
     
     with tab4:
         show_follow_ups()
+    
+    with tab5:
+        show_duplicates()
+
+# Rows per page in the customer grid
+CUSTOMER_PAGE_SIZES = [25, 50, 100, 200]
+
+CUSTOMER_STATUS_ICONS = {'active': '🟢', 'inactive': '🔴', 'prospect': '🟡'}
 
 def show_customer_list():
+    import pandas as pd
+    
     st.subheader("📋 Customer Database")
     
-    try:
-        # Search and filter controls
-        col1, col2, col3 = st.columns([2, 1, 1])
-        with col1:
-            search_term = st.text_input("🔍 Search customers", placeholder="Search by name, email, or company...")
-        with col2:
-            status_filter = st.selectbox("Filter by Status", ["All", "active", "inactive", "prospect"])
-        with col3:
-            customer_type_filter = st.selectbox("Customer Type", ["All", "residential", "commercial"])
-        
-        # Get customers with filters
-        status = None if status_filter == "All" else status_filter.lower()
-        customers = get_customers(status=status, search=search_term)
-        
-    except Exception as e:
-        st.error("Unable to load customer data. Please refresh the page.")
-        return
+    # Search and filter controls
+    col1, col2, col3, col4 = st.columns([2, 1, 1, 1])
+    with col1:
+        search_term = st.text_input("🔍 Search customers", placeholder="Search by name, email, or company...")
+    with col2:
+        status_filter = st.selectbox("Filter by Status", ["All", "active", "inactive", "prospect"])
+    with col3:
+        customer_type_filter = st.selectbox("Customer Type", ["All", "residential", "commercial"])
+    with col4:
+        page_size = st.selectbox("Show", CUSTOMER_PAGE_SIZES, key="customer_page_size")
     
-    # Filter by customer type
-    if customer_type_filter != "All":
-        customers = [c for c in customers if c['customer_type'] == customer_type_filter.lower()]
+    filters = {
+        'status': None if status_filter == "All" else status_filter,
+        'customer_type': None if customer_type_filter == "All" else customer_type_filter,
+        'search': search_term.strip() or None
+    }
     
     # Customer metrics
-    if customers:
-        total_customers = len(customers)
-        active_customers = len([c for c in customers if c['status'] == 'active'])
-        commercial_customers = len([c for c in customers if c['customer_type'] == 'commercial'])
-        
+    counts = get_customer_counts(**filters)
+    
+    if counts['total']:
         col1, col2, col3, col4 = st.columns(4)
         with col1:
-            st.metric("Total Customers", total_customers)
+            st.metric("Total Customers", counts['total'])
         with col2:
-            st.metric("Active Customers", active_customers)
+            st.metric("Active Customers", counts['active'])
         with col3:
-            st.metric("Commercial", commercial_customers)
+            st.metric("Commercial", counts['commercial'])
         with col4:
-            residential_customers = total_customers - commercial_customers
-            st.metric("Residential", residential_customers)
+            st.metric("Residential", counts['residential'])
         
         st.markdown("---")
         
+        page_count = max((counts['total'] + page_size - 1) // page_size, 1)
+        col1, col2 = st.columns([1, 3])
+        with col1:
+            page = st.number_input("Page", min_value=1, max_value=page_count, value=1, step=1, key="customer_page")
+        with col2:
+            st.write("")
+            st.caption(f"{counts['total']:,} customers · page {page} of {page_count}")
+        
+        customers = get_customers_page(**filters, limit=page_size, offset=(page - 1) * page_size)
+        
         # Customer list
-        for customer in customers:
-            with st.container():
-                col1, col2, col3, col4 = st.columns([3, 2, 2, 2])
-                
-                with col1:
-                    full_name = f"{customer['first_name']} {customer['last_name']}"
-                    st.write(f"**{full_name}**")
-                    if customer['company_name']:
-                        st.write(f"Company: {customer['company_name']}")
-                    st.write(f"Email: {customer['email'] or 'Not provided'}")
-                    st.write(f"Phone: {customer['phone'] or 'Not provided'}")
-                
-                with col2:
-                    st.write(f"**Type:** {customer['customer_type'].title()}")
-                    status_colors = {'active': '🟢', 'inactive': '🔴', 'prospect': '🟡'}
-                    st.write(f"**Status:** {status_colors.get(customer['status'], '⚪')} {customer['status'].title()}")
-                    st.write(f"**Lead Source:** {customer['lead_source'] or 'Unknown'}")
-                
-                with col3:
-                    # Get project summary
-                    summary = get_customer_projects_summary(customer['id'])
-                    st.write(f"**Estimates:** {summary['total_estimates']}")
-                    st.write(f"**Jobs:** {summary['total_jobs']}")
-                    st.write(f"**Revenue:** ${summary['total_revenue']:,.2f}")
-                
-                with col4:
-                    if st.button("👁️ View", key=f"view_{customer['id']}", use_container_width=True):
-                        st.session_state[f"view_customer_{customer['id']}"] = True
-                        st.rerun()
-                    
-                    if st.button("✏️ Edit", key=f"edit_{customer['id']}", use_container_width=True):
-                        st.session_state[f"edit_customer_{customer['id']}"] = True
-                        st.rerun()
-                
-                # Customer detail view
-                if st.session_state.get(f"view_customer_{customer['id']}", False):
-                    show_customer_details(customer)
-                
-                # Edit customer form
-                if st.session_state.get(f"edit_customer_{customer['id']}", False):
-                    show_edit_customer_form(customer)
-                
-                st.markdown("---")
+        df = pd.DataFrame([
+            {
+                "Name": f"{customer['first_name']} {customer['last_name']}",
+                "Company": customer['company_name'] or "",
+                "Email": customer['email'] or "",
+                "Phone": customer['phone'] or "",
+                "Type": (customer['customer_type'] or "").title(),
+                "Status": f"{CUSTOMER_STATUS_ICONS.get(customer['status'], '⚪')} {(customer['status'] or '').title()}",
+                "Lead Source": customer['lead_source'] or "Unknown",
+                "Estimates": customer['total_estimates'],
+                "Jobs": customer['total_jobs'],
+                "Revenue": float(customer['total_revenue'])
+            }
+            for customer in customers
+        ])
+        
+        event = st.dataframe(
+            df,
+            use_container_width=True,
+            hide_index=True,
+            on_select="rerun",
+            selection_mode="single-row",
+            key="customer_grid",
+            column_config={"Revenue": st.column_config.NumberColumn(format="$%.2f")}
+        )
+        
+        selected_rows = event.selection.rows
+        if selected_rows and selected_rows[0] < len(customers):
+            customer = customers[selected_rows[0]]
+            
+            col1, col2, _ = st.columns([1, 1, 4])
+            with col1:
+                if st.button("👁️ View", key="view_customer", use_container_width=True):
+                    st.session_state.customer_panel = (customer['id'], 'view')
+                    st.rerun()
+            with col2:
+                if st.button("✏️ Edit", key="edit_customer", use_container_width=True):
+                    st.session_state.customer_panel = (customer['id'], 'edit')
+                    st.rerun()
+            
+            # Only the selected customer gets a detail view or edit form
+            panel = st.session_state.get('customer_panel')
+            if panel == (customer['id'], 'view'):
+                show_customer_details(customer)
+            elif panel == (customer['id'], 'edit'):
+                show_edit_customer_form(customer)
+        else:
+            st.caption("Select a customer to view or edit their details.")
     else:
         st.info("No customers found. Add your first customer using the 'Add Customer' tab.")
 
 def show_customer_details(customer):
     """Show detailed customer information"""
+    customer = get_customer_360(customer['id'])
+    if not customer:
+        st.error("Customer not found")
+        return
+    
     with st.expander(f"👤 Customer Details: {customer['first_name']} {customer['last_name']}", expanded=True):
         col1, col2 = st.columns(2)
         
@@ -152,21 +180,49 @@ def show_customer_details(customer):
                 st.text_area("", value=customer['notes'], height=100, disabled=True, key=f"notes_view_{customer['id']}")
         
         # Project summary
-        summary = get_customer_projects_summary(customer['id'])
         st.write("**Project Summary:**")
         summary_col1, summary_col2, summary_col3, summary_col4 = st.columns(4)
         
         with summary_col1:
-            st.metric("Total Estimates", summary['total_estimates'])
+            st.metric("Total Estimates", customer['total_estimates'])
         with summary_col2:
-            st.metric("Approved Estimates", summary['approved_estimates'])
+            st.metric("Approved Estimates", customer['approved_estimates'])
         with summary_col3:
-            st.metric("Total Jobs", summary['total_jobs'])
+            st.metric("Total Jobs", customer['total_jobs'])
         with summary_col4:
-            st.metric("Total Revenue", f"${summary['total_revenue']:,.2f}")
+            st.metric("Total Revenue", f"${customer['total_revenue']:,.2f}")
+        
+        # Billing summary
+        billing_col1, billing_col2, billing_col3, billing_col4 = st.columns(4)
+        
+        with billing_col1:
+            st.metric("Invoices", customer['total_invoices'])
+        with billing_col2:
+            st.metric("Invoiced", f"${customer['total_invoiced']:,.2f}")
+        with billing_col3:
+            st.metric("Balance Due", f"${customer['balance_due']:,.2f}")
+        with billing_col4:
+            st.metric("Documents", customer['total_documents'])
+        
+        if customer['jobs']:
+            st.write("\n**Recent Jobs:**")
+            for job in customer['jobs']:
+                dates = job['start_date'].strftime('%m/%d/%Y') if job['start_date'] else "Not scheduled"
+                st.write(f"• **#{job['id']} {job['job_title']}** - {job['status'].replace('_', ' ').title()} ({dates})")
+        
+        if customer['invoices']:
+            st.write("\n**Recent Invoices:**")
+            for invoice in customer['invoices']:
+                balance = f"${invoice['balance']:,.2f} due" if invoice['balance'] > 0 else "Paid"
+                st.write(f"• **{invoice['invoice_number']}** - ${invoice['total_amount']:,.2f} ({balance})")
+        
+        if customer['document_counts']:
+            st.write("\n**Documents:** " + ", ".join(
+                f"{count} {document_type.replace('_', ' ')}" for document_type, count in customer['document_counts'].items()
+            ))
         
         # Recent contacts
-        contacts = get_customer_contacts(customer['id'], limit=5)
+        contacts = customer['contacts'][:5]
         if contacts:
             st.write("\n**Recent Contacts:**")
             for contact in contacts:
@@ -180,7 +236,7 @@ def show_customer_details(customer):
         
         # Close button
         if st.button("Close Details", key=f"close_view_{customer['id']}"):
-            st.session_state[f"view_customer_{customer['id']}"] = False
+            st.session_state.customer_panel = None
             st.rerun()
 
 def show_edit_customer_form(customer):
@@ -241,7 +297,7 @@ def show_edit_customer_form(customer):
                         
                         if update_customer(customer['id'], customer_data):
                             st.success("✅ Customer updated successfully!")
-                            st.session_state[f"edit_customer_{customer['id']}"] = False
+                            st.session_state.customer_panel = None
                             st.rerun()
                         else:
                             st.error("❌ Failed to update customer")
@@ -250,7 +306,7 @@ def show_edit_customer_form(customer):
             
             with form_col2:
                 if st.form_submit_button("❌ Cancel", use_container_width=True):
-                    st.session_state[f"edit_customer_{customer['id']}"] = False
+                    st.session_state.customer_panel = None
                     st.rerun()
 
 def show_add_customer():
@@ -311,6 +367,105 @@ def show_add_customer():
                     st.error("❌ Failed to add customer. Email might already exist.")
             else:
                 st.error("❌ First name and last name are required")
+    
+    st.markdown("---")
+    show_bulk_import()
+
+def show_bulk_import():
+    import pandas as pd
+    
+    st.subheader("📥 Bulk Import")
+    st.write("Import customers from a CSV or Excel file exported from another CRM.")
+    
+    file_types = ["csv", "xlsx"] if xlsx_available() else ["csv"]
+    uploaded_file = st.file_uploader("Customer file", type=file_types, key="customer_import_file")
+    if not uploaded_file:
+        return
+    
+    try:
+        columns = get_import_columns(uploaded_file, uploaded_file.name)
+    except Exception as e:
+        st.error(f"Unable to read file: {str(e)}")
+        return
+    
+    if not columns:
+        st.warning("The file has no rows to import.")
+        return
+    
+    # Column mapping (pre-filled from the header names)
+    st.write("**Column Mapping:**")
+    suggested = suggest_mapping(columns)
+    options = ["(not imported)"] + columns
+    mapping = {}
+    mapping_cols = st.columns(3)
+    for i, field in enumerate(IMPORT_FIELDS):
+        with mapping_cols[i % 3]:
+            label = field.replace('_', ' ').title() + (" *" if field in REQUIRED_IMPORT_FIELDS else "")
+            column = st.selectbox(
+                label,
+                options,
+                index=options.index(suggested[field]) if field in suggested else 0,
+                key=f"import_map_{field}"
+            )
+            if column != options[0]:
+                mapping[field] = column
+    
+    col1, col2, col3 = st.columns(3)
+    with col1:
+        default_type = st.selectbox("Default Customer Type", list(CUSTOMER_TYPES), key="import_default_type")
+    with col2:
+        default_status = st.selectbox("Default Status", list(CUSTOMER_STATUSES), key="import_default_status")
+    with col3:
+        default_source = st.text_input("Default Lead Source", value="import", key="import_default_source")
+    
+    missing = [field for field in REQUIRED_IMPORT_FIELDS if field not in mapping]
+    if missing:
+        st.warning(f"Map a column to: {', '.join(f.replace('_', ' ').title() for f in missing)}")
+        return
+    
+    if st.button("📥 Import Customers", use_container_width=True):
+        status_text = st.empty()
+        
+        def report_progress(rows_read):
+            status_text.write(f"Read {rows_read:,} rows...")
+        
+        uploaded_file.seek(0)
+        result = import_customers(
+            uploaded_file, uploaded_file.name, mapping,
+            defaults={'customer_type': default_type, 'status': default_status, 'lead_source': default_source or None},
+            progress=report_progress
+        )
+        status_text.empty()
+        
+        if result is None:
+            return
+        
+        audit_log.record('data', 'import', 'customers', None,
+                         f"{uploaded_file.name}: {result['inserted']} inserted, {result['skipped']} skipped, "
+                         f"{result['invalid']} invalid of {result['rows']} rows")
+        
+        col1, col2, col3, col4 = st.columns(4)
+        with col1:
+            st.metric("Rows Read", f"{result['rows']:,}")
+        with col2:
+            st.metric("Imported", f"{result['inserted']:,}")
+        with col3:
+            st.metric("Skipped (Duplicates)", f"{result['skipped']:,}")
+        with col4:
+            st.metric("Invalid", f"{result['invalid']:,}")
+        
+        if result['errors']:
+            df_errors = pd.DataFrame(result['errors'], columns=["Row", "Problem"])
+            shown = len(result['errors'])
+            total = result['skipped'] + result['invalid']
+            st.write(f"**Row Report** ({shown:,} of {total:,} rows shown)" if shown < total else "**Row Report**")
+            st.dataframe(df_errors, use_container_width=True, hide_index=True)
+            st.download_button(
+                "📄 Download Row Report",
+                df_errors.to_csv(index=False),
+                file_name="customer_import_report.csv",
+                mime="text/csv"
+            )
 
 def show_contact_history():
     st.subheader("📞 Contact History Management")
@@ -433,43 +588,54 @@ def show_contact_history():
 def show_follow_ups():
     st.subheader("🔔 Pending Follow-ups")
     
-    pending_followups = get_pending_follow_ups()
+    user_id, _ = current_user()
     
-    if pending_followups:
-        # Sort by follow-up date
-        overdue = [f for f in pending_followups if f['follow_up_date'] < date.today()]
-        today = [f for f in pending_followups if f['follow_up_date'] == date.today()]
-        upcoming = [f for f in pending_followups if f['follow_up_date'] > date.today()]
-        
+    col1, col2 = st.columns(2)
+    with col1:
+        scope = st.radio("Show", ["All Follow-ups", "My Follow-ups"], horizontal=True, key="followup_scope")
+    with col2:
+        days_ahead = st.selectbox("Upcoming Window", [7, 14, 30], format_func=lambda d: f"Next {d} days", key="followup_days")
+    
+    queue = get_follow_up_queue(days=days_ahead, user_id=user_id if scope == "My Follow-ups" else None)
+    overdue, today, upcoming = (queue[bucket] for bucket in FOLLOW_UP_BUCKETS)
+    total_pending = overdue['count'] + today['count'] + upcoming['count']
+    
+    if user_id is not None:
+        my_queue = follow_up_scheduler.counts_for(user_id)
+        if my_queue['escalated']:
+            st.warning(f"🚩 {my_queue['escalated']} of your follow-ups are more than "
+                       f"{FOLLOW_UP_ESCALATION_DAYS} days overdue and have been escalated.")
+    
+    if total_pending:
         # Metrics
         col1, col2, col3, col4 = st.columns(4)
         with col1:
-            st.metric("Total Pending", len(pending_followups))
+            st.metric("Total Pending", total_pending)
         with col2:
-            st.metric("Overdue", len(overdue), delta=f"-{len(overdue)}" if overdue else None)
+            st.metric("Overdue", overdue['count'], delta=f"-{overdue['count']}" if overdue['count'] else None)
         with col3:
-            st.metric("Due Today", len(today))
+            st.metric("Due Today", today['count'])
         with col4:
-            st.metric("Upcoming", len(upcoming))
+            st.metric("Upcoming", upcoming['count'])
         
         st.markdown("---")
         
         # Show overdue first
-        if overdue:
+        if overdue['items']:
             st.error("🚨 **Overdue Follow-ups**")
-            for followup in overdue:
+            for followup in overdue['items']:
                 show_followup_item(followup, "overdue")
         
         # Show today's follow-ups
-        if today:
+        if today['items']:
             st.warning("⏰ **Due Today**")
-            for followup in today:
+            for followup in today['items']:
                 show_followup_item(followup, "today")
         
         # Show upcoming
-        if upcoming:
+        if upcoming['items']:
             st.info("📅 **Upcoming Follow-ups**")
-            for followup in upcoming[:10]:  # Limit to next 10
+            for followup in upcoming['items'][:10]:  # Limit to next 10
                 show_followup_item(followup, "upcoming")
     else:
         st.success("🎉 All caught up! No pending follow-ups.")
@@ -500,6 +666,8 @@ def show_followup_item(followup, category):
                 st.write(f"**Due:** In {days_diff} days")
             
             st.write(f"**Added by:** {followup.get('created_by_name', 'Unknown')}")
+            if followup['escalated_at']:
+                st.write("🚩 **Escalated**")
         
         with col4:
             if st.button("✅ Complete", key=f"complete_followup_{followup['id']}", use_container_width=True):
@@ -507,4 +675,63 @@ def show_followup_item(followup, category):
                     st.success("Follow-up completed!")
                     st.rerun()
         
-        st.markdown("---")
\ No newline at end of file
+        st.markdown("---")
+
+def show_duplicates():
+    st.subheader("🧬 Duplicate Customers")
+    st.write("Finds customers that share an email, phone, name or ZIP code and look like the same person.")
+    
+    col1, col2 = st.columns([2, 1])
+    with col1:
+        threshold = st.slider("Match Threshold", 0.5, 1.0, DUPLICATE_THRESHOLD, 0.05, key="duplicate_threshold")
+    with col2:
+        st.write("")
+        if st.button("🔍 Find Duplicates", use_container_width=True):
+            with st.spinner("Scanning customers..."):
+                st.session_state.duplicate_pairs = find_duplicate_customers(threshold)
+    
+    duplicates = st.session_state.get('duplicate_pairs')
+    if duplicates is None:
+        return
+    
+    if not duplicates:
+        st.success("No likely duplicates found.")
+        return
+    
+    st.write(f"**{len(duplicates)} likely duplicate pairs**")
+    
+    for duplicate in duplicates[:50]:
+        a, b = duplicate['customer_a'], duplicate['customer_b']
+        with st.container():
+            col1, col2, col3 = st.columns([3, 3, 2])
+            
+            for col, customer in ((col1, a), (col2, b)):
+                with col:
+                    st.write(f"**#{customer['id']} {customer['first_name']} {customer['last_name']}**")
+                    if customer['company_name']:
+                        st.write(f"Company: {customer['company_name']}")
+                    st.write(f"Email: {customer['email'] or 'Not provided'}")
+                    st.write(f"Phone: {customer['phone'] or 'Not provided'}")
+                    st.write(f"Created: {customer['created_at'].strftime('%m/%d/%Y')}")
+            
+            with col3:
+                st.metric("Match", f"{duplicate['score']:.0%}")
+                st.caption(", ".join(f"{field} {value:.0%}" for field, value in duplicate['fields'].items()))
+                
+                for keep, remove in ((a, b), (b, a)):
+                    if st.button(f"Keep #{keep['id']}", key=f"merge_{keep['id']}_{remove['id']}", use_container_width=True):
+                        moved = merge_customers(keep['id'], remove['id'])
+                        if moved is not None:
+                            audit_log.record('data', 'merge', 'customers', keep['id'],
+                                             f"Merged #{remove['id']}: " + ", ".join(f"{count} {table}" for table, count in moved.items()))
+                            # Pairs involving the removed customer are stale now
+                            st.session_state.duplicate_pairs = [
+                                d for d in duplicates
+                                if remove['id'] not in (d['customer_a']['id'], d['customer_b']['id'])
+                            ]
+                            st.success(f"Merged #{remove['id']} into #{keep['id']}")
+                            st.rerun()
+                        else:
+                            st.error("Failed to merge customers")
+            
+            st.markdown("---")
@@ -1,24 +1,52 @@
 import streamlit as st
-import plotly.express as px
-import plotly.graph_objects as go
 from database import get_estimates, get_jobs, get_ai_calls, get_financial_summary
 from datetime import datetime, timedelta
-import pandas as pd
 
 REQUIRED_ROLE = 'admin'
 
+# How long dashboard data is reused between reruns
+DASHBOARD_CACHE_TTL = 30
+
+@st.cache_data(ttl=DASHBOARD_CACHE_TTL, show_spinner=False)
+def load_estimates():
+    return get_estimates()
+
+@st.cache_data(ttl=DASHBOARD_CACHE_TTL, show_spinner=False)
+def load_jobs():
+    return get_jobs()
+
+@st.cache_data(ttl=DASHBOARD_CACHE_TTL, show_spinner=False)
+def load_recent_calls():
+    return get_ai_calls(30)  # Last 30 calls
+
+@st.cache_data(ttl=DASHBOARD_CACHE_TTL, show_spinner=False)
+def load_financial_summary():
+    return get_financial_summary()
+
 def show():
     st.markdown("# 📊 Dashboard Overview")
     st.markdown("Welcome to your PLANDEPA management dashboard")
     
+    # Each section is a fragment with its own data, so it can rerun on its own
+    show_key_metrics()
+    
+    st.markdown("---")
+    
+    show_status_charts()
+    
+    show_recent_activity()
+    
+    show_quick_actions()
+
+@st.fragment
+def show_key_metrics():
     # Key metrics row
     col1, col2, col3, col4 = st.columns(4)
     
-    # Get data for metrics
-    estimates = get_estimates()
-    jobs = get_jobs()
-    ai_calls = get_ai_calls(30)  # Last 30 calls
-    financial_data = get_financial_summary()
+    estimates = load_estimates()
+    jobs = load_jobs()
+    ai_calls = load_recent_calls()
+    financial_data = load_financial_summary()
     
     with col1:
         pending_estimates = len([e for e in estimates if e['status'] == 'pending'])
@@ -38,8 +66,11 @@ def show():
             if f['record_type'] == 'income':
                 total_revenue += float(f['total_amount'] or 0)
         st.metric("Total Revenue", f"${total_revenue:,.2f}", delta=None)
-    
-    st.markdown("---")
+
+@st.fragment
+def show_status_charts():
+    estimates = load_estimates()
+    jobs = load_jobs()
     
     # Charts row
     col1, col2 = st.columns(2)
@@ -47,6 +78,8 @@ def show():
     with col1:
         st.subheader("📋 Estimates Status Distribution")
         if estimates:
+            import plotly.express as px
+            
             estimate_status = {}
             for estimate in estimates:
                 status = estimate['status']
@@ -64,6 +97,8 @@ def show():
     with col2:
         st.subheader("🔨 Jobs Progress")
         if jobs:
+            import plotly.express as px
+            
             job_status = {}
             for job in jobs:
                 status = job['status']
@@ -78,6 +113,12 @@ def show():
             st.plotly_chart(fig, use_container_width=True)
         else:
             st.info("No jobs data available")
+
+@st.fragment
+def show_recent_activity():
+    estimates = load_estimates()
+    jobs = load_jobs()
+    ai_calls = load_recent_calls()
     
     # Recent activity
     st.subheader("🕒 Recent Activity")
@@ -160,7 +201,8 @@ def show():
                         st.write(f"{status_color.get(call['call_status'], '⚪')} {call['call_status'].title()}")
         else:
             st.info("No recent AI calls")
-    
+
+def show_quick_actions():
     # Quick actions
     st.markdown("---")
     st.subheader("⚡ Quick Actions")
@@ -1,6 +1,5 @@
 import streamlit as st
-import pandas as pd
-from datetime import datetime, date
+from datetime import datetime, date, timedelta
 import os
 import sys
 import mimetypes
@@ -13,6 +12,7 @@ from database import (
     upload_document, get_documents, get_document_by_id, update_document_metadata,
     archive_document, log_document_access, get_document_statistics,
     get_recent_document_activity, search_documents_by_content,
+    get_document_access_log, get_document_access_summary, get_document_access_filters,
     get_customers, get_jobs
 )
 
@@ -112,6 +112,8 @@ def show_document_stats():
 
 def show_all_documents():
     """Display all documents with filtering and management"""
+    import pandas as pd
+    
     st.subheader("Document Library")
     
     # Filters row
@@ -487,6 +489,8 @@ def show_search_documents():
 
 def show_document_analytics():
     """Document analytics and insights"""
+    import pandas as pd
+    
     st.subheader("📊 Document Analytics")
     
     # Get analytics data
@@ -558,41 +562,36 @@ def show_document_analytics():
 
 def show_access_log():
     """Document access logging and security"""
+    import pandas as pd
+    
     st.subheader("🔒 Document Access Log")
     
-    # Get recent access logs
-    access_logs = get_recent_document_activity(50)
+    col1, col2, col3 = st.columns(3)
+    
+    with col3:
+        show_last_hours = st.selectbox("Show Last", [24, 48, 168, 720], format_func=lambda x: f"{x} hours")
+    
+    since = datetime.now() - timedelta(hours=show_last_hours)
+    actions, users = get_document_access_filters(since.date())
+    user_ids = dict(users)
+    
+    with col1:
+        action_filter = st.selectbox("Filter by Action", ["All"] + actions)
+    
+    with col2:
+        user_filter = st.selectbox("Filter by User", ["All"] + [name for name, _ in users])
+    
+    access_type = action_filter if action_filter != "All" else None
+    user_id = user_ids.get(user_filter) if user_filter != "All" else None
+    
+    # Only the partitions covering the selected window are read
+    access_logs = get_document_access_log(since, access_type, user_id)
     
     if access_logs:
-        # Access log filters
-        col1, col2, col3 = st.columns(3)
-        
-        with col1:
-            action_filter = st.selectbox(
-                "Filter by Action",
-                ["All"] + list(set(log['access_type'] for log in access_logs))
-            )
-        
-        with col2:
-            user_filter = st.selectbox(
-                "Filter by User", 
-                ["All"] + list(set(log.get('user_name', 'Unknown') for log in access_logs))
-            )
-        
-        with col3:
-            show_last_hours = st.selectbox("Show Last", [24, 48, 168, 720], format_func=lambda x: f"{x} hours")
-        
-        # Filter logs
-        filtered_logs = access_logs
-        if action_filter != "All":
-            filtered_logs = [log for log in filtered_logs if log['access_type'] == action_filter]
-        if user_filter != "All":
-            filtered_logs = [log for log in filtered_logs if log.get('user_name') == user_filter]
-        
         # Display access log
         log_data = []
-        for log in filtered_logs:
-            customer_name = f"{log.get('first_name', '')} {log.get('last_name', '')}".strip()
+        for log in access_logs:
+            customer_name = f"{log.get('first_name') or ''} {log.get('last_name') or ''}".strip()
             
             # Add security indicators
             action_icon = {
@@ -609,39 +608,38 @@ def show_access_log():
                 "Action": f"{action_icon} {log['access_type'].title()}",
                 "Document": log['original_filename'],
                 "Type": log['document_type'].title(),
-                "User": log.get('user_name', 'Unknown'),
+                "User": log.get('user_name') or 'Unknown',
                 "Customer": customer_name or 'Unlinked',
-                "IP": log.get('ip_address', 'N/A')
+                "IP": log.get('ip_address') or 'N/A'
             })
         
         df = pd.DataFrame(log_data)
         st.dataframe(df, use_container_width=True, height=400)
-        
-        # Security summary
-        st.markdown("#### Security Summary")
-        col1, col2, col3, col4 = st.columns(4)
-        
-        with col1:
-            total_access = len(filtered_logs)
-            st.metric("Total Access Events", total_access)
-        
-        with col2:
-            unique_users = len(set(log.get('user_name', 'Unknown') for log in filtered_logs))
-            st.metric("Unique Users", unique_users)
-        
-        with col3:
-            unique_docs = len(set(log['original_filename'] for log in filtered_logs))
-            st.metric("Documents Accessed", unique_docs)
-        
-        with col4:
-            download_count = sum(1 for log in filtered_logs if log['access_type'] == 'download')
-            st.metric("Downloads", download_count)
-    
     else:
         st.info("No access log entries found.")
+    
+    # Security summary (from the daily rollup, so whole days are counted)
+    summary = get_document_access_summary(since.date(), access_type, user_id)
+    st.markdown("#### Security Summary")
+    st.caption(f"Since {since.date()}")
+    col1, col2, col3, col4 = st.columns(4)
+    
+    with col1:
+        st.metric("Total Access Events", summary['total_access'])
+    
+    with col2:
+        st.metric("Unique Users", summary['unique_users'])
+    
+    with col3:
+        st.metric("Documents Accessed", summary['unique_documents'])
+    
+    with col4:
+        st.metric("Downloads", summary['downloads'])
 
 def show_document_settings():
     """Document management settings and utilities"""
+    import pandas as pd
+    
     st.subheader("⚙️ Document Settings & Utilities")
     
     # Storage management
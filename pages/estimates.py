@@ -1,5 +1,5 @@
 import streamlit as st
-from database import create_estimate, get_estimates, update_estimate_status, create_job_from_estimate, get_user_by_username
+from database import create_estimate, get_estimates, update_estimates_status, convert_estimates_to_jobs, get_user_by_username
 from datetime import datetime, date
 from ai_bot import AICallerBot
 
@@ -61,7 +61,20 @@ def show_create_estimate():
             else:
                 st.error("❌ Please fill in all required fields (marked with *)")
 
+# Estimate statuses in workflow order
+ESTIMATE_STATUSES = ["pending", "sent", "approved", "rejected"]
+
+ESTIMATE_STATUS_ICONS = {
+    'pending': '🟡',
+    'sent': '🔵',
+    'approved': '🟢',
+    'rejected': '🔴'
+}
+
+@st.fragment
 def show_manage_estimates():
+    import pandas as pd
+    
     st.subheader("Existing Estimates")
     
     # Filter options
@@ -69,7 +82,7 @@ def show_manage_estimates():
     with col1:
         status_filter = st.selectbox(
             "Filter by Status",
-            ["All", "pending", "sent", "approved", "rejected"],
+            ["All"] + ESTIMATE_STATUSES,
             key="estimate_status_filter"
         )
     
@@ -77,97 +90,87 @@ def show_manage_estimates():
     estimates = get_estimates() if status_filter == "All" else get_estimates(status_filter.lower())
     
     if estimates:
-        for estimate in estimates:
-            with st.container():
-                col1, col2, col3, col4 = st.columns([3, 2, 1, 2])
-                
-                with col1:
-                    st.write(f"**#{estimate['id']} - {estimate['project_title']}**")
-                    st.write(f"Client: {estimate['client_name']}")
-                    if estimate['description']:
-                        st.write(f"Description: {estimate['description'][:100]}...")
-                
-                with col2:
-                    st.write(f"**Cost:** ${estimate['estimated_cost']:,.2f}" if estimate['estimated_cost'] else "Cost: TBD")
-                    st.write(f"**Created:** {estimate['created_at'].strftime('%m/%d/%Y')}")
-                
-                with col3:
-                    current_status = estimate['status']
-                    status_colors = {
-                        'pending': '🟡',
-                        'sent': '🔵',
-                        'approved': '🟢',
-                        'rejected': '🔴'
-                    }
-                    st.write(f"{status_colors.get(current_status, '⚪')} {current_status.title()}")
-                
-                with col4:
-                    # Status update dropdown
-                    new_status = st.selectbox(
-                        "Update Status",
-                        ["pending", "sent", "approved", "rejected"],
-                        index=["pending", "sent", "approved", "rejected"].index(current_status),
-                        key=f"status_{estimate['id']}"
-                    )
-                    
-                    col4a, col4b = st.columns(2)
-                    with col4a:
-                        if st.button("Update", key=f"update_{estimate['id']}", use_container_width=True):
-                            if update_estimate_status(estimate['id'], new_status):
-                                st.success("Status updated!")
-                                st.rerun()
-                            else:
-                                st.error("Update failed")
-                    
-                    with col4b:
-                        if new_status == "approved" and st.button("Create Job", key=f"job_{estimate['id']}", use_container_width=True):
-                            st.session_state[f"create_job_{estimate['id']}"] = True
-                            st.rerun()
-                
-                # Job creation form (appears when "Create Job" is clicked)
-                if st.session_state.get(f"create_job_{estimate['id']}", False):
-                    with st.expander(f"Create Job from Estimate #{estimate['id']}", expanded=True):
-                        with st.form(f"job_form_{estimate['id']}"):
-                            job_col1, job_col2 = st.columns(2)
-                            
-                            with job_col1:
-                                job_title = st.text_input("Job Title", value=estimate['project_title'], key=f"job_title_{estimate['id']}")
-                                start_date = st.date_input("Start Date", key=f"start_date_{estimate['id']}")
-                                actual_cost = st.number_input("Actual Cost ($)", value=float(estimate['estimated_cost'] or 0), key=f"actual_cost_{estimate['id']}")
-                            
-                            with job_col2:
-                                assigned_crew = st.text_input("Assigned Crew", placeholder="Team Alpha, John Smith, etc.", key=f"crew_{estimate['id']}")
-                                notes = st.text_area("Job Notes", placeholder="Special instructions, materials needed, etc.", key=f"notes_{estimate['id']}")
-                            
-                            job_col1, job_col2 = st.columns(2)
-                            with job_col1:
-                                if st.form_submit_button("Create Job", use_container_width=True):
-                                    job_data = {
-                                        'job_title': job_title,
-                                        'client_name': estimate['client_name'],
-                                        'start_date': start_date,
-                                        'actual_cost': actual_cost,
-                                        'assigned_crew': assigned_crew,
-                                        'notes': notes
-                                    }
-                                    
-                                    job_id = create_job_from_estimate(estimate['id'], job_data)
-                                    if job_id:
-                                        st.success(f"✅ Job #{job_id} created successfully!")
-                                        st.session_state[f"create_job_{estimate['id']}"] = False
-                                        st.rerun()
-                                    else:
-                                        st.error("❌ Failed to create job")
-                            
-                            with job_col2:
-                                if st.form_submit_button("Cancel", use_container_width=True):
-                                    st.session_state[f"create_job_{estimate['id']}"] = False
-                                    st.rerun()
-                
-                st.markdown("---")
+        df = pd.DataFrame([
+            {
+                "Estimate #": estimate['id'],
+                "Project": estimate['project_title'],
+                "Client": estimate['client_name'],
+                "Cost": float(estimate['estimated_cost']) if estimate['estimated_cost'] else None,
+                "Status": f"{ESTIMATE_STATUS_ICONS.get(estimate['status'], '⚪')} {estimate['status'].title()}",
+                "Created": estimate['created_at'].strftime('%m/%d/%Y'),
+                "Description": (estimate['description'] or "")[:100]
+            }
+            for estimate in estimates
+        ])
+        
+        event = st.dataframe(
+            df,
+            use_container_width=True,
+            hide_index=True,
+            on_select="rerun",
+            selection_mode="multi-row",
+            key="estimates_grid",
+            column_config={"Cost": st.column_config.NumberColumn(format="$%.2f")}
+        )
+        
+        selected = [estimates[i] for i in event.selection.rows if i < len(estimates)]
+        if selected:
+            show_estimate_actions(selected)
+        else:
+            st.caption("Select one or more estimates to update their status or convert them to jobs.")
     else:
         st.info("No estimates found. Create your first estimate using the form above.")
 
+def show_estimate_actions(selected):
+    """Status update and job conversion for the estimates selected in the grid"""
+    selected_ids = [estimate['id'] for estimate in selected]
+    st.write(f"**{len(selected)} estimate(s) selected**")
+    
+    col1, col2 = st.columns([2, 1])
+    with col1:
+        new_status = st.selectbox("Update Status", ESTIMATE_STATUSES, key="estimate_bulk_status")
+    with col2:
+        st.write("")
+        if st.button("Update", key="update_estimates", use_container_width=True):
+            if update_estimates_status(selected_ids, new_status):
+                st.success("Status updated!")
+                st.rerun()
+            else:
+                st.error("Update failed")
+    
+    # Approve and create jobs for all selected estimates in one transaction
+    with st.expander("Approve & Create Jobs", expanded=False):
+        single = selected[0] if len(selected) == 1 else None
+        
+        with st.form("convert_estimates_form"):
+            job_col1, job_col2 = st.columns(2)
+            
+            with job_col1:
+                if single:
+                    job_title = st.text_input("Job Title", value=single['project_title'])
+                    actual_cost = st.number_input("Actual Cost ($)", value=float(single['estimated_cost'] or 0))
+                start_date = st.date_input("Start Date")
+            
+            with job_col2:
+                assigned_crew = st.text_input("Assigned Crew", placeholder="Team Alpha, John Smith, etc.")
+                notes = st.text_area("Job Notes", placeholder="Special instructions, materials needed, etc.")
+            
+            if st.form_submit_button(f"Approve & Create {len(selected)} Job(s)", use_container_width=True):
+                defaults = {'start_date': start_date, 'assigned_crew': assigned_crew, 'notes': notes}
+                overrides = {single['id']: {'job_title': job_title, 'actual_cost': actual_cost}} if single else None
+                
+                created = convert_estimates_to_jobs(selected_ids, defaults, overrides)
+                if created is None:
+                    st.error("❌ Failed to create jobs")
+                else:
+                    skipped = len(selected_ids) - len(created)
+                    if skipped:
+                        st.warning(f"{skipped} estimate(s) skipped: rejected or already converted to a job")
+                    if created:
+                        job_numbers = ", ".join(f"#{row['job_id']}" for row in created)
+                        st.success(f"✅ Created job(s) {job_numbers}")
+                        st.rerun()
+
 def show_ai_cost_analysis():
     st.subheader("🤖 AI Cost Analysis")
     st.write("Use AI to help estimate project costs based on descriptions")
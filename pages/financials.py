@@ -1,10 +1,19 @@
 import streamlit as st
-import plotly.express as px
-import plotly.graph_objects as go
-import pandas as pd
-import numpy as np
 from database import add_financial_record, get_financial_summary, get_monthly_revenue, execute_query
 from datetime import datetime, date, timedelta
+from financial_reports import (DETAIL_PAGE_SIZE, get_summary_report, get_category_report, get_job_report,
+                               get_pl_comparison, get_transactions_page)
+from period_comparison import COMPARISON_OPTIONS, build_periods, trailing_months
+from analytics_cache import analytics_cache, get_financial_data_version
+
+# Display names for the forecasting models
+FORECAST_MODEL_NAMES = {
+    'naive': 'Last Month',
+    'linear': 'Linear Trend',
+    'holt': 'Holt Trend',
+    'seasonal_naive': 'Seasonal Naive',
+    'holt_winters': 'Holt-Winters Seasonal'
+}
 
 REQUIRED_ROLE = 'admin'
 
@@ -28,7 +37,11 @@ def show():
     with tab5:
         show_advanced_pl_reporting()
 
+@st.fragment
 def show_financial_overview():
+    import plotly.express as px
+    import plotly.graph_objects as go
+    
     st.subheader("Financial Overview")
     
     # Get financial summary
@@ -219,6 +232,7 @@ def show_add_transaction():
             else:
                 st.error("❌ Please fill in all required fields with valid values.")
 
+@st.fragment
 def show_financial_reports():
     st.subheader("📈 Financial Reports")
     
@@ -232,34 +246,33 @@ def show_financial_reports():
         report_type = st.selectbox("Report Type", ["Summary", "Detailed", "By Category", "By Job"])
     
     if st.button("Generate Report", use_container_width=True):
-        # Get transactions for date range
-        query = """
-            SELECT fr.*, j.job_title, j.client_name 
-            FROM financial_records fr 
-            LEFT JOIN jobs j ON fr.job_id = j.id 
-            WHERE fr.transaction_date BETWEEN %s AND %s 
-            ORDER BY fr.transaction_date DESC
-        """
-        transactions = execute_query(query, (start_date, end_date), fetch=True)
-        
-        if transactions:
-            if report_type == "Summary":
-                show_summary_report(transactions, start_date, end_date)
-            elif report_type == "Detailed":
-                show_detailed_report(transactions)
-            elif report_type == "By Category":
-                show_category_report(transactions)
-            elif report_type == "By Job":
-                show_job_report(transactions)
-        else:
-            st.info("No transactions found for the selected date range.")
+        st.session_state.financial_report = (start_date, end_date, report_type)
+        st.session_state.financial_report_page = 1
+    
+    # Keep showing the generated report while paging through it
+    if st.session_state.get('financial_report') != (start_date, end_date, report_type):
+        return
+    
+    # Totals come from one aggregate query; only the detailed report reads rows
+    summary = get_summary_report(start_date, end_date)
+    
+    if summary:
+        if report_type == "Summary":
+            show_summary_report(summary, start_date, end_date)
+        elif report_type == "Detailed":
+            show_detailed_report(start_date, end_date, summary['count'])
+        elif report_type == "By Category":
+            show_category_report(start_date, end_date)
+        elif report_type == "By Job":
+            show_job_report(start_date, end_date)
+    else:
+        st.info("No transactions found for the selected date range.")
 
-def show_summary_report(transactions, start_date, end_date):
+def show_summary_report(summary, start_date, end_date):
     st.subheader(f"Summary Report: {start_date} to {end_date}")
     
-    # Calculate totals
-    total_income = sum([t['amount'] for t in transactions if t['record_type'] == 'income'])
-    total_expenses = sum([t['amount'] for t in transactions if t['record_type'] == 'expense'])
+    total_income = summary['income']
+    total_expenses = summary['expense']
     net_profit = total_income - total_expenses
     
     col1, col2, col3 = st.columns(3)
@@ -270,15 +283,23 @@ def show_summary_report(transactions, start_date, end_date):
     with col3:
         st.metric("Net Profit", f"${net_profit:,.2f}")
     
-    # Transaction count by type
-    income_count = len([t for t in transactions if t['record_type'] == 'income'])
-    expense_count = len([t for t in transactions if t['record_type'] == 'expense'])
-    
-    st.write(f"**Transaction Count:** {len(transactions)} total ({income_count} income, {expense_count} expenses)")
+    st.write(f"**Transaction Count:** {summary['count']} total ({summary['income_count']} income, {summary['expense_count']} expenses)")
 
-def show_detailed_report(transactions):
+def show_detailed_report(start_date, end_date, total_count):
+    import pandas as pd
+    
     st.subheader("Detailed Transaction Report")
     
+    page_count = max((total_count + DETAIL_PAGE_SIZE - 1) // DETAIL_PAGE_SIZE, 1)
+    col1, col2 = st.columns([1, 3])
+    with col1:
+        page = st.number_input("Page", min_value=1, max_value=page_count, step=1, key="financial_report_page")
+    with col2:
+        st.write("")
+        st.caption(f"{total_count:,} transactions · page {page} of {page_count}")
+    
+    transactions = get_transactions_page(start_date, end_date, page)
+    
     # Create DataFrame for better display
     df_data = []
     for t in transactions:
@@ -295,29 +316,18 @@ def show_detailed_report(transactions):
     df = pd.DataFrame(df_data)
     st.dataframe(df, use_container_width=True)
 
-def show_category_report(transactions):
+def show_category_report(start_date, end_date):
     st.subheader("Report by Category")
     
-    # Group by category
-    category_data = {}
-    for t in transactions:
-        category = t['category'] or 'Uncategorized'
-        if category not in category_data:
-            category_data[category] = {'income': 0, 'expense': 0, 'count': 0}
-        
-        if t['record_type'] == 'income':
-            category_data[category]['income'] += t['amount']
-        else:
-            category_data[category]['expense'] += t['amount']
-        category_data[category]['count'] += 1
+    categories, total = get_category_report(start_date, end_date)
     
     # Display category breakdown
-    for category, data in category_data.items():
+    for data in categories:
         net = data['income'] - data['expense']
         col1, col2, col3, col4 = st.columns(4)
         
         with col1:
-            st.write(f"**{category}**")
+            st.write(f"**{data['category']}**")
         with col2:
             st.write(f"Income: ${data['income']:,.2f}")
         with col3:
@@ -325,30 +335,24 @@ def show_category_report(transactions):
         with col4:
             color = "green" if net >= 0 else "red"
             st.markdown(f"<span style='color:{color}'>Net: ${net:,.2f}</span>", unsafe_allow_html=True)
+    
+    if total:
+        st.markdown("---")
+        st.write(f"**All categories:** Income ${total['income']:,.2f} · Expenses ${total['expense']:,.2f} · "
+                 f"Net ${total['income'] - total['expense']:,.2f}")
 
-def show_job_report(transactions):
+def show_job_report(start_date, end_date):
     st.subheader("Report by Job")
     
-    # Group by job
-    job_data = {}
-    for t in transactions:
-        job_key = t['job_title'] if t['job_title'] else 'General/Unassigned'
-        if job_key not in job_data:
-            job_data[job_key] = {'income': 0, 'expense': 0, 'count': 0, 'client': t['client_name']}
-        
-        if t['record_type'] == 'income':
-            job_data[job_key]['income'] += t['amount']
-        else:
-            job_data[job_key]['expense'] += t['amount']
-        job_data[job_key]['count'] += 1
+    jobs, total = get_job_report(start_date, end_date)
     
     # Display job breakdown
-    for job, data in job_data.items():
+    for data in jobs:
         net = data['income'] - data['expense']
         
-        st.write(f"**{job}**")
-        if data['client']:
-            st.write(f"Client: {data['client']}")
+        st.write(f"**{data['job_title'] or 'General/Unassigned'}**")
+        if data['client_name']:
+            st.write(f"Client: {data['client_name']}")
         
         col1, col2, col3, col4 = st.columns(4)
         with col1:
@@ -362,26 +366,73 @@ def show_job_report(transactions):
             st.write(f"Transactions: {data['count']}")
         
         st.markdown("---")
+    
+    if total:
+        st.write(f"**All jobs:** Income ${total['income']:,.2f} · Expenses ${total['expense']:,.2f} · "
+                 f"Net ${total['income'] - total['expense']:,.2f} · {total['count']} transactions")
 
+def compute_financial_analytics(forecast_months):
+    """Build the monthly frame, metrics and forecasts shown on the Analytics tab"""
+    import pandas as pd
+    import numpy as np
+    from forecasting import FORECAST_HISTORY_MONTHS, monthly_series, forecast_series
+    
+    monthly_data = get_monthly_revenue()
+    if not monthly_data:
+        return None
+    
+    # Prepare data for analysis
+    df_monthly = pd.DataFrame([
+        {
+            'Month': row['month'].strftime('%Y-%m'),
+            'Date': row['month'],
+            'Revenue': float(row['revenue']),
+            'Expenses': float(row['expenses']),
+            'Profit': float(row['revenue']) - float(row['expenses']),
+            'Profit Margin': ((float(row['revenue']) - float(row['expenses'])) / float(row['revenue']) * 100) if float(row['revenue']) > 0 else 0
+        }
+        for row in monthly_data
+    ])
+    
+    # Forecasts use a longer history; fitted models are reused until another month closes
+    history = get_monthly_revenue(FORECAST_HISTORY_MONTHS)
+    revenue_forecast = forecast_series('revenue', *monthly_series(history, 'revenue'), forecast_months)
+    expense_forecast = forecast_series('expenses', *monthly_series(history, 'expenses'), forecast_months)
+    
+    enhanced_df = df_monthly.copy()
+    enhanced_df['ROI %'] = ((enhanced_df['Profit'] / enhanced_df['Expenses'].replace(0, np.nan)) * 100).round(1)
+    enhanced_df['Revenue Growth %'] = enhanced_df['Revenue'].pct_change().multiply(100).round(1)
+    
+    return {
+        'df_monthly': df_monthly,
+        'advanced_metrics': calculate_advanced_metrics(df_monthly),
+        'health_score': calculate_financial_health_score(df_monthly),
+        'revenue_forecast': revenue_forecast,
+        'expense_forecast': expense_forecast,
+        'cash_flow_forecast': generate_cash_flow_forecast(revenue_forecast, expense_forecast),
+        'enhanced_df': enhanced_df
+    }
+
+@st.fragment
 def show_financial_analytics():
+    import plotly.express as px
+    import plotly.graph_objects as go
+    
     st.subheader("📊 Enhanced Financial Analytics & Forecasting")
     
-    # Profit margin analysis
-    monthly_data = get_monthly_revenue()
+    # Recomputed only when financial_records changes; otherwise this costs one version probe
+    forecast_months = 6
+    data_version = get_financial_data_version()
+    if data_version is None:
+        analytics = compute_financial_analytics(forecast_months)
+    else:
+        analytics = analytics_cache.get_or_compute('financial_analytics', data_version,
+                                                   compute_financial_analytics, forecast_months)
     
-    if monthly_data:
-        # Prepare data for analysis
-        df_monthly = pd.DataFrame([
-            {
-                'Month': row['month'].strftime('%Y-%m'),
-                'Date': row['month'],
-                'Revenue': float(row['revenue']),
-                'Expenses': float(row['expenses']),
-                'Profit': float(row['revenue']) - float(row['expenses']),
-                'Profit Margin': ((float(row['revenue']) - float(row['expenses'])) / float(row['revenue']) * 100) if float(row['revenue']) > 0 else 0
-            }
-            for row in monthly_data
-        ])
+    if analytics:
+        df_monthly = analytics['df_monthly']
+        revenue_forecast = analytics['revenue_forecast']
+        expense_forecast = analytics['expense_forecast']
         
         # Enhanced Analytics Dashboard
         st.subheader("🎯 Performance Metrics & Forecasting")
@@ -390,7 +441,7 @@ def show_financial_analytics():
         
         with col1:
             # Revenue Trend with Forecasting
-            fig = create_revenue_forecast(df_monthly)
+            fig = create_revenue_forecast(df_monthly, revenue_forecast)
             st.plotly_chart(fig, use_container_width=True)
         
         with col2:
@@ -401,8 +452,7 @@ def show_financial_analytics():
         # Advanced Financial Metrics
         st.subheader("📈 Advanced Performance Indicators")
         
-        # Calculate advanced metrics
-        advanced_metrics = calculate_advanced_metrics(df_monthly)
+        advanced_metrics = analytics['advanced_metrics']
         
         col1, col2, col3, col4 = st.columns(4)
         
@@ -419,7 +469,7 @@ def show_financial_analytics():
         # Financial Health Score
         st.subheader("💪 Financial Health Dashboard")
         
-        health_score = calculate_financial_health_score(df_monthly)
+        health_score = analytics['health_score']
         
         col1, col2 = st.columns([1, 2])
         
@@ -460,13 +510,20 @@ def show_financial_analytics():
         # Cash Flow Forecast
         st.subheader("💰 Cash Flow Forecast")
         
-        forecast_months = 6
-        cash_flow_forecast = generate_cash_flow_forecast(df_monthly, forecast_months)
+        cash_flow_forecast = analytics['cash_flow_forecast']
         
-        fig = px.line(cash_flow_forecast, x='Month', y=['Projected Revenue', 'Projected Expenses', 'Projected Profit'],
-                     title=f'{forecast_months}-Month Cash Flow Forecast')
-        fig.update_layout(yaxis_title="Amount ($)")
-        st.plotly_chart(fig, use_container_width=True)
+        if not cash_flow_forecast.empty:
+            fig = px.line(cash_flow_forecast, x='Month', y=['Projected Revenue', 'Projected Expenses', 'Projected Profit'],
+                         title=f'{forecast_months}-Month Cash Flow Forecast')
+            fig.update_layout(yaxis_title="Amount ($)")
+            st.plotly_chart(fig, use_container_width=True)
+            
+            for label, forecast in (("Revenue", revenue_forecast), ("Expenses", expense_forecast)):
+                model_name = FORECAST_MODEL_NAMES.get(forecast['model'], forecast['model'])
+                error = f", backtest MAE ${forecast['backtest_mae']:,.0f}" if forecast['backtest_mae'] is not None else ""
+                st.caption(f"{label}: {model_name}{error}")
+        else:
+            st.info("At least one closed month of data is needed for a cash flow forecast.")
         
         # Budget vs Actual Analysis
         st.subheader("🎯 Budget vs Actual Performance")
@@ -478,13 +535,11 @@ def show_financial_analytics():
         
         # Show the enhanced data table
         st.subheader("📄 Detailed Monthly Financial Analysis")
-        enhanced_df = df_monthly.copy()
-        enhanced_df['ROI %'] = ((enhanced_df['Profit'] / enhanced_df['Expenses'].replace(0, np.nan)) * 100).round(1)
-        enhanced_df['Revenue Growth %'] = enhanced_df['Revenue'].pct_change().multiply(100).round(1)
-        st.dataframe(enhanced_df, use_container_width=True)
+        st.dataframe(analytics['enhanced_df'], use_container_width=True)
     else:
         st.info("No monthly financial data available for analysis. Start adding transactions to see advanced analytics and forecasting.")
 
+@st.fragment
 def show_advanced_pl_reporting():
     """Comprehensive Profit & Loss Statement with Industry-Standard Formatting"""
     st.subheader("📋 Advanced Profit & Loss Statement")
@@ -496,9 +551,13 @@ def show_advanced_pl_reporting():
     with col2:
         end_date = st.date_input("End Date", value=date.today())
     with col3:
-        comparison_period = st.selectbox("Compare To", ["None", "Previous Period", "Same Period Last Year"])
+        comparison_period = st.selectbox("Compare To", ["None"] + COMPARISON_OPTIONS + ["Trailing 12 Months"])
     
     if st.button("Generate P&L Statement", use_container_width=True):
+        if comparison_period == "Trailing 12 Months":
+            display_pl_trend(get_pl_comparison(trailing_months(12, end_date)))
+            return
+        
         # Generate comprehensive P&L statement
         pl_data = generate_pl_statement(start_date, end_date, comparison_period)
         
@@ -509,78 +568,45 @@ def show_advanced_pl_reporting():
 
 def generate_pl_statement(start_date, end_date, comparison_period):
     """Generate detailed P&L statement data"""
-    # Get transactions for the period
-    query = """
-        SELECT fr.*, j.job_title, j.client_name
-        FROM financial_records fr 
-        LEFT JOIN jobs j ON fr.job_id = j.id 
-        WHERE fr.transaction_date BETWEEN %s AND %s 
-        ORDER BY fr.transaction_date DESC
-    """
-    transactions = execute_query(query, (start_date, end_date), fetch=True)
+    # The selected period and its comparison are aggregated in a single query
+    comparisons = [comparison_period] if comparison_period != "None" else []
+    statements = get_pl_comparison(build_periods(start_date, end_date, comparisons))
     
-    if not transactions:
+    pl_data = statements[0]
+    if not pl_data:
         return None
     
-    # Categorize income and expenses
-    revenue_categories = {
-        'Client Payment': 0,
-        'Other Income': 0
-    }
-    
-    expense_categories = {
-        'Materials': 0,
-        'Labor Costs': 0,
-        'Equipment Purchase': 0,
-        'Vehicle Expenses': 0,
-        'Insurance': 0,
-        'Marketing': 0,
-        'Office Expenses': 0,
-        'Subcontractor Payment': 0,
-        'Other Expenses': 0
-    }
-    
-    # Process transactions
-    for t in transactions:
-        if t['record_type'] == 'income':
-            if t['category'] == 'Client Payment':
-                revenue_categories['Client Payment'] += t['amount']
-            else:
-                revenue_categories['Other Income'] += t['amount']
-        else:
-            category = t['category'] or 'Other Expenses'
-            if category in expense_categories:
-                expense_categories[category] += t['amount']
-            else:
-                expense_categories['Other Expenses'] += t['amount']
-    
-    # Calculate comparison data if requested
-    comparison_data = None
-    if comparison_period != "None":
-        comparison_data = get_comparison_period_data(start_date, end_date, comparison_period)
-    
-    return {
-        'revenue': revenue_categories,
-        'expenses': expense_categories,
-        'comparison': comparison_data,
-        'period': f"{start_date} to {end_date}",
-        'total_revenue': sum(revenue_categories.values()),
-        'total_expenses': sum(expense_categories.values())
-    }
+    pl_data['comparison'] = statements[1] if comparisons else None
+    return pl_data
 
-def get_comparison_period_data(start_date, end_date, comparison_type):
-    """Get data for comparison period"""
-    if comparison_type == "Previous Period":
-        period_length = (end_date - start_date).days
-        comp_end = start_date - timedelta(days=1)
-        comp_start = comp_end - timedelta(days=period_length)
-    elif comparison_type == "Same Period Last Year":
-        comp_start = start_date.replace(year=start_date.year - 1)
-        comp_end = end_date.replace(year=end_date.year - 1)
-    else:
-        return None
-    
-    return generate_pl_statement(comp_start, comp_end, "None")
+def display_pl_trend(statements):
+    """Display P&L lines for several periods side by side"""
+    import pandas as pd
+    
+    st.subheader("P&L Statement: Trailing 12 Months")
+    
+    columns = {}
+    for statement in statements:
+        if not statement:
+            continue
+        column = {}
+        for category, amount in statement['revenue'].items():
+            column[f"Revenue · {category}"] = float(amount)
+        column["Total Revenue"] = float(statement['total_revenue'])
+        for category, amount in statement['expenses'].items():
+            column[f"Expenses · {category}"] = float(amount)
+        column["Total Expenses"] = float(statement['total_expenses'])
+        column["Net Profit"] = float(statement['total_revenue'] - statement['total_expenses'])
+        columns[statement['label']] = column
+    
+    if not columns:
+        st.info("No financial data available for the selected period.")
+        return
+    
+    df = pd.DataFrame(columns)
+    # Skip lines that are empty in every month
+    df = df[(df != 0).any(axis=1) | df.index.str.startswith(("Total", "Net"))]
+    st.dataframe(df.style.format("${:,.2f}"), use_container_width=True)
 
 def display_pl_statement(pl_data, start_date, end_date, comparison_period):
     """Display formatted P&L statement"""
@@ -731,34 +757,17 @@ def display_pl_statement(pl_data, start_date, end_date, comparison_period):
             color = "green" if net_profit >= 0 else "red"
             st.markdown(f"**<span style='color:{color}'>${net_profit:,.2f} ({profit_margin:.1f}%)</span>**", unsafe_allow_html=True)
 
-def create_revenue_forecast(df_monthly):
+def create_revenue_forecast(df_monthly, revenue_forecast):
     """Create revenue forecast chart with trend analysis"""
-    if len(df_monthly) < 3:
-        # Simple forecast for limited data
-        avg_revenue = df_monthly['Revenue'].mean()
-        trend = df_monthly['Revenue'].iloc[-1] - df_monthly['Revenue'].iloc[0] if len(df_monthly) > 1 else 0
-        
+    import plotly.express as px
+    import plotly.graph_objects as go
+    
+    if len(df_monthly) < 3 or not revenue_forecast:
         fig = px.line(df_monthly, x='Month', y='Revenue', title='Revenue Trend with Basic Forecast')
         return fig
     
-    # Calculate moving average and trend
-    df_monthly['MA_3'] = df_monthly['Revenue'].rolling(window=3).mean()
-    
-    # Simple linear trend for forecasting
-    from datetime import datetime
-    import numpy as np
-    
-    # Convert months to numeric for trend analysis
-    numeric_months = pd.to_numeric(pd.to_datetime(df_monthly['Date']))
-    revenue_values = df_monthly['Revenue'].values
-    
-    # Fit linear trend
-    trend_coeff = np.polyfit(range(len(revenue_values)), revenue_values, 1)
-    trend_line = np.polyval(trend_coeff, range(len(revenue_values)))
-    
-    # Create forecast for next 6 months
-    future_months = 6
-    future_trend = np.polyval(trend_coeff, range(len(revenue_values), len(revenue_values) + future_months))
+    # Calculate moving average
+    ma_3 = df_monthly['Revenue'].rolling(window=3).mean()
     
     # Create chart
     fig = go.Figure()
@@ -768,38 +777,24 @@ def create_revenue_forecast(df_monthly):
                             mode='lines+markers', name='Actual Revenue', line=dict(color='blue')))
     
     # Moving average
-    fig.add_trace(go.Scatter(x=df_monthly['Month'], y=df_monthly['MA_3'], 
+    fig.add_trace(go.Scatter(x=df_monthly['Month'], y=ma_3, 
                             mode='lines', name='3-Month Moving Average', line=dict(color='orange', dash='dot')))
     
-    # Forecast (simplified)
-    last_month_date = df_monthly['Date'].iloc[-1]
-    forecast_months = []
-    forecast_values = []
-    
-    for i in range(1, future_months + 1):
-        future_date = last_month_date + pd.DateOffset(months=i)
-        forecast_months.append(future_date.strftime('%Y-%m'))
-        
-        # Simple forecast: trend + seasonality adjustment
-        seasonal_factor = 1.0  # Could be enhanced with actual seasonality
-        forecast_value = max(0, trend_line[-1] + (trend_coeff[0] * i) * seasonal_factor)
-        forecast_values.append(forecast_value)
-    
-    # Add forecast line
-    all_months = list(df_monthly['Month']) + forecast_months
-    all_values = list(df_monthly['Revenue']) + forecast_values
-    
-    fig.add_trace(go.Scatter(x=all_months[-future_months-1:], y=all_values[-future_months-1:], 
-                            mode='lines+markers', name='Forecast', 
+    # Forecast from the selected model (fitted on closed months only)
+    model_name = FORECAST_MODEL_NAMES.get(revenue_forecast['model'], revenue_forecast['model'])
+    fig.add_trace(go.Scatter(x=revenue_forecast['months'], y=revenue_forecast['values'], 
+                            mode='lines+markers', name=f'Forecast ({model_name})', 
                             line=dict(color='red', dash='dash'), marker=dict(symbol='diamond')))
     
-    fig.update_layout(title='Revenue Trend with 6-Month Forecast', 
+    fig.update_layout(title=f"Revenue Trend with {len(revenue_forecast['months'])}-Month Forecast", 
                       xaxis_title='Month', yaxis_title='Revenue ($)')
     
     return fig
 
 def create_profit_margin_analysis(df_monthly):
     """Create profit margin analysis with benchmarks"""
+    import plotly.graph_objects as go
+    
     # Industry benchmark for construction businesses (example)
     industry_benchmark = 15.0  # 15% profit margin
     
@@ -913,42 +908,25 @@ def calculate_financial_health_score(df_monthly):
         'assessment': assessment
     }
 
-def generate_cash_flow_forecast(df_monthly, forecast_months):
-    """Generate cash flow forecast based on historical trends"""
-    if len(df_monthly) == 0:
-        return pd.DataFrame()
-    
-    # Calculate trend coefficients
-    revenue_trend = np.polyfit(range(len(df_monthly)), df_monthly['Revenue'].values, 1)
-    expense_trend = np.polyfit(range(len(df_monthly)), df_monthly['Expenses'].values, 1)
-    
-    # Generate forecast data
-    forecast_data = []
-    last_date = df_monthly['Date'].iloc[-1]
+def generate_cash_flow_forecast(revenue_forecast, expense_forecast):
+    """Generate cash flow forecast from the revenue and expense model forecasts"""
+    import pandas as pd
     
-    for i in range(1, forecast_months + 1):
-        future_date = last_date + pd.DateOffset(months=i)
-        
-        # Project revenue and expenses with trend
-        projected_revenue = max(0, np.polyval(revenue_trend, len(df_monthly) + i - 1))
-        projected_expenses = max(0, np.polyval(expense_trend, len(df_monthly) + i - 1))
-        projected_profit = projected_revenue - projected_expenses
-        
-        # Add seasonality factor (simplified)
-        month_factor = 1.0 + 0.1 * np.sin(2 * np.pi * (future_date.month - 1) / 12)  # +/- 10% seasonal variation
-        projected_revenue *= month_factor
-        
-        forecast_data.append({
-            'Month': future_date.strftime('%Y-%m'),
-            'Projected Revenue': projected_revenue,
-            'Projected Expenses': projected_expenses,
-            'Projected Profit': projected_profit
-        })
+    if not revenue_forecast or not expense_forecast:
+        return pd.DataFrame()
     
-    return pd.DataFrame(forecast_data)
+    return pd.DataFrame({
+        'Month': revenue_forecast['months'],
+        'Projected Revenue': revenue_forecast['values'],
+        'Projected Expenses': expense_forecast['values'],
+        'Projected Profit': revenue_forecast['values'] - expense_forecast['values']
+    })
 
 def show_budget_analysis(df_monthly):
     """Show budget vs actual analysis with variance reporting"""
+    import plotly.graph_objects as go
+    import pandas as pd
+    
     st.write("**Budget vs Actual Performance Analysis**")
     
     # Simplified budget targets (could be enhanced with user input)
@@ -1047,8 +1025,10 @@ def show_financial_insights(df_monthly, advanced_metrics, health_score):
 
 def analyze_seasonality(df_monthly):
     """Analyze seasonal patterns in revenue"""
-    df_monthly['Month_Num'] = pd.to_datetime(df_monthly['Date']).dt.month
-    monthly_avg = df_monthly.groupby('Month_Num')['Revenue'].mean()
+    import pandas as pd
+    
+    month_numbers = pd.to_datetime(df_monthly['Date']).dt.month
+    monthly_avg = df_monthly['Revenue'].groupby(month_numbers).mean()
     
     peak_month = monthly_avg.idxmax()
     low_month = monthly_avg.idxmin()
@@ -1,5 +1,4 @@
 import streamlit as st
-import pandas as pd
 from datetime import datetime, timedelta, date
 import sys
 import os
@@ -12,6 +11,8 @@ from database import (
     update_payment_status, generate_invoice_from_job, get_overdue_invoices,
     get_invoice_statistics, get_customers, get_jobs
 )
+from audit import current_user
+from invoice_pdf import get_invoice_pdf, render_invoices, get_invoice_ids_for_period
 
 # Page configuration
 REQUIRED_ROLE = 'admin'
@@ -91,6 +92,8 @@ def show_invoice_stats():
 
 def show_all_invoices():
     """Display all invoices with filtering"""
+    import pandas as pd
+    
     st.subheader("All Invoices")
     
     # Filters
@@ -194,6 +197,8 @@ def show_all_invoices():
     
     else:
         st.info("No invoices found matching your criteria.")
+    
+    show_month_end_pdfs()
 
 def show_create_invoice():
     """Create new invoice form"""
@@ -451,9 +456,7 @@ def show_manual_invoice_creation():
                         'customer_id': customer['id'],
                         'job_id': None,  # Manual invoice
                         'due_date': due_date,
-                        'subtotal': total_subtotal,
                         'tax_amount': tax_amount,
-                        'total_amount': total_amount,
                         'notes': notes,
                         'created_by': st.session_state.user['id']
                     }
@@ -485,6 +488,8 @@ def show_manual_invoice_creation():
 
 def show_invoice_details():
     """Display detailed invoice view"""
+    import pandas as pd
+    
     st.subheader("Invoice Details")
     
     # Invoice selection
@@ -585,9 +590,69 @@ def show_invoice_details():
             if invoice_details.get('notes'):
                 st.markdown("### Notes")
                 st.info(invoice_details['notes'])
+            
+            show_invoice_pdf(invoice_details)
+
+def show_invoice_pdf(invoice):
+    """Render an invoice to PDF (reusing the stored copy if unchanged) and offer it for download"""
+    st.markdown("### Invoice PDF")
+    pdf_key = f"invoice_pdf_{invoice['id']}"
+    
+    if st.button("📄 Generate PDF", key=f"generate_{pdf_key}"):
+        user_id, _ = current_user()
+        with st.spinner("Rendering invoice..."):
+            pdf, cached = get_invoice_pdf(invoice['id'], user_id)
+        if pdf:
+            st.session_state[pdf_key] = pdf
+            st.caption("Unchanged since the last render; using the stored PDF." if cached else "Saved to Documents.")
+        else:
+            st.error("Failed to render the invoice PDF.")
+    
+    if st.session_state.get(pdf_key):
+        st.download_button(
+            "⬇️ Download PDF",
+            data=st.session_state[pdf_key],
+            file_name=f"Invoice-{invoice['invoice_number']}.pdf",
+            mime="application/pdf",
+            key=f"download_{pdf_key}"
+        )
+
+def show_month_end_pdfs():
+    """Render PDFs for every invoice dated in a month; unchanged invoices are not re-rendered"""
+    with st.expander("🗂️ Month-End PDF Run"):
+        first_of_month = date.today().replace(day=1)
+        month_start = st.date_input(
+            "Month",
+            value=(first_of_month - timedelta(days=1)).replace(day=1),
+            key="month_end_pdf_month"
+        ).replace(day=1)
+        month_end = (month_start + timedelta(days=32)).replace(day=1) - timedelta(days=1)
+        
+        if st.button("Render Invoice PDFs", key="month_end_pdf_run"):
+            invoice_ids = get_invoice_ids_for_period(month_start, month_end)
+            if not invoice_ids:
+                st.info(f"No invoices dated {month_start:%B %Y}.")
+                return
+            
+            user_id, _ = current_user()
+            progress_bar = st.progress(0.0)
+            results = render_invoices(
+                invoice_ids, user_id,
+                progress=lambda done, total: progress_bar.progress(done / total if total else 1.0)
+            )
+            cached = sum(1 for result in results.values() if result['cached'])
+            failed = len(invoice_ids) - len(results)
+            st.success(
+                f"{len(results)} invoice PDFs for {month_start:%B %Y} stored in Documents "
+                f"({len(results) - cached} rendered, {cached} unchanged)."
+            )
+            if failed:
+                st.error(f"{failed} invoices could not be rendered.")
 
 def show_overdue_invoices():
     """Display overdue invoices"""
+    import pandas as pd
+    
     st.subheader("⚠️ Overdue Invoices")
     
     overdue_invoices = get_overdue_invoices()
@@ -635,6 +700,8 @@ def show_overdue_invoices():
 
 def show_payment_tracking():
     """Payment tracking and recording"""
+    import pandas as pd
+    
     st.subheader("💳 Payment Tracking")
     
     # Quick payment recording
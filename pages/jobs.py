@@ -1,7 +1,9 @@
 import streamlit as st
-from database import get_jobs, execute_query, get_estimates
-from datetime import datetime, date
-import pandas as pd
+from database import (
+    execute_query, get_estimates, get_job_details, get_jobs_page, count_jobs, JOB_SORT_ORDERS,
+    get_jobs_in_window, get_job_crews, get_job_analytics
+)
+from datetime import datetime, date, timedelta
 
 REQUIRED_ROLE = 'admin'
 
@@ -19,182 +21,228 @@ def show():
     with tab3:
         show_job_analytics()
 
+# Job statuses in workflow order
+JOB_STATUSES = ["not_started", "in_progress", "completed", "on_hold"]
+
+STATUS_ICONS = {
+    'not_started': '⚪',
+    'in_progress': '🟡',
+    'completed': '🟢',
+    'on_hold': '🔴'
+}
+
+@st.fragment
 def show_active_jobs():
+    import pandas as pd
+    
     st.subheader("Job Overview")
     
     # Filter options
-    col1, col2, col3 = st.columns(3)
+    col1, col2, col3, col4 = st.columns(4)
     with col1:
-        status_filter = st.selectbox(
-            "Filter by Status",
-            ["All", "not_started", "in_progress", "completed", "on_hold"],
-            key="job_status_filter"
-        )
+        status_filter = st.selectbox("Filter by Status", ["All"] + JOB_STATUSES, key="job_status_filter")
     
     with col2:
-        sort_by = st.selectbox(
-            "Sort by",
-            ["Created Date", "Start Date", "Client Name", "Cost"],
-            key="job_sort"
-        )
+        crew_filter = st.selectbox("Crew", ["All Crews", "Unassigned"] + get_job_crews(), key="job_crew_filter")
+    
+    with col3:
+        date_filter = st.date_input("Scheduled Between", value=[], key="job_date_filter")
+    
+    with col4:
+        sort_by = st.selectbox("Sort by", list(JOB_SORT_ORDERS.keys()), key="job_sort")
+    
+    col1, col2 = st.columns([3, 1])
+    with col1:
+        search = st.text_input("Search", placeholder="Job title, client or crew", key="job_search")
+    with col2:
+        page_size = st.selectbox("Show", [25, 50, 100, 200], key="job_page_size")
+    
+    filters = {
+        'status': status_filter if status_filter != "All" else None,
+        'crew': None if crew_filter == "All Crews" else ("" if crew_filter == "Unassigned" else crew_filter),
+        'start_date': date_filter[0] if len(date_filter) > 0 else None,
+        'end_date': date_filter[1] if len(date_filter) > 1 else None,
+        'search': search.strip() or None
+    }
+    
+    total_jobs = count_jobs(**filters)
+    page_count = max((total_jobs + page_size - 1) // page_size, 1)
     
-    # Get jobs
-    jobs = get_jobs() if status_filter == "All" else get_jobs(status_filter)
+    col1, col2 = st.columns([1, 3])
+    with col1:
+        page = st.number_input("Page", min_value=1, max_value=page_count, value=1, step=1, key="job_page")
+    with col2:
+        st.write("")
+        st.caption(f"{total_jobs:,} jobs · page {page} of {page_count}")
+    
+    jobs = get_jobs_page(**filters, sort=sort_by, limit=page_size, offset=(page - 1) * page_size)
     
     if jobs:
-        # Sort jobs
-        if sort_by == "Start Date":
-            jobs = sorted(jobs, key=lambda x: x['start_date'] or date.min, reverse=True)
-        elif sort_by == "Client Name":
-            jobs = sorted(jobs, key=lambda x: x['client_name'])
-        elif sort_by == "Cost":
-            jobs = sorted(jobs, key=lambda x: x['actual_cost'] or 0, reverse=True)
+        df = pd.DataFrame([
+            {
+                "Job #": job['id'],
+                "Title": job['job_title'],
+                "Client": job['client_name'],
+                "Status": f"{STATUS_ICONS.get(job['status'], '⚪')} {job['status'].replace('_', ' ').title()}",
+                "Crew": job['assigned_crew'] or "",
+                "Start": job['start_date'],
+                "End": job['end_date'],
+                "Cost": float(job['actual_cost']) if job['actual_cost'] is not None else None,
+                "Margin %": float(job['profit_margin']) if job['profit_margin'] is not None else None
+            }
+            for job in jobs
+        ])
         
-        for job in jobs:
-            with st.container():
-                # Job header
-                col1, col2, col3, col4 = st.columns([3, 2, 1, 2])
-                
-                with col1:
-                    st.write(f"**#{job['id']} - {job['job_title']}**")
-                    st.write(f"Client: {job['client_name']}")
-                    if job['estimate_title']:
-                        st.write(f"From Estimate: {job['estimate_title']}")
-                
-                with col2:
-                    if job['actual_cost']:
-                        st.write(f"**Cost:** ${job['actual_cost']:,.2f}")
-                    else:
-                        st.write("**Cost:** TBD")
-                    
-                    if job['start_date']:
-                        st.write(f"**Start:** {job['start_date'].strftime('%m/%d/%Y')}")
-                    else:
-                        st.write("**Start:** Not scheduled")
-                    
-                    if job['end_date']:
-                        st.write(f"**End:** {job['end_date'].strftime('%m/%d/%Y')}")
-                
-                with col3:
-                    current_status = job['status']
-                    status_colors = {
-                        'not_started': '⚪',
-                        'in_progress': '🟡',
-                        'completed': '🟢',
-                        'on_hold': '🔴'
-                    }
-                    st.write(f"{status_colors.get(current_status, '⚪')} {current_status.replace('_', ' ').title()}")
-                
-                with col4:
-                    # Status update
-                    new_status = st.selectbox(
-                        "Update Status",
-                        ["not_started", "in_progress", "completed", "on_hold"],
-                        index=["not_started", "in_progress", "completed", "on_hold"].index(current_status),
-                        key=f"job_status_{job['id']}"
-                    )
-                    
-                    if st.button("Update", key=f"update_job_{job['id']}", use_container_width=True):
-                        update_query = "UPDATE jobs SET status = %s, updated_at = CURRENT_TIMESTAMP WHERE id = %s"
-                        if execute_query(update_query, (new_status, job['id'])):
-                            st.success("Status updated!")
-                            st.rerun()
-                        else:
-                            st.error("Update failed")
-                
-                # Expandable details
-                with st.expander(f"Job #{job['id']} Details", expanded=False):
-                    detail_col1, detail_col2 = st.columns(2)
-                    
-                    with detail_col1:
-                        st.write("**Assigned Crew:**")
-                        st.write(job['assigned_crew'] or "Not assigned")
-                        
-                        st.write("**Profit Margin:**")
-                        if job['profit_margin']:
-                            st.write(f"{job['profit_margin']}%")
-                        else:
-                            st.write("Not calculated")
-                    
-                    with detail_col2:
-                        st.write("**Notes:**")
-                        st.write(job['notes'] or "No notes")
-                        
-                        st.write("**Created:**")
-                        st.write(job['created_at'].strftime('%m/%d/%Y %I:%M %p'))
-                    
-                    # Edit job form
-                    if st.button(f"Edit Job #{job['id']}", key=f"edit_btn_{job['id']}"):
-                        st.session_state[f"edit_job_{job['id']}"] = True
-                        st.rerun()
-                    
-                    if st.session_state.get(f"edit_job_{job['id']}", False):
-                        with st.form(f"edit_job_form_{job['id']}"):
-                            edit_col1, edit_col2 = st.columns(2)
-                            
-                            with edit_col1:
-                                new_title = st.text_input("Job Title", value=job['job_title'], key=f"edit_title_{job['id']}")
-                                new_start_date = st.date_input("Start Date", value=job['start_date'], key=f"edit_start_{job['id']}")
-                                new_end_date = st.date_input("End Date", value=job['end_date'], key=f"edit_end_{job['id']}")
-                                new_cost = st.number_input("Actual Cost ($)", value=float(job['actual_cost'] or 0), key=f"edit_cost_{job['id']}")
-                            
-                            with edit_col2:
-                                new_crew = st.text_input("Assigned Crew", value=job['assigned_crew'] or "", key=f"edit_crew_{job['id']}")
-                                new_margin = st.number_input("Profit Margin (%)", value=float(job['profit_margin'] or 0), key=f"edit_margin_{job['id']}")
-                                new_notes = st.text_area("Notes", value=job['notes'] or "", key=f"edit_notes_{job['id']}")
-                            
-                            form_col1, form_col2 = st.columns(2)
-                            with form_col1:
-                                if st.form_submit_button("Save Changes", use_container_width=True):
-                                    update_query = """
-                                        UPDATE jobs SET 
-                                            job_title = %s, start_date = %s, end_date = %s, 
-                                            actual_cost = %s, assigned_crew = %s, profit_margin = %s, 
-                                            notes = %s, updated_at = CURRENT_TIMESTAMP
-                                        WHERE id = %s
-                                    """
-                                    params = (new_title, new_start_date, new_end_date, new_cost, 
-                                            new_crew, new_margin, new_notes, job['id'])
-                                    
-                                    if execute_query(update_query, params):
-                                        st.success("Job updated successfully!")
-                                        st.session_state[f"edit_job_{job['id']}"] = False
-                                        st.rerun()
-                                    else:
-                                        st.error("Failed to update job")
-                            
-                            with form_col2:
-                                if st.form_submit_button("Cancel", use_container_width=True):
-                                    st.session_state[f"edit_job_{job['id']}"] = False
-                                    st.rerun()
-                
-                st.markdown("---")
+        event = st.dataframe(
+            df,
+            use_container_width=True,
+            hide_index=True,
+            on_select="rerun",
+            selection_mode="single-row",
+            key="jobs_board",
+            column_config={
+                "Cost": st.column_config.NumberColumn(format="$%.2f"),
+                "Margin %": st.column_config.NumberColumn(format="%.1f%%")
+            }
+        )
+        
+        selected_rows = event.selection.rows
+        if selected_rows:
+            show_job_editor(jobs[selected_rows[0]]['id'])
+        else:
+            st.caption("Select a job to view and edit its details.")
+    elif total_jobs:
+        st.info("No jobs on this page.")
     else:
         st.info("No jobs found. Jobs are created from approved estimates.")
 
+def show_job_editor(job_id):
+    """Details and edit form for the job selected on the jobs board"""
+    job = get_job_details(job_id)
+    if not job:
+        st.error("Job not found")
+        return
+    
+    st.markdown("---")
+    st.write(f"**#{job['id']} - {job['job_title']}**")
+    
+    detail_col1, detail_col2 = st.columns(2)
+    with detail_col1:
+        st.write(f"Client: {job['client_name']}")
+        if job['estimate_title']:
+            st.write(f"From Estimate: {job['estimate_title']}")
+    with detail_col2:
+        st.write(f"Created: {job['created_at'].strftime('%m/%d/%Y %I:%M %p')}")
+    
+    with st.form(f"edit_job_form_{job['id']}"):
+        edit_col1, edit_col2 = st.columns(2)
+        
+        with edit_col1:
+            new_title = st.text_input("Job Title", value=job['job_title'])
+            new_status = st.selectbox(
+                "Status",
+                JOB_STATUSES,
+                index=JOB_STATUSES.index(job['status']) if job['status'] in JOB_STATUSES else 0,
+                format_func=lambda s: s.replace('_', ' ').title()
+            )
+            new_start_date = st.date_input("Start Date", value=job['start_date'])
+            new_end_date = st.date_input("End Date", value=job['end_date'])
+        
+        with edit_col2:
+            new_crew = st.text_input("Assigned Crew", value=job['assigned_crew'] or "")
+            new_cost = st.number_input("Actual Cost ($)", value=float(job['actual_cost'] or 0))
+            new_margin = st.number_input("Profit Margin (%)", value=float(job['profit_margin'] or 0))
+            new_notes = st.text_area("Notes", value=job['notes'] or "")
+        
+        if st.form_submit_button("Save Changes", use_container_width=True):
+            update_query = """
+                UPDATE jobs SET 
+                    job_title = %s, status = %s, start_date = %s, end_date = %s, 
+                    actual_cost = %s, assigned_crew = %s, profit_margin = %s, 
+                    notes = %s, updated_at = CURRENT_TIMESTAMP
+                WHERE id = %s
+            """
+            params = (new_title, new_status, new_start_date, new_end_date, new_cost,
+                    new_crew, new_margin, new_notes, job['id'])
+            
+            if execute_query(update_query, params):
+                st.success("Job updated successfully!")
+                st.rerun()
+            else:
+                st.error("Failed to update job")
+
+# Calendar window sizes
+CALENDAR_WINDOWS = ["Week", "Month", "Quarter"]
+
+def get_calendar_window(anchor, window):
+    """Get the (start, end) dates of the week/month/quarter containing anchor"""
+    if window == "Week":
+        start = anchor - timedelta(days=anchor.weekday())
+        return start, start + timedelta(days=6)
+    
+    first_month = anchor.month if window == "Month" else 3 * ((anchor.month - 1) // 3) + 1
+    start = anchor.replace(month=first_month, day=1)
+    months = 1 if window == "Month" else 3
+    next_start = date(start.year + (start.month + months - 1) // 12, (start.month + months - 1) % 12 + 1, 1)
+    return start, next_start - timedelta(days=1)
+
+@st.fragment
 def show_job_calendar():
     st.subheader("📅 Job Schedule Calendar")
     
-    # Get jobs with dates
-    jobs = get_jobs()
-    scheduled_jobs = [job for job in jobs if job['start_date']]
+    if 'calendar_anchor' not in st.session_state:
+        st.session_state.calendar_anchor = date.today()
+    
+    # Window controls
+    col1, col2, col3, col4, col5 = st.columns([2, 1, 2, 1, 2])
+    
+    with col1:
+        window = st.selectbox("Window", CALENDAR_WINDOWS, index=1, key="calendar_window")
+    
+    window_start, window_end = get_calendar_window(st.session_state.calendar_anchor, window)
+    
+    with col2:
+        st.write("")
+        if st.button("◀", key="calendar_prev", use_container_width=True):
+            st.session_state.calendar_anchor = window_start - timedelta(days=1)
+            st.rerun(scope="fragment")
+    
+    with col3:
+        st.write("")
+        st.markdown(f"**{window_start.strftime('%b %d, %Y')} – {window_end.strftime('%b %d, %Y')}**")
+    
+    with col4:
+        st.write("")
+        if st.button("▶", key="calendar_next", use_container_width=True):
+            st.session_state.calendar_anchor = window_end + timedelta(days=1)
+            st.rerun(scope="fragment")
+    
+    with col5:
+        crews = get_job_crews()
+        crew_filter = st.selectbox("Crew", ["All Crews", "Unassigned"] + crews, key="calendar_crew")
+    
+    if st.button("Today", key="calendar_today"):
+        st.session_state.calendar_anchor = date.today()
+        st.rerun(scope="fragment")
+    
+    crew = None if crew_filter == "All Crews" else ("" if crew_filter == "Unassigned" else crew_filter)
+    
+    # Only jobs overlapping the visible window are loaded
+    scheduled_jobs = get_jobs_in_window(window_start, window_end, crew)
     
     if scheduled_jobs:
         # Create calendar view
         col1, col2 = st.columns([1, 3])
         
         with col1:
-            st.write("**Upcoming Jobs:**")
-            
-            # Sort by start date
-            upcoming_jobs = sorted(scheduled_jobs, key=lambda x: x['start_date'])
+            st.write(f"**Jobs in this {window.lower()}:** {len(scheduled_jobs)}")
             
-            for job in upcoming_jobs[:10]:  # Show next 10 jobs
+            for job in scheduled_jobs[:10]:  # Show the first 10 jobs
                 days_until = (job['start_date'] - date.today()).days
                 
                 if days_until < 0:
-                    status_icon = "🔴"  # Overdue
-                    date_text = f"Overdue by {abs(days_until)} days"
+                    status_icon = "🔴" if job['status'] == 'not_started' else "🔵"  # Overdue / underway
+                    date_text = f"Started {abs(days_until)} days ago"
                 elif days_until == 0:
                     status_icon = "🟡"  # Today
                     date_text = "Today"
@@ -213,75 +261,83 @@ def show_job_calendar():
         with col2:
             # Calendar visualization using plotly
             import plotly.express as px
-            import plotly.graph_objects as go
+            import pandas as pd
             
-            # Prepare data for timeline chart
+            # One lane per crew; bars are clipped to the visible window
             timeline_data = []
             for job in scheduled_jobs:
-                end_date = job['end_date'] or job['start_date']
+                end_date = max(job['end_date'] or job['start_date'], job['start_date'])
                 timeline_data.append({
+                    'Crew': job['assigned_crew'] or 'Unassigned',
                     'Job': f"#{job['id']} {job['job_title']}",
-                    'Start': job['start_date'],
-                    'End': end_date,
+                    'Start': max(job['start_date'], window_start),
+                    'End': min(end_date, window_end) + timedelta(days=1),
                     'Client': job['client_name'],
                     'Status': job['status']
                 })
             
-            if timeline_data:
-                df = pd.DataFrame(timeline_data)
-                
-                # Create Gantt chart
-                fig = px.timeline(
-                    df, 
-                    x_start="Start", 
-                    x_end="End", 
-                    y="Job",
-                    color="Status",
-                    title="Job Timeline",
-                    hover_data=["Client"]
-                )
-                
-                fig.update_layout(
-                    height=600,
-                    showlegend=True
-                )
-                
-                st.plotly_chart(fig, use_container_width=True)
+            df = pd.DataFrame(timeline_data)
+            
+            # Create Gantt chart
+            fig = px.timeline(
+                df, 
+                x_start="Start", 
+                x_end="End", 
+                y="Crew",
+                color="Status",
+                text="Job",
+                title=f"Crew Schedule ({window})",
+                hover_data=["Job", "Client"]
+            )
+            
+            fig.update_layout(
+                height=max(300, 80 * df['Crew'].nunique()),
+                showlegend=True,
+                barmode="overlay",
+                xaxis_range=[window_start, window_end + timedelta(days=1)]
+            )
+            fig.update_yaxes(categoryorder="category ascending", title=None)
+            
+            st.plotly_chart(fig, use_container_width=True)
     else:
-        st.info("No scheduled jobs found. Schedule jobs by setting start dates.")
+        st.info("No jobs scheduled in this window. Schedule jobs by setting start dates.")
+
+# Analytics periods -> calendar months (None for all time)
+JOB_ANALYTICS_PERIODS = {
+    "Last 3 Months": 3,
+    "Last 12 Months": 12,
+    "Last 24 Months": 24,
+    "All Time": None
+}
 
+@st.fragment
 def show_job_analytics():
+    import plotly.express as px
+    
     st.subheader("📊 Job Analytics")
     
-    jobs = get_jobs()
+    period = st.selectbox("Period", list(JOB_ANALYTICS_PERIODS.keys()), index=1, key="job_analytics_period")
+    analytics = get_job_analytics(JOB_ANALYTICS_PERIODS[period])
     
-    if jobs:
+    if analytics and analytics['total_jobs']:
         # Key metrics
         col1, col2, col3, col4 = st.columns(4)
         
-        total_jobs = len(jobs)
-        completed_jobs = len([j for j in jobs if j['status'] == 'completed'])
-        total_revenue = sum([j['actual_cost'] for j in jobs if j['actual_cost']])
-        avg_job_value = total_revenue / total_jobs if total_jobs > 0 else 0
-        
         with col1:
-            st.metric("Total Jobs", total_jobs)
+            st.metric("Total Jobs", analytics['total_jobs'])
         with col2:
-            st.metric("Completed Jobs", completed_jobs)
+            st.metric("Completed Jobs", analytics['completed_jobs'])
         with col3:
-            st.metric("Total Revenue", f"${total_revenue:,.2f}")
+            st.metric("Total Revenue", f"${analytics['total_revenue']:,.2f}")
         with col4:
-            st.metric("Avg Job Value", f"${avg_job_value:,.2f}")
+            st.metric("Avg Job Value", f"${analytics['avg_job_value']:,.2f}")
         
         # Charts
         col1, col2 = st.columns(2)
         
         with col1:
             # Status distribution
-            status_counts = {}
-            for job in jobs:
-                status = job['status']
-                status_counts[status] = status_counts.get(status, 0) + 1
+            status_counts = analytics['status_counts']
             
             fig = px.pie(
                 values=list(status_counts.values()),
@@ -292,15 +348,11 @@ def show_job_analytics():
         
         with col2:
             # Monthly completion trend
-            completed_by_month = {}
-            for job in jobs:
-                if job['status'] == 'completed' and job['end_date']:
-                    month_key = job['end_date'].strftime('%Y-%m')
-                    completed_by_month[month_key] = completed_by_month.get(month_key, 0) + 1
+            completed_by_month = analytics['monthly_completions']
             
-            if completed_by_month:
-                months = sorted(completed_by_month.keys())
-                counts = [completed_by_month[month] for month in months]
+            if any(row['completed'] for row in completed_by_month):
+                months = [row['month'][:7] for row in completed_by_month]
+                counts = [row['completed'] for row in completed_by_month]
                 
                 fig = px.bar(
                     x=months,
@@ -315,25 +367,25 @@ def show_job_analytics():
         # Profitability analysis
         st.subheader("💰 Profitability Analysis")
         
-        profitable_jobs = [j for j in jobs if j['profit_margin']]
-        if profitable_jobs:
-            df_profit = pd.DataFrame([
-                {
-                    'Job ID': job['id'],
-                    'Job Title': job['job_title'],
-                    'Client': job['client_name'],
-                    'Cost': job['actual_cost'],
-                    'Profit Margin': job['profit_margin'],
-                    'Profit Amount': (job['actual_cost'] * job['profit_margin'] / 100) if job['actual_cost'] else 0
-                }
-                for job in profitable_jobs
-            ])
+        if analytics['margin_jobs']:
+            col1, col2, col3 = st.columns(3)
             
-            st.dataframe(df_profit, use_container_width=True)
+            with col1:
+                st.metric("Average Profit Margin", f"{analytics['avg_margin']:.1f}%")
+            with col2:
+                st.metric("Median Profit Margin", f"{analytics['margin_percentiles'][50]:.1f}%")
+            with col3:
+                st.metric("Total Profit", f"${analytics['total_profit']:,.2f}")
             
-            # Average profit margin
-            avg_margin = df_profit['Profit Margin'].mean()
-            st.metric("Average Profit Margin", f"{avg_margin:.1f}%")
+            # Margin distribution across jobs with a recorded margin
+            percentiles = analytics['margin_percentiles']
+            fig = px.bar(
+                x=[f"P{p}" for p in percentiles],
+                y=list(percentiles.values()),
+                title=f"Profit Margin Distribution ({analytics['margin_jobs']} jobs)"
+            )
+            fig.update_layout(xaxis_title="Percentile", yaxis_title="Profit Margin (%)")
+            st.plotly_chart(fig, use_container_width=True)
         else:
             st.info("No profit margin data available for analysis")
     else:
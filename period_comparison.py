@@ -0,0 +1,99 @@
+from datetime import date, timedelta
+from database import execute_query
+
+# Comparison choices offered next to a selected date range
+COMPARISON_OPTIONS = ["Previous Period", "Same Period Last Year"]
+
+def _shift_year(day, years):
+    try:
+        return day.replace(year=day.year + years)
+    except ValueError:
+        # Feb 29 in a non-leap year
+        return day.replace(year=day.year + years, day=28)
+
+def build_periods(start_date, end_date, comparisons=()):
+    """Get (label, start, end) periods: the selected range followed by each comparison"""
+    periods = [("Current Period", start_date, end_date)]
+    period_length = (end_date - start_date).days
+
+    for comparison in comparisons:
+        if comparison == "Previous Period":
+            comp_end = start_date - timedelta(days=1)
+            periods.append((comparison, comp_end - timedelta(days=period_length), comp_end))
+        elif comparison == "Same Period Last Year":
+            periods.append((comparison, _shift_year(start_date, -1), _shift_year(end_date, -1)))
+        else:
+            raise ValueError(f"Unknown comparison period: {comparison}")
+
+    return periods
+
+def trailing_months(count, end_date=None):
+    """Get (label, start, end) periods for the last `count` calendar months, oldest first"""
+    end_date = end_date or date.today()
+    month = end_date.replace(day=1)
+    periods = []
+    for _ in range(count):
+        next_month = (month + timedelta(days=32)).replace(day=1)
+        periods.append((month.strftime('%b %Y'), month, min(next_month - timedelta(days=1), end_date)))
+        month = (month - timedelta(days=1)).replace(day=1)
+    return periods[::-1]
+
+def compare_periods(table, date_column, periods, measures, group_by=None, group_params=(), where=None, where_params=()):
+    """Aggregate measures for several periods in one pass over the table.
+
+    measures maps a name to (aggregate, condition), e.g. ('SUM(amount)', "record_type = 'income'");
+    each is computed per period with FILTER. group_by maps output names to SQL expressions.
+    Returns one row per group with the group values and a 'periods' list holding a
+    {measure: value} dict for each period, in the order given.
+    """
+    group_by = group_by or {}
+    select = [f"{expression} AS {name}" for name, expression in group_by.items()]
+    params = list(group_params)
+
+    for index, (_, start, end) in enumerate(periods):
+        for name, (aggregate, condition) in measures.items():
+            period_filter = f"{date_column} >= %s AND {date_column} < %s"
+            if condition:
+                period_filter = f"({condition}) AND {period_filter}"
+            select.append(f"COALESCE({aggregate} FILTER (WHERE {period_filter}), 0) AS {name}__{index}")
+            params.extend([start, end + timedelta(days=1)])
+
+    query = f"""
+        SELECT {', '.join(select)}
+        FROM {table}
+        WHERE {date_column} >= %s AND {date_column} < %s
+    """
+    params.extend([min(p[1] for p in periods), max(p[2] for p in periods) + timedelta(days=1)])
+
+    if where:
+        query += f" AND ({where})"
+        params.extend(where_params)
+
+    if group_by:
+        query += f" GROUP BY {', '.join(str(i + 1) for i in range(len(group_by)))}"
+
+    rows = execute_query(query, params, fetch=True) or []
+    return [
+        {
+            **{name: row[name] for name in group_by},
+            'periods': [
+                {name: row[f"{name}__{index}"] for name in measures}
+                for index in range(len(periods))
+            ]
+        }
+        for row in rows
+    ]
+
+def get_call_period_comparison(start_date, end_date, comparisons=("Previous Period",)):
+    """Call totals and success rate for a range and its comparison periods"""
+    periods = build_periods(start_date, end_date, comparisons)
+    rows = compare_periods('ai_calls', 'created_at', periods, {
+        'total_calls': ('COUNT(*)', None),
+        'successful_calls': ('COUNT(*)', "call_status = 'completed'")
+    })
+
+    results = rows[0]['periods'] if rows else [{'total_calls': 0, 'successful_calls': 0} for _ in periods]
+    for values in results:
+        total = values['total_calls']
+        values['success_rate'] = (values['successful_calls'] / total * 100) if total > 0 else 0
+    return results
@@ -0,0 +1,44 @@
+import io
+
+import pytest
+
+pytest.importorskip("psycopg2")
+openpyxl = pytest.importorskip("openpyxl")
+
+from customer_import import iter_import_rows, normalize_row, suggest_mapping
+
+
+def make_xlsx(rows, zip_format=None):
+    workbook = openpyxl.Workbook()
+    sheet = workbook.active
+    for row in rows:
+        sheet.append(row)
+    if zip_format:
+        for cell in sheet['D'][1:]:
+            cell.number_format = zip_format
+    buffer = io.BytesIO()
+    workbook.save(buffer)
+    buffer.seek(0)
+    return buffer
+
+
+HEADER = ['First Name', 'Last Name', 'Phone', 'Zip']
+
+
+def test_numeric_cells_read_as_typed():
+    file = make_xlsx([HEADER, ['Jane', 'Doe', 5551234567.0, 2134]], zip_format='00000')
+
+    rows = list(iter_import_rows(file, 'customers.xlsx'))
+
+    assert rows == [(2, {'First Name': 'Jane', 'Last Name': 'Doe', 'Phone': '5551234567', 'Zip': '02134'})]
+
+
+def test_phone_and_zip_normalised_from_numbers():
+    file = make_xlsx([HEADER, ['Jane', 'Doe', 5551234567.0, 2134]])
+    (_, row), = iter_import_rows(file, 'customers.xlsx')
+
+    record, errors = normalize_row(row, suggest_mapping(HEADER), {})
+
+    assert errors == []
+    assert record['phone'] == '(555) 123-4567'
+    assert record['zip_code'] == '02134'
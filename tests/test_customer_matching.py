@@ -0,0 +1,60 @@
+import pytest
+
+pytest.importorskip("psycopg2")
+
+import customer_matching
+import database
+from customer_matching import DUPLICATE_THRESHOLD, find_matching_customer, score_match
+
+JANE = {
+    'id': 7,
+    'first_name': 'Jane',
+    'last_name': 'Doe',
+    'email': 'jane@example.com',
+    'phone': '(555) 123-4567',
+    'address': None,
+    'zip_code': None,
+    'company_name': None
+}
+
+
+@pytest.fixture
+def customers(monkeypatch):
+    """Serve JANE from the email block of the blocking key query"""
+    monkeypatch.setattr(customer_matching, '_soundex_available', True)
+    monkeypatch.setattr(customer_matching, 'execute_query',
+                        lambda query, params=None, fetch=False: [{**JANE, 'block_key': 'email'}])
+
+
+@pytest.mark.parametrize('record', [
+    # Company name on the estimate instead of the person's name
+    {'first_name': 'Doe', 'last_name': 'Construction LLC', 'email': 'Jane@Example.com', 'phone': '(555) 123-4567'},
+    # Same person with a new phone number
+    {'first_name': 'Jane', 'last_name': 'Doe', 'email': 'jane@example.com', 'phone': '(555) 999-0000'}
+])
+def test_exact_email_is_decisive(customers, record):
+    assert score_match(record, JANE)[0] < DUPLICATE_THRESHOLD
+
+    customer, score = find_matching_customer(record)
+
+    assert customer['id'] == JANE['id']
+    assert score == 1.0
+
+
+@pytest.mark.parametrize('client_name, client_phone', [
+    ('Doe Construction LLC', '(555) 123-4567'),
+    ('Jane Doe', '(555) 999-0000')
+])
+def test_estimate_with_known_email_reuses_customer(customers, monkeypatch, client_name, client_phone):
+    def create_customer(data):
+        raise AssertionError("customers.email is unique; creating a second customer would fail")
+
+    monkeypatch.setattr(database, 'create_customer', create_customer)
+
+    customer_id = database.find_or_create_customer_from_estimate({
+        'client_name': client_name,
+        'client_email': 'jane@example.com',
+        'client_phone': client_phone
+    })
+
+    assert customer_id == JANE['id']
@@ -0,0 +1,78 @@
+import io
+from datetime import date
+from decimal import Decimal
+
+import pytest
+
+pypdf = pytest.importorskip("pypdf")
+
+from invoice_pdf import invoice_content_hash, render_invoice_pdf
+
+
+def make_invoice(item_count=3):
+    return {
+        'id': 1,
+        'invoice_number': 'INV-2026-0001',
+        'invoice_date': date(2026, 9, 30),
+        'due_date': date(2026, 10, 30),
+        'payment_status': 'partial',
+        'first_name': 'José',
+        'last_name': 'Pérez (Jr)',
+        'email': 'jose@example.com',
+        'phone': '(555) 123-4567',
+        'address': '1 Main St',
+        'city': 'Austin',
+        'state': 'TX',
+        'zip_code': '78701',
+        'job_title': 'Deck rebuild',
+        'subtotal': Decimal('50.00') * item_count,
+        'tax_amount': Decimal('4.00') * item_count,
+        'total_amount': Decimal('54.00') * item_count,
+        'paid_amount': Decimal('20.00'),
+        'notes': 'Net 30. ' * 30,
+        'items': [
+            {
+                'description': f'Line item {n} with a long description that wraps onto a second line of the table',
+                'quantity': Decimal('2'),
+                'unit_price': Decimal('25.00'),
+                'line_total': Decimal('50.00')
+            }
+            for n in range(item_count)
+        ]
+    }
+
+
+def test_rendered_invoice_parses_strictly():
+    reader = pypdf.PdfReader(io.BytesIO(render_invoice_pdf(make_invoice())), strict=True)
+
+    assert len(reader.pages) == 1
+    text = reader.pages[0].extract_text()
+    assert 'INV-2026-0001' in text
+    assert 'José Pérez (Jr)' in text
+    assert 'Balance Due' in text
+    assert '$142.00' in text
+    assert reader.metadata.title == 'Invoice INV-2026-0001'
+
+
+def test_long_invoice_spans_pages_with_footers():
+    reader = pypdf.PdfReader(io.BytesIO(render_invoice_pdf(make_invoice(item_count=80))), strict=True)
+
+    page_count = len(reader.pages)
+    assert page_count > 1
+    for number, page in enumerate(reader.pages, start=1):
+        text = page.extract_text()
+        assert 'INVOICE' in text
+        assert f'Page {number} of {page_count}' in text
+    assert 'Line item 79' in ''.join(page.extract_text() for page in reader.pages)
+
+
+def test_content_hash_tracks_rendered_content_only():
+    invoice = make_invoice()
+    digest = invoice_content_hash(invoice)
+
+    assert invoice_content_hash({**invoice, 'updated_at': date(2026, 10, 1)}) == digest
+    assert invoice_content_hash({**invoice, 'paid_amount': Decimal('30.00')}) != digest
+
+    changed_items = [dict(item) for item in invoice['items']]
+    changed_items[0]['description'] = 'Something else'
+    assert invoice_content_hash({**invoice, 'items': changed_items}) != digest
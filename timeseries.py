@@ -0,0 +1,110 @@
+from datetime import date, timedelta
+from database import execute_query
+
+# Most points sent to the browser per chart line
+MAX_CHART_POINTS = 400
+
+# Zoom levels -> PostgreSQL date_trunc unit and generate_series step
+BUCKETS = {
+    'day': ('day', '1 day'),
+    'week': ('week', '1 week'),
+    'month': ('month', '1 month')
+}
+
+def choose_bucket(start_date, end_date, max_points=MAX_CHART_POINTS):
+    """Pick the finest bucket that keeps a date range under max_points buckets"""
+    days = (end_date - start_date).days + 1
+    if days <= max_points:
+        return 'day'
+    if days / 7 <= max_points:
+        return 'week'
+    return 'month'
+
+def get_bucketed_series(table, date_column, measures, start_date, end_date=None, bucket=None, where=None, params=()):
+    """Aggregate a table into one row per bucket between two dates, oldest first.
+
+    measures maps output names to aggregate expressions. Empty buckets are returned
+    with NULL aggregates (so COUNT(...) expressions should be wrapped in COALESCE by callers
+    that need zeros); the bucket start is returned as 'bucket'.
+    """
+    end_date = end_date or date.today()
+    bucket = bucket or choose_bucket(start_date, end_date)
+    unit, step = BUCKETS[bucket]
+
+    select = ", ".join(f"{expression} AS {name}" for name, expression in measures.items())
+    outer = ", ".join(f"t.{name}" for name in measures)
+    query = f"""
+        WITH buckets AS (
+            SELECT generate_series(DATE_TRUNC('{unit}', %s::DATE), DATE_TRUNC('{unit}', %s::DATE), INTERVAL '{step}')::DATE AS bucket
+        ),
+        totals AS (
+            SELECT DATE_TRUNC('{unit}', {date_column})::DATE AS bucket, {select}
+            FROM {table}
+            WHERE {date_column} >= %s AND {date_column} < %s
+            {f'AND ({where})' if where else ''}
+            GROUP BY 1
+        )
+        SELECT b.bucket, {outer}
+        FROM buckets b
+        LEFT JOIN totals t ON t.bucket = b.bucket
+        ORDER BY b.bucket
+    """
+    query_params = [start_date, end_date, start_date, end_date + timedelta(days=1), *params]
+    return execute_query(query, query_params, fetch=True) or []
+
+def lttb_indices(x, y, threshold=MAX_CHART_POINTS):
+    """Largest-Triangle-Three-Buckets downsampling; returns the indices of the points to keep.
+
+    x must be increasing numbers (use ordinal dates or positions). The first and last
+    points are always kept, and the visual shape of the line is preserved.
+    """
+    n = len(y)
+    if threshold >= n or threshold < 3:
+        return list(range(n))
+
+    indices = [0]
+    bucket_size = (n - 2) / (threshold - 2)
+    selected = 0
+
+    for i in range(threshold - 2):
+        # Average of the next bucket is the third triangle corner
+        next_start = int((i + 1) * bucket_size) + 1
+        next_end = min(int((i + 2) * bucket_size) + 1, n)
+        next_count = max(next_end - next_start, 1)
+        avg_x = sum(x[next_start:next_end]) / next_count if next_end > next_start else x[n - 1]
+        avg_y = sum(y[next_start:next_end]) / next_count if next_end > next_start else y[n - 1]
+
+        start = int(i * bucket_size) + 1
+        end = int((i + 1) * bucket_size) + 1
+        ax, ay = x[selected], y[selected]
+
+        best_area = -1
+        best_index = start
+        for j in range(start, end):
+            area = abs((ax - avg_x) * (y[j] - ay) - (ax - x[j]) * (avg_y - ay))
+            if area > best_area:
+                best_area = area
+                best_index = j
+
+        indices.append(best_index)
+        selected = best_index
+
+    indices.append(n - 1)
+    return indices
+
+def downsample_rows(rows, x_key, y_key, threshold=MAX_CHART_POINTS):
+    """Keep at most `threshold` rows, chosen by LTTB on one line of the chart.
+
+    Other columns of the kept rows are returned unchanged, so several traces can share them.
+    """
+    if len(rows) <= threshold:
+        return rows
+
+    x = [_as_number(row[x_key]) for row in rows]
+    y = [float(row[y_key] or 0) for row in rows]
+    return [rows[i] for i in lttb_indices(x, y, threshold)]
+
+def _as_number(value):
+    if hasattr(value, 'toordinal'):
+        return value.toordinal()
+    return float(value)